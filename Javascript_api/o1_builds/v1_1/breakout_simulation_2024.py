@@ -1,83 +1,171 @@
+"""
+Daily gap breakout simulation on DAX 1-minute bars.
+
+Buy when the day opens above the previous day's high, sell when it opens below
+the previous day's low; entry at the open, and the first minute bar of the day
+that touches SL or TP decides the trade (SL first if one bar touches both,
+0 if neither is touched by the close).
+
+The minute bars are indexed ONCE into contiguous per-day slices, and the first
+touch of every SL/TP level is found from the day's running low/high with a
+binary search, so any number of SL/TP pairs is evaluated in one pass.
+
+Usage:
+  python breakout_simulation_2024.py
+  python breakout_simulation_2024.py --csv dax-1m.csv --year_range 2020-2024
+  python breakout_simulation_2024.py --sl 30,40,50 --tp 80,100,120
+"""
+
+import argparse
+
+import numpy as np
 import pandas as pd
 
-# Load the CSV (adjust path if needed)
-csv_path = 'dax-1m.csv'
-df = pd.read_csv(csv_path, sep=';', names=["Date", "Time", "Open", "High", "Low", "Close", "Volume"], skiprows=1)
-
-# Combine Date and Time into full timestamp
-df['Timestamp'] = pd.to_datetime(df['Date'] + ' ' + df['Time'], format='%d/%m/%Y %H:%M:%S')
-df.set_index('Timestamp', inplace=True)
-
-# Convert price columns to float
-for col in ['Open', 'High', 'Low', 'Close']:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-df.dropna(inplace=True)
-
-# ✅ Use full dataset (no year filtering)
-df_all = df.copy()
-
-# Create daily OHLC from 1-minute data
-daily = df_all.resample('D').agg({
-    'Open': 'first',
-    'High': 'max',
-    'Low': 'min',
-    'Close': 'last'
-}).dropna()
-
-# Simulate breakout strategy: SL = 40, TP = 100
-results = []
-for i in range(1, len(daily)):
-    prev_high = daily.iloc[i-1]['High']
-    prev_low = daily.iloc[i-1]['Low']
-    day_open = daily.iloc[i]['Open']
-    date = daily.index[i]
-
-    direction = None
-    entry_price = None
-    result = 0
-
-    # Determine direction
-    if day_open > prev_high:
-        direction = 'buy'
-        entry_price = day_open
-        sl = entry_price - 40
-        tp = entry_price + 100
-    elif day_open < prev_low:
-        direction = 'sell'
-        entry_price = day_open
-        sl = entry_price + 40
-        tp = entry_price - 100
-
-    if direction:
-        intraday = df_all[df_all.index.date == date.date()]  # ✅ Updated line
-        for _, row in intraday.iterrows():
-            if direction == 'buy':
-                if row['Low'] <= sl:
-                    result = -40
-                    break
-                elif row['High'] >= tp:
-                    result = 100
-                    break
-            elif direction == 'sell':
-                if row['High'] >= sl:
-                    result = -40
-                    break
-                elif row['Low'] <= tp:
-                    result = 100
-                    break
-
-        results.append({
-            'Date': date,
-            'Direction': direction,
-            'Entry': entry_price,
-            'ResultPts': result
-        })
-
-# Summarize results by year
-df_results = pd.DataFrame(results)
-df_results['Year'] = df_results['Date'].dt.year
-yearly_summary = df_results.groupby('Year')['ResultPts'].sum()
-
-# Output results
-print("Yearly Results (All Years) in Index Points:")
-print(yearly_summary)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Daily gap breakout simulation (SL/TP grid)")
+    ap.add_argument("--csv", default="dax-1m.csv", help="Path to DAX CSV (semicolon separated)")
+    ap.add_argument("--year_range", default="ALL",
+                    help="Trading days to simulate: 'ALL', '2024' or '2020-2024'")
+    ap.add_argument("--sl", type=parse_levels, default=[40], help="Stop loss points, e.g. '40' or '30,40,50'")
+    ap.add_argument("--tp", type=parse_levels, default=[100], help="Take profit points, e.g. '100' or '80,100'")
+    return ap.parse_args()
+
+def parse_levels(spec):
+    """'30,40,50' => [30, 40, 50] (ints where integral, so results print as before)."""
+    vals = [float(x) for x in spec.split(",") if x.strip()]
+    if not vals:
+        raise argparse.ArgumentTypeError("no values")
+    return [int(v) if v.is_integer() else v for v in vals]
+
+def parse_year_range(rng):
+    """Parse year range or default to ALL years."""
+    if rng.lower() == "all":
+        return None  # Process all years
+    if "-" in rng:
+        start, end = rng.split("-")
+        return range(int(start), int(end) + 1)
+    else:
+        y = int(rng)
+        return range(y, y + 1)
+
+def load_bars(csv_path):
+    df = pd.read_csv(csv_path, sep=';', names=["Date", "Time", "Open", "High", "Low", "Close", "Volume"], skiprows=1)
+
+    # Combine Date and Time into full timestamp
+    df['Timestamp'] = pd.to_datetime(df['Date'] + ' ' + df['Time'], format='%d/%m/%Y %H:%M:%S')
+    df.set_index('Timestamp', inplace=True)
+
+    # Convert price columns to float
+    for col in ['Open', 'High', 'Low', 'Close']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.dropna(inplace=True)
+    return df
+
+class DayIndex:
+    """
+    Minute bars grouped by calendar day: lows/highs in day order (file order
+    within a day) and day number => [start, end) slice, built in one pass.
+    """
+    def __init__(self, df):
+        days = df.index.to_numpy().astype("datetime64[D]").astype(np.int64)
+        order = np.argsort(days, kind="stable")
+        days = days[order]
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        self.days = days[starts]
+        self.starts = starts
+        self.ends = np.r_[starts[1:], len(days)]
+        self.lows = df['Low'].to_numpy(dtype=np.float64)[order]
+        self.highs = df['High'].to_numpy(dtype=np.float64)[order]
+
+    def slice(self, date):
+        i = np.searchsorted(self.days, date.to_datetime64().astype("datetime64[D]").astype(np.int64))
+        return slice(self.starts[i], self.ends[i])
+
+def first_touch(running, levels, below):
+    """
+    First bar index whose running extreme reaches each level (len if never):
+    running is the running min (below=True, touch when <= level) or the
+    running max (below=False, touch when >= level), so it is sorted.
+    """
+    if below:
+        return np.searchsorted(-running, -levels, side="left")
+    return np.searchsorted(running, levels, side="left")
+
+def simulate_day(idx, s, direction, entry, sl, tp):
+    """ResultPts for every (sl, tp) pair of one breakout day: -sl, +tp or 0."""
+    run_lo = np.minimum.accumulate(idx.lows[s])
+    run_hi = np.maximum.accumulate(idx.highs[s])
+    n = len(run_lo)
+    if direction == 'buy':
+        sl_at = first_touch(run_lo, entry - sl, below=True)
+        tp_at = first_touch(run_hi, entry + tp, below=False)
+    else:
+        sl_at = first_touch(run_hi, entry + sl, below=False)
+        tp_at = first_touch(run_lo, entry - tp, below=True)
+    sl_at = sl_at[:, None]
+    tp_at = tp_at[None, :]
+    return np.where((sl_at < n) & (sl_at <= tp_at), -sl[:, None],
+                    np.where(tp_at < n, tp[None, :], 0))
+
+def main():
+    args = parse_args()
+    yrs = parse_year_range(args.year_range)
+    sl = np.asarray(args.sl)
+    tp = np.asarray(args.tp)
+
+    df_all = load_bars(args.csv)
+    idx = DayIndex(df_all)
+
+    # Create daily OHLC from 1-minute data
+    daily = df_all.resample('D').agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last'
+    }).dropna()
+
+    # Breakout days: open above the previous day's high / below its low
+    prev_high = daily['High'].shift(1)
+    prev_low = daily['Low'].shift(1)
+    day_open = daily['Open']
+    direction = pd.Series(np.where(day_open > prev_high, 'buy',
+                                   np.where(day_open < prev_low, 'sell', '')), index=daily.index)
+    if yrs is not None:
+        direction[~daily.index.year.isin(list(yrs))] = ''
+
+    results = []
+    for date in direction.index[direction != '']:
+        entry_price = day_open[date]
+        pts = simulate_day(idx, idx.slice(date), direction[date], entry_price, sl, tp)
+        for i, s in enumerate(args.sl):
+            for j, t in enumerate(args.tp):
+                results.append({
+                    'Date': date,
+                    'Direction': direction[date],
+                    'Entry': entry_price,
+                    'SL': s,
+                    'TP': t,
+                    'ResultPts': pts[i, j].item()
+                })
+
+    if not results:
+        print("No breakout days in the selected years.")
+        return
+
+    # Summarize results by year
+    df_results = pd.DataFrame(results)
+    df_results['Year'] = df_results['Date'].dt.year
+
+    # Output results
+    print(f"Yearly Results ({'All Years' if yrs is None else args.year_range}) in Index Points:")
+    if len(args.sl) == 1 and len(args.tp) == 1:
+        print(df_results.groupby('Year')['ResultPts'].sum())
+    else:
+        print(df_results.pivot_table(index='Year', columns=['SL', 'TP'], values='ResultPts', aggfunc='sum'))
+        totals = df_results.groupby(['SL', 'TP'])['ResultPts'].sum().sort_values(ascending=False)
+        print("\nTotal by SL/TP:")
+        print(totals)
+
+if __name__ == "__main__":
+    main()
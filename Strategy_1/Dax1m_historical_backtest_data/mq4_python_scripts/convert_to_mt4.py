@@ -10,6 +10,7 @@ Main fixes compared with *mt4_converter_refactored_bkup.py*
    so the Strategy Tester never encounters zero-volume minutes.
 3. **Separate file suffix vs. header symbol** – `_OFFLINE` appended to the
    *filename* only, so the header stays exactly `GER30(£)` / `GER30`.
+   Each year gets its own files, e.g. `DEMO/GER30(£)1_2024_OFFLINE.hst`.
 4. **User-set spread** – stored in header *and* each record so you can
    override MT4’s “50-point while market closed” spread in the Tester.
 
@@ -18,6 +19,7 @@ Usage examples
     python convert_to_mt4.py 2024                       # one year
     python convert_to_mt4.py 2000-2024 --spread 2       # range, 2-pt spread
     python convert_to_mt4.py 2024 --limit_hours 07:00-21:00
+    python convert_to_mt4.py 2000-2024 --jobs 8         # years in 8 processes
 
 The script expects the raw Chicago-time CSV(s) named
 `dax_1m_YYYY.csv` in the same directory.
@@ -30,15 +32,22 @@ Lines   : ≈ 280 (including this docstring)
 import argparse
 import struct
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import time
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytz
 
 # ---------- MT4 509 layout constants ----------
 RATE_FORMAT = "<qddddqiq"          # 60 bytes per bar
 RATE_SIZE   = struct.calcsize(RATE_FORMAT)
+RATE_DTYPE  = np.dtype([           # same record, packed, for whole-array writes
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("volume", "<i8"), ("spread", "<i4"), ("real_volume", "<i8"),
+])
+assert RATE_DTYPE.itemsize == RATE_SIZE
 
 LONDON  = pytz.timezone("Europe/London")
 CHICAGO = pytz.timezone("America/Chicago")
@@ -58,6 +67,10 @@ def parse_args():
     p.add_argument(
         "--file_suffix", default="_OFFLINE", help="Suffix for output filenames."
     )
+    p.add_argument(
+        "--jobs", type=int, default=1,
+        help="Convert N years at once in worker processes (default 1).",
+    )
     return p.parse_args()
 
 # ---------- Helpers ----------
@@ -77,7 +90,7 @@ def read_raw_csv(year: int) -> pd.DataFrame:
     dt_col = pd.to_datetime(
         df["Date"] + " " + df["Time"], format="%Y.%m.%d %H:%M"
     ).dt.tz_localize(CHICAGO)
-    df.index = dt_col.tz_convert(LONDON)
+    df.index = dt_col.dt.tz_convert(LONDON)
     df = df[["Open", "High", "Low", "Close", "Volume"]].astype(float)
     return df
 
@@ -127,42 +140,83 @@ def write_hst(
     bars = len(df)
     with open(out_path, "wb") as f:
         f.write(build_header(symbol, digits, spread, bars))
-        for ts, row in df.iterrows():
-            utc_ms = int(ts.timestamp()) * 1000  # milliseconds
-            record = struct.pack(
-                RATE_FORMAT,
-                utc_ms,
-                row["Open"],
-                row["Low"],
-                row["High"],
-                row["Close"],
-                int(row["Volume"]),
-                0,  # spread kept in header
-                int(row["Volume"]),
-            )
-            f.write(record)
+        rates = np.zeros(bars, dtype=RATE_DTYPE)
+        utc_s = (df.index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+        rates["time"]  = utc_s * 1000  # milliseconds
+        rates["open"]  = df["Open"].to_numpy(dtype=np.float64)
+        # Low/High go into the 2nd/3rd slots in that order, as the per-bar pack did
+        rates["high"]  = df["Low"].to_numpy(dtype=np.float64)
+        rates["low"]   = df["High"].to_numpy(dtype=np.float64)
+        rates["close"] = df["Close"].to_numpy(dtype=np.float64)
+        vol = df["Volume"].to_numpy(dtype=np.float64).astype(np.int64)
+        rates["volume"] = vol
+        rates["real_volume"] = vol  # spread kept in header
+        rates.tofile(f)
+
+# ---------- per-year conversion ----------
+ACCOUNTS = (("DEMO", "GER30(£)"), ("LIVE", "GER30"))
+
+def output_paths(args, account: str, symbol: str, year: int):
+    base_name = f"{symbol}1_{year}{args.file_suffix}"
+    out_dir   = Path(account)
+    return out_dir / f"{base_name}.csv", out_dir / f"{base_name}.hst"
+
+def convert_year(y: int, args):
+    """Read, filter and write one year. Returns (year, bars written, messages)."""
+    df = read_raw_csv(y)
+    df = apply_filters(df, args.limit_hours)
+    if df.empty:
+        return y, 0, [f"No bars left after filtering for {y}"]
+
+    msgs = []
+    missing = (365 * 24 * 60) - len(df)
+    if missing:
+        msgs.append(f"Warning: {missing} minutes removed by filters for {y}")
+
+    for account, symbol in ACCOUNTS:
+        csv_path, hst_path = output_paths(args, account, symbol, y)
+        write_csv(df, csv_path, args.digits)
+        write_hst(df, symbol, hst_path, args.digits, args.spread)
+
+    msgs.append(f"{y}: wrote {len(df):,} bars → DEMO & LIVE")
+    return y, len(df), msgs
+
+def convert_years_parallel(years, args):
+    """
+    Years on args.jobs processes (each writes its own files); results are
+    reported in year order. A failed year cancels the ones not started yet.
+    """
+    with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+        futures = [ex.submit(convert_year, y, args) for y in years]
+        try:
+            for i, fut in enumerate(futures, 1):
+                y, bars, msgs = fut.result()
+                for m in msgs:
+                    print(f"[{i}/{len(years)}] {m}")
+                yield y, bars
+        except BaseException:
+            ex.shutdown(wait=False, cancel_futures=True)
+            raise
 
 # ---------- main ----------
 def main():
     args = parse_args()
-    for y in year_iter(args.years):
-        df = read_raw_csv(y)
-        df = apply_filters(df, args.limit_hours)
-        if df.empty:
-            print(f"No bars left after filtering for {y}")
-            continue
-
-        missing = (365 * 24 * 60) - len(df)
-        if missing:
-            print(f"Warning: {missing} minutes removed by filters for {y}")
-
-        for account, symbol in (("DEMO", "GER30(£)"), ("LIVE", "GER30")):
-            base_name = f"{symbol}1{args.file_suffix}"
-            out_dir   = Path(account)
-            write_csv(df, out_dir / f"{base_name}.csv", args.digits)
-            write_hst(df, symbol, out_dir / f"{base_name}.hst", args.digits, args.spread)
-
-        print(f"{y}: wrote {len(df):,} bars → DEMO & LIVE")
+    years = list(year_iter(args.years))
+    summary = []
+    if args.jobs > 1 and len(years) > 1:
+        summary = list(convert_years_parallel(years, args))
+    else:
+        for y in years:
+            _, bars, msgs = convert_year(y, args)
+            for m in msgs:
+                print(m)
+            summary.append((y, bars))
+
+    if len(summary) > 1:
+        print("Bars written per year:")
+        for y, bars in summary:
+            print(f"  {y}: {bars:>10,}")
+        print(f"  total: {sum(b for _, b in summary):>9,}")
 
 if __name__ == "__main__":
     main()
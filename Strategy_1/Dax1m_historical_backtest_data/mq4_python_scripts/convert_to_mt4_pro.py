@@ -8,18 +8,36 @@ Usage Examples:
     python mt4_converter_pro.py dax-1m.csv 2024 --combine_years
     python mt4_converter_pro.py dax-1m.csv 2024 --combine_years --symbol_suffix _OFFLINE
     python mt4_converter_pro.py dax-1m.csv 2000-2025
+    python mt4_converter_pro.py dax-1m.csv 2000-2025 --threads 4
+    python mt4_converter_pro.py dax-1m.csv 2000-2025 --chunk_rows 1000000
+    python mt4_converter_pro.py dax-1m.csv 2000-2025 --combine_years --append
     python mt4_converter_pro.py dax-1m.csv 2024 --single_day "2024-02-13"
+    python mt4_converter_pro.py dax-1m.csv 2024 --holidays 2024-12-24,2024-12-25 --fill_report
+    python mt4_converter_pro.py dax-1m.csv 2024 --spread schedule
 """
 
 import os
+import sys
+import pathlib
 import struct
 import argparse
 import logging
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import pytz
 import pandas as pd
 import numpy as np
 
+# Shared with the backtesters (Strategy_1/backtest): the raw-CSV offset bisect and
+# the intraday spread model behind --spread schedule.
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2] / "backtest"))
+from bar_cache import find_csv_offset, line_naive
+try:
+    from spread_schedule import SpreadTable
+    HAVE_SPREAD_SCHEDULE = True
+except ImportError:
+    HAVE_SPREAD_SCHEDULE = False
+
 # Constants for HST file format (version 509)
 HST_VERSION = 509
 HST_HEADER_FORMAT = (
@@ -42,9 +60,26 @@ RATE_FORMAT = (
     "i"   # spread
     "q"   # real volume (unused)
 )
+# The same 60-byte record as a NumPy dtype (packed, no alignment padding),
+# so a whole history is built as one array and written in one go.
+RATE_DTYPE = np.dtype([
+    ("time",        "<i8"),
+    ("open",        "<f8"),
+    ("high",        "<f8"),
+    ("low",         "<f8"),
+    ("close",       "<f8"),
+    ("volume",      "<i8"),
+    ("spread",      "<i4"),
+    ("real_volume", "<i8"),
+])
+assert RATE_DTYPE.itemsize == struct.calcsize(RATE_FORMAT)
+
+RAW_COLUMNS = ['Date', 'Time', 'Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_CHUNK_ROWS = 1_000_000   # --append without --chunk_rows
 
 # We always convert final times to London time
 TARGET_TZ = pytz.timezone("Europe/London")
+EPOCH_UTC = pd.Timestamp(0, tz="UTC")
 
 def setup_logging(verbose: bool):
     level = logging.DEBUG if verbose else logging.INFO
@@ -59,8 +94,10 @@ def parse_args():
                         help="Directory for output files")
     parser.add_argument("--digits", type=int, default=1,
                         help="Decimal places for prices (default: 1)")
-    parser.add_argument("--spread", type=int, default=0,
-                        help="Spread in points for HST records")
+    parser.add_argument("--spread", type=parse_spread, default=0,
+                        help="Spread in points for HST records, or 'schedule' for the per-minute "
+                             "SPREAD_SCHEDULE of the backtester, applied in London wall time "
+                             "(scaled by --digits)")
     parser.add_argument("--copyright", default="(C) Processed by script",
                         help="Copyright string for HST header")
     # Defaulting to Chicago time here, since your purchased data is from Chicago time
@@ -69,6 +106,11 @@ def parse_args():
     parser.add_argument("--no_remove_weekends", action="store_true",
                         dest="keep_weekends",
                         help="Keep weekend data (default: remove Saturdays/Sundays)")
+    parser.add_argument("--holidays", type=load_holidays, default=None,
+                        help="London dates with no session, dropped like weekends: comma-separated "
+                             "YYYY-MM-DD and/or files with one date per line")
+    parser.add_argument("--fill_report", action="store_true",
+                        help="Write fill_report_<year|combined>.csv (Date,Bars,Filled per session day)")
     parser.add_argument("--verbose", action="store_true",
                         help="Enable debug logging")
     parser.add_argument("--symbol_suffix", default="",
@@ -76,6 +118,16 @@ def parse_args():
     parser.add_argument("--combine_years", action="store_true",
                         help="Generate a single HST/CSV file for all specified years")
 
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Write each year's HST/CSV/raw outputs on N threads (default: 1)")
+    parser.add_argument("--chunk_rows", type=int, default=0,
+                        help="Read the CSV N rows at a time and append each year's outputs as it "
+                             "goes, so memory stays bounded by one chunk. Rows must be in time "
+                             "order. Not used with --single_day (default: 0 = whole file)")
+    parser.add_argument("--append", action="store_true",
+                        help="Extend existing outputs in place: only input rows after the last "
+                             "bar already in each HST/CSV are converted (implies chunked reading)")
+
     # NEW ARGUMENT for single-day export
     parser.add_argument("--single_day",
                         help="Export only one YYYY-MM-DD day to a single text file (raw + converted).")
@@ -96,9 +148,40 @@ def read_raw_csv(path: str):
     Creates a 'datetime' column as naive (no timezone yet).
     """
     logging.info(f"Reading raw CSV: {path}")
-    cols = ['Date', 'Time', 'Open', 'High', 'Low', 'Close', 'Volume']
-    df_raw = pd.read_csv(path, sep=';', header=None, names=cols, dayfirst=True, dtype=str)
+    df_raw = pd.read_csv(path, sep=';', header=None, names=RAW_COLUMNS, dayfirst=True, dtype=str)
+    return _parse_raw(df_raw)
 
+def iter_raw_chunks(path: str, chunk_rows: int, offset: int = 0):
+    """
+    read_raw_csv in pieces of chunk_rows lines, starting at byte offset. Prices
+    are always float64 so the raw segments print them the same way whichever
+    chunk a row lands in.
+    """
+    logging.info(f"Reading raw CSV in chunks of {chunk_rows} rows from byte {offset}: {path}")
+    with open(path, 'rb') as fh:
+        fh.seek(offset)
+        reader = pd.read_csv(fh, sep=';', header=None, names=RAW_COLUMNS,
+                             dtype=str, chunksize=chunk_rows)
+        for chunk in reader:
+            chunk = _parse_raw(chunk)
+            chunk[['Open','High','Low','Close']] = chunk[['Open','High','Low','Close']].astype(np.float64)
+            yield chunk
+
+def read_last_line(path: str) -> bytes:
+    """Last non-empty line of a file, reading only its tail."""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        block = 4096
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            lines = f.read(size - start).rstrip(b'\r\n').splitlines()
+            if len(lines) > 1 or start == 0:
+                return lines[-1] if lines else b''
+            block *= 2
+
+def _parse_raw(df_raw: pd.DataFrame):
+    """Numeric OHLCV + naive 'datetime' for the string columns; drops unparsable rows."""
     # Convert numeric columns
     for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
         df_raw[col] = pd.to_numeric(
@@ -114,103 +197,370 @@ def read_raw_csv(path: str):
     df_raw.dropna(subset=['datetime','Open','High','Low','Close','Volume'], inplace=True)
     return df_raw
 
+def to_london(naive: pd.Series, tz_local: pytz.timezone) -> pd.Series:
+    """Localize naive times to tz_local, then convert to London time."""
+    dt_local = naive.dt.tz_localize(
+        tz_local,
+        nonexistent='shift_forward',
+        ambiguous='NaT'
+    )
+    return dt_local.dt.tz_convert(TARGET_TZ)
+
 def localize_and_clean(df_raw: pd.DataFrame, tz_local: pytz.timezone):
     """
     1) Localize naive df_raw['datetime'] to tz_local (e.g. America/Chicago)
     2) Convert to London time
     3) Create final df with index=dt_london
     """
-    # Localize naive => tz_local
-    df_raw['dt_local'] = df_raw['datetime'].dt.tz_localize(
-        tz_local,
-        nonexistent='shift_forward',
-        ambiguous='NaT'
-    )
-    # Convert local => London
-    df_raw['dt_london'] = df_raw['dt_local'].dt.tz_convert(TARGET_TZ)
+    df_raw['dt_london'] = to_london(df_raw['datetime'], tz_local)
 
     df = df_raw.set_index('dt_london')[['Open','High','Low','Close','Volume']].copy()
     df.sort_index(inplace=True)
     return df
 
-def fill_missing_minutes(df: pd.DataFrame, keep_weekends: bool):
+def parse_spread(spec: str):
+    """--spread: a fixed spread in points, or 'schedule' for the backtester's per-minute SpreadTable."""
+    if spec.strip().lower() != "schedule":
+        return int(spec)
+    if not HAVE_SPREAD_SCHEDULE:
+        raise argparse.ArgumentTypeError("--spread schedule needs Strategy_1/backtest/spread_schedule.py")
+    return SpreadTable()
+
+def load_holidays(spec: str) -> set:
+    """--holidays: comma-separated YYYY-MM-DD dates and/or files with one date per line (# comments)."""
+    days = set()
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if os.path.isfile(item):
+            with open(item) as f:
+                for line in f:
+                    line = line.split('#')[0].strip()
+                    if line:
+                        days.add(datetime.strptime(line, "%Y-%m-%d").date())
+        else:
+            days.add(datetime.strptime(item, "%Y-%m-%d").date())
+    return days
+
+def session_minutes(first: int, last: int, keep_weekends: bool, holidays=None):
     """
-    Reindex to fill every minute between min and max times.
-    Forward-fill O/H/L/C.
-    Optionally remove weekends.
+    Trading-session intervals as a minute grid: the UTC epoch seconds first,
+    first+60, ... <= last that fall on London session days (Mon-Fri, or every
+    day with keep_weekends, minus the *holidays* dates). Built per day interval,
+    never over the whole span. Returns (seconds, day number of each minute,
+    London midnights of the session days).
     """
-    start, end = df.index.min(), df.index.max()
-    full_idx = pd.date_range(start, end, freq='min', tz=TARGET_TZ)
-    df = df.reindex(full_idx)
-    missing = df['Open'].isna().sum()
+    lo = pd.Timestamp(first, unit='s', tz='UTC').tz_convert(TARGET_TZ).normalize()
+    hi = pd.Timestamp(last, unit='s', tz='UTC').tz_convert(TARGET_TZ).normalize()
+    midnights = pd.date_range(lo, hi + pd.Timedelta(days=1), freq='D')
+    bounds = np.asarray((midnights - EPOCH_UTC) // pd.Timedelta(seconds=1), dtype=np.int64)
+    days = midnights[:-1]
+    keep = np.ones(len(days), dtype=bool)
+    if not keep_weekends:
+        keep &= days.weekday < 5
+    if holidays:
+        keep &= ~np.isin(np.array(days.date), list(holidays))
+    days = days[keep]
+    s = np.maximum(bounds[:-1][keep], first)
+    e = np.minimum(bounds[1:][keep] - 1, last)
+    s = first + (s - first + 59) // 60 * 60        # first grid minute of each interval
+    counts = np.where(e >= s, (e - s) // 60 + 1, 0)
+    day = np.repeat(np.arange(len(days)), counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(s, counts) + step * 60, day, days
+
+def fill_missing_minutes(df: pd.DataFrame, keep_weekends: bool, holidays=None, report=None):
+    """
+    Every minute from the first to the last bar on London session days
+    (weekends removed unless keep_weekends; *holidays* dates removed too).
+    O/H/L/C are forward-filled from the latest real bar, filled volume is 0.
+    report: optional dict, updated with {date: [bars, filled]} per session day.
+    """
+    df = df[df.index.notna()]
+    if df.empty:
+        return df[['Open','High','Low','Close','Volume']]
+    df, _, missing = fill_minutes_after(df, None, keep_weekends, holidays, report)
     if missing:
         logging.info(f"Filling {missing} missing minutes (OHLC ffill).")
-        df[['Open','High','Low','Close']] = df[['Open','High','Low','Close']].ffill()
-        df['Volume'] = df['Volume'].fillna(0).astype(int)
+    logging.debug(f"Session minutes: {len(df)} rows.")
+    return df
 
-    if not keep_weekends:
-        before = len(df)
-        df = df[~df.index.weekday.isin([5,6])]
-        after = len(df)
-        logging.debug(f"Removed weekends: from {before} to {after} rows.")
+def fill_minutes_after(df: pd.DataFrame, last: pd.DataFrame, keep_weekends: bool,
+                       holidays=None, report=None):
+    """
+    fill_missing_minutes for one time-sorted piece of a longer series. The
+    minute grid and the forward fill continue from *last* (the final grid
+    row of the previous piece, or None for the first piece), so the pieces
+    together give exactly the rows fill_missing_minutes gives for the whole.
+
+    The grid is anchored at the first bar; only its session minutes are
+    generated (session_minutes) and each takes the latest real bar on the
+    grid at or before it, so bars on excluded days still carry the fill
+    across them. Returns (filled rows after *last*, new last row, minutes filled).
+    """
+    if not df.index.is_unique:
+        raise ValueError("Duplicate timestamps after localization; cannot fill minutes")
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    cols = ['Open','High','Low','Close']
+    t = np.asarray((df.index - EPOCH_UTC) // pd.Timedelta(seconds=1), dtype=np.int64)
+    ohlc = df[cols].to_numpy(dtype=np.float64)
+    vol = df['Volume'].to_numpy(dtype=np.float64).astype(np.int64)  # int() truncation
+    if last is not None:
+        if df.index[0] <= last.index[0]:
+            raise ValueError(f"Rows out of time order at {df.index[0]} (after {last.index[0]}); "
+                             "sort the input or convert without --chunk_rows")
+        t = np.concatenate(([(last.index[0] - EPOCH_UTC) // pd.Timedelta(seconds=1)], t))
+        ohlc = np.vstack([last[cols].to_numpy(dtype=np.float64), ohlc])
+        vol = np.concatenate((last['Volume'].to_numpy(dtype=np.int64), vol))
+
+    # bars off the minute grid never make it into the output (nor into the fill)
+    anchor = t[0]
+    end = anchor + (t[-1] - anchor) // 60 * 60
+    on_grid = (t - anchor) % 60 == 0
+    t, ohlc, vol = t[on_grid], ohlc[on_grid], vol[on_grid]
+
+    secs, day, days = session_minutes(anchor + 60 if last is not None else anchor,
+                                      end, keep_weekends, holidays)
+    pos = np.searchsorted(t, secs, side='right') - 1
+    real = t[pos] == secs
+    index = pd.to_datetime(secs, unit='s', utc=True).tz_convert(TARGET_TZ)
+    out = pd.DataFrame(ohlc[pos], index=index, columns=cols)
+    out['Volume'] = np.where(real, vol[pos], 0)
+
+    new_last = pd.DataFrame(ohlc[-1:], columns=cols,
+                            index=pd.to_datetime([end], unit='s', utc=True).tz_convert(TARGET_TZ))
+    new_last['Volume'] = vol[-1] if t[-1] == end else 0
+
+    if report is not None:
+        bars = np.bincount(day, minlength=len(days))
+        filled = np.bincount(day[~real], minlength=len(days))
+        for d, b, f in zip(days.date, bars.tolist(), filled.tolist()):
+            if b:
+                r = report.setdefault(d, [0, 0])
+                r[0] += b
+                r[1] += f
+    return out, new_last, int(len(secs) - real.sum())
+
+def write_fill_report(report: dict, filepath: str):
+    """Date,Bars,Filled per session day, as collected by fill_missing_minutes."""
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, 'w', newline='') as f:
+        f.write("Date,Bars,Filled" + os.linesep)
+        for d in sorted(report):
+            f.write(f"{d:%Y-%m-%d},{report[d][0]},{report[d][1]}" + os.linesep)
+    logging.info(f"Wrote fill report ({sum(r[1] for r in report.values())} filled minutes): {filepath}")
+
+def build_rates(df: pd.DataFrame, spread, digits: int) -> np.ndarray:
+    """
+    All bars of df as one RATE_DTYPE array: UTC epoch seconds, float OHLC,
+    volume truncated to int (as int(row['Volume']) did), and the spread:
+    either a fixed int or, for a SpreadTable, per bar from its London minute of day.
+    """
+    rates = np.zeros(len(df), dtype=RATE_DTYPE)
+    rates["time"]   = (df.index - EPOCH_UTC) // pd.Timedelta(seconds=1)
+    rates["open"]   = df["Open"].to_numpy(dtype=np.float64)
+    rates["high"]   = df["High"].to_numpy(dtype=np.float64)
+    rates["low"]    = df["Low"].to_numpy(dtype=np.float64)
+    rates["close"]  = df["Close"].to_numpy(dtype=np.float64)
+    rates["volume"] = df["Volume"].to_numpy(dtype=np.float64).astype(np.int64)
+    if isinstance(spread, int):
+        rates["spread"] = spread
+    else:
+        rates["spread"] = spread.points(wall_seconds(df.index) // 60, digits)
+    return rates
 
-    return df
+def process_years(df_raw: pd.DataFrame, tz_local: pytz.timezone,
+                  years: list, keep_weekends: bool, holidays=None, reports=None):
+    """
+    Per-year pipeline over ONE parse: localize every requested row in a single
+    pass, then split by (source-time) year with one groupby. Yields
+    (year, raw rows of that year, processed frame); the processed frame is
+    exactly what localize_and_clean + fill_missing_minutes give for that
+    year's rows on their own. With a *reports* dict, reports[year] gets that
+    year's per-day fill counts.
+    """
+    df_sub = df_raw[df_raw['datetime'].dt.year.isin(years)]
+    if df_sub.empty:
+        return
+    df_sub = df_sub.assign(dt_london=to_london(df_sub['datetime'], tz_local))
+    for y, df_y in df_sub.groupby(df_sub['datetime'].dt.year, sort=True):
+        df = df_y.set_index('dt_london')[['Open','High','Low','Close','Volume']]
+        df = df.sort_index()
+        report = reports.setdefault(int(y), {}) if reports is not None else None
+        yield int(y), df_y, fill_missing_minutes(df, keep_weekends, holidays, report)
+
+def write_year_outputs(y: int, df_raw_y: pd.DataFrame, df_y: pd.DataFrame,
+                       configs: list, args, pool=None, report=None):
+    """
+    2 HST + 2 CSV for one year, plus its raw segment (and fill report, if
+    given); optionally on a thread pool.
+    """
+    tasks = []
+    if df_y.empty:
+        logging.warning(f"No processed data for year {y} after localization.")
+    else:
+        for cfg in configs:
+            base = os.path.join(args.output_base_dir, cfg["env"])
+            hst_fn = f"{cfg['file_sym']}1_{y}.hst"
+            csv_fn = f"{cfg['file_sym']}1_{y}.csv"
+            tasks.append((create_hst, (df_y, os.path.join(base, hst_fn),
+                                       cfg['hdr_sym'], 1, args.digits,
+                                       args.copyright, args.spread)))
+            tasks.append((create_csv, (df_y, os.path.join(base, csv_fn), args.digits)))
+    raw_out = os.path.join(args.output_base_dir, "raw_segments", f"raw_segment_{y}.csv")
+    tasks.append((_write_raw_csv, (df_raw_y.copy(), raw_out)))
+    if report is not None:
+        tasks.append((write_fill_report,
+                      (report, os.path.join(args.output_base_dir, f"fill_report_{y}.csv"))))
+
+    os.makedirs(os.path.dirname(raw_out), exist_ok=True)
+    if pool is None:
+        for fn, a in tasks:
+            fn(*a)
+    else:
+        for fut in [pool.submit(fn, *a) for fn, a in tasks]:
+            fut.result()
+    logging.info(f"Wrote RAW CSV for year {y} => {raw_out}")
+
+CSV_COLUMNS = ("<DATE>", "<TIME>", "<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<VOLUME>")
+CSV_CHUNK_ROWS = 1 << 16
+
+def format_fixed(values, digits: int) -> np.ndarray:
+    """
+    f"{v:.{digits}f}" for a whole float array without a Python call per value:
+    |v| is scaled to an integer and its integer/fraction digits are joined as
+    strings. Values whose scaled form lies within rounding error of a half
+    (there the decimal rounding of the binary value decides), non-finite and
+    very large values are formatted by Python instead, so the text is identical.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    scale = 10 ** digits
+    scaled = np.abs(x) * scale
+    with np.errstate(invalid="ignore"):
+        fast = (np.isfinite(scaled) & (scaled < 1e9)
+                & (np.abs(scaled - np.floor(scaled) - 0.5) > 1e-6))
+    k = np.rint(np.where(fast, scaled, 0.0)).astype(np.int64)
+    out = (k // scale).astype(str)
+    if digits > 0:
+        frac = np.char.zfill((k % scale).astype(str), digits)
+        out = np.char.add(np.char.add(out, "."), frac)
+    out = np.where(np.signbit(x), np.char.add("-", out), out)
+    slow = np.flatnonzero(~fast)
+    if len(slow):
+        txt = [f"{v:.{digits}f}" for v in x[slow].tolist()]
+        width = max(out.dtype.itemsize // 4, max(map(len, txt)))
+        out = out.astype(f"<U{width}")
+        out[slow] = txt
+    return out
+
+def wall_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """Seconds since 1970-01-01 of the local wall time of *index* (int64)."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return np.asarray((index - pd.Timestamp(0)) // pd.Timedelta(seconds=1), dtype=np.int64)
+
+def wall_date_time_strings(index: pd.DatetimeIndex):
+    """
+    ('%Y.%m.%d', '%H:%M:%S') string arrays for the local wall time of *index*.
+    Each distinct day and time of day is formatted once and gathered by position.
+    """
+    days, sod = np.divmod(wall_seconds(index), 86400)
+    out = []
+    for keys, unit, fmt in ((days, "D", "%Y.%m.%d"), (sod, "s", "%H:%M:%S")):
+        uniq, inv = np.unique(keys, return_inverse=True)
+        table = np.asarray(pd.to_datetime(uniq, unit=unit).strftime(fmt), dtype=str)
+        out.append(table[inv.reshape(-1)])
+    return out[0], out[1]
+
+def render_csv_lines(df: pd.DataFrame, digits: int) -> str:
+    """<DATE>,<TIME>,<OPEN>,<HIGH>,<LOW>,<CLOSE>,<VOLUME> lines for df, each ending in os.linesep."""
+    dates, times = wall_date_time_strings(df.index)
+    cols = [times]
+    cols += [format_fixed(df[c].to_numpy(), digits) for c in ("Open", "High", "Low", "Close")]
+    cols.append(df['Volume'].astype(int).to_numpy().astype(str))
+    line = dates
+    for col in cols:
+        line = np.char.add(np.char.add(line, ","), col)
+    return os.linesep.join(line.tolist()) + os.linesep
+
+def write_mt4_csv(df: pd.DataFrame, filepath: str, digits: int,
+                  chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Same text as DataFrame.to_csv(index=False) of the <DATE>..<VOLUME> frame,
+    rendered column-wise chunk_rows lines at a time (bounds the string arrays).
+    """
+    with open(filepath, 'w', newline='') as f:
+        f.write(",".join(CSV_COLUMNS) + os.linesep)
+        write_csv_rows(f, df, digits, chunk_rows)
+
+def write_csv_rows(f, df: pd.DataFrame, digits: int, chunk_rows: int = CSV_CHUNK_ROWS):
+    """The data lines of write_mt4_csv, appended to the open text file f."""
+    for s in range(0, len(df), chunk_rows):
+        f.write(render_csv_lines(df.iloc[s:s + chunk_rows], digits))
 
 def create_hst(df: pd.DataFrame, filepath: str, symbol: str,
-               period: int, digits: int, copy_str: str, spread: int):
+               period: int, digits: int, copy_str: str, spread):
     """
     Writes an HST v509 file with the processed data.
     """
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
     with open(filepath, 'wb') as f:
-        sym_bytes = symbol.encode('cp1252', errors='replace')[:11].ljust(12,b'\0')
-        copy_bytes = copy_str.encode('ascii', errors='replace')[:63].ljust(64,b'\0')
-        timestamp = int(datetime.now(timezone.utc).timestamp())
-        header = struct.pack(
-            HST_HEADER_FORMAT,
-            HST_VERSION,       # version
-            copy_bytes,        # copyright
-            sym_bytes,         # symbol
-            period,            # period
-            digits,            # digits
-            timestamp,         # creation timestamp
-            0,                 # last sync
-            b'\0'*52           # reserved
-        )
-        f.write(header)
+        write_hst_header(f, symbol, period, digits, copy_str)
 
         # Write bar data
-        for ts, row in df.iterrows():
-            data = struct.pack(
-                RATE_FORMAT,
-                int(ts.timestamp()),      # time as int64
-                float(row['Open']),       # open
-                float(row['High']),       # high
-                float(row['Low']),        # low
-                float(row['Close']),      # close
-                int(row['Volume']),       # volume
-                spread,                   # spread
-                0                         # real volume
-            )
-            f.write(data)
+        build_rates(df, spread, digits).tofile(f)
     logging.info(f"Wrote HST: {filepath}")
 
+def write_hst_header(f, symbol: str, period: int, digits: int, copy_str: str):
+    """The 148-byte v509 header; bars follow it with no count, so they can be appended."""
+    sym_bytes = symbol.encode('cp1252', errors='replace')[:11].ljust(12,b'\0')
+    copy_bytes = copy_str.encode('ascii', errors='replace')[:63].ljust(64,b'\0')
+    timestamp = int(datetime.now(timezone.utc).timestamp())
+    header = struct.pack(
+        HST_HEADER_FORMAT,
+        HST_VERSION,       # version
+        copy_bytes,        # copyright
+        sym_bytes,         # symbol
+        period,            # period
+        digits,            # digits
+        timestamp,         # creation timestamp
+        0,                 # last sync
+        b'\0'*52           # reserved
+    )
+    f.write(header)
+
+def read_hst_last_bar(filepath: str, digits: int) -> pd.DataFrame:
+    """
+    Final bar of an HST written by this script, as a one-row London-indexed
+    OHLCV frame (None if it has no bars). Checks version, digits and layout.
+    """
+    hsize = struct.calcsize(HST_HEADER_FORMAT)
+    with open(filepath, 'rb') as f:
+        header = struct.unpack(HST_HEADER_FORMAT, f.read(hsize))
+        size = f.seek(0, os.SEEK_END)
+        if header[0] != HST_VERSION or header[4] != digits:
+            raise ValueError(f"{filepath}: version {header[0]}, digits {header[4]}; "
+                             f"expected {HST_VERSION}, {digits}")
+        if (size - hsize) % RATE_DTYPE.itemsize:
+            raise ValueError(f"{filepath}: truncated bar record at the end")
+        if size == hsize:
+            return None
+        f.seek(size - RATE_DTYPE.itemsize)
+        bar = np.frombuffer(f.read(RATE_DTYPE.itemsize), dtype=RATE_DTYPE)[0]
+    ts = pd.Timestamp(int(bar["time"]), unit='s', tz='UTC').tz_convert(TARGET_TZ)
+    return pd.DataFrame({'Open': [bar["open"]], 'High': [bar["high"]], 'Low': [bar["low"]],
+                         'Close': [bar["close"]], 'Volume': [int(bar["volume"])]},
+                        index=pd.DatetimeIndex([ts]))
+
 def create_csv(df: pd.DataFrame, filepath: str, digits: int):
     """
     Creates a CSV in standard <DATE>,<TIME>,<OPEN>... format for MT4 or other analysis.
     By default: YYYY.MM.DD in <DATE>.
     """
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    out = pd.DataFrame({
-        '<DATE>': df.index.strftime('%Y.%m.%d'),
-        '<TIME>': df.index.strftime('%H:%M:%S'),
-        '<OPEN>': df['Open'].map(lambda x: f"{x:.{digits}f}"),
-        '<HIGH>': df['High'].map(lambda x: f"{x:.{digits}f}"),
-        '<LOW>': df['Low'].map(lambda x: f"{x:.{digits}f}"),
-        '<CLOSE>': df['Close'].map(lambda x: f"{x:.{digits}f}"),
-        '<VOLUME>': df['Volume'].astype(int)
-    })
-    out.to_csv(filepath, index=False)
+    write_mt4_csv(df, filepath, digits)
     logging.info(f"Wrote CSV: {filepath}")
 
 def create_raw_segment_csv(df_raw: pd.DataFrame, outfile: str, years: list, combine: bool):
@@ -239,11 +589,12 @@ def create_raw_segment_csv(df_raw: pd.DataFrame, outfile: str, years: list, comb
             _write_raw_csv(df_y, outy)
             logging.info(f"Wrote RAW CSV for year {y} => {outy}")
 
-def _write_raw_csv(df_segment: pd.DataFrame, filepath: str):
+def _write_raw_csv(df_segment: pd.DataFrame, filepath):
     """
     Writes data in semicolon-delimited format:
       Date;Time;Open;High;Low;Close;Volume
-    with dayfirst date (dd/mm/YYYY).
+    with dayfirst date (dd/mm/YYYY). filepath may also be an open text file
+    (newline=''), which the rows are appended to.
     """
     df_segment.sort_values(by='datetime', inplace=True)
     df_segment['DateStr'] = df_segment['datetime'].dt.strftime('%d/%m/%Y')
@@ -251,6 +602,207 @@ def _write_raw_csv(df_segment: pd.DataFrame, filepath: str):
     df_segment[['DateStr','TimeStr','Open','High','Low','Close','Volume']] \
         .to_csv(filepath, sep=';', index=False, header=False)
 
+# ---------------------------------------------------------------------------
+# Chunked mode (--chunk_rows)
+# ---------------------------------------------------------------------------
+class ChunkedOutput:
+    """
+    One output set (a year, or the --combine_years span) written piece by piece:
+    2 HST + 2 CSV and the raw segment, appended in time order. Files are opened
+    on the first rows they receive; between pieces only the last filled bar is
+    kept, to continue the minute grid and the forward fill.
+    """
+    def __init__(self, year, configs: list, args):
+        self.year = year        # None => combined output
+        self.configs = configs
+        self.args = args
+        self.label = f"year {year}" if year is not None else f"combined years {parse_years(args.years)}"
+        self.last = None
+        self.bars = 0
+        self.missing = 0
+        self.report = {} if args.fill_report else None
+        self.bar_files = []     # [(hst, csv), ...] per config
+        self.raw_file = None
+        self.after = None       # --append: (last London bar, last raw source time) already written
+
+    def _path(self, cfg, ext):
+        tag = f"_{self.year}" if self.year is not None else ""
+        return os.path.join(self.args.output_base_dir, cfg["env"], f"{cfg['file_sym']}1{tag}{ext}")
+
+    def _raw_path(self):
+        tag = self.year if self.year is not None else "combined"
+        return os.path.join(self.args.output_base_dir, "raw_segments", f"raw_segment_{tag}.csv")
+
+    def _open_bar_files(self):
+        for cfg in self.configs:
+            hst_path, csv_path = self._path(cfg, ".hst"), self._path(cfg, ".csv")
+            os.makedirs(os.path.dirname(hst_path), exist_ok=True)
+            hst = open(hst_path, 'wb')
+            write_hst_header(hst, cfg['hdr_sym'], 1, self.args.digits, self.args.copyright)
+            csv = open(csv_path, 'w', newline='')
+            csv.write(",".join(CSV_COLUMNS) + os.linesep)
+            self.bar_files.append((hst, csv))
+
+    def resume(self) -> bool:
+        """
+        --append: continue this set's existing files. The last HST bar restores
+        the minute grid and forward-fill state, the CSVs must end on that same
+        bar, and the raw segment's last line bounds the raw rows still to add.
+        Returns False when the set has no files yet.
+        """
+        paths = [self._path(cfg, ext) for cfg in self.configs for ext in (".hst", ".csv")]
+        paths.append(self._raw_path())
+        missing = [p for p in paths if not os.path.exists(p)]
+        if len(missing) == len(paths):
+            return False
+        if missing:
+            raise ValueError(f"--append: {self.label} is missing {', '.join(missing)}; "
+                             "rebuild it without --append")
+        lasts = [read_hst_last_bar(self._path(cfg, ".hst"), self.args.digits) for cfg in self.configs]
+        last = lasts[0]
+        if last is None or any(l is None or l.index[0] != last.index[0] for l in lasts):
+            raise ValueError(f"--append: HST files of {self.label} do not end on the same bar")
+        stamp = last.index[0].strftime('%Y.%m.%d,%H:%M:%S').encode()
+        for cfg in self.configs:
+            if not read_last_line(self._path(cfg, ".csv")).startswith(stamp):
+                raise ValueError(f"--append: {self._path(cfg, '.csv')} does not end on the HST's "
+                                 f"last bar {last.index[0]}; rebuild it without --append")
+        raw_last = line_naive(read_last_line(self._raw_path()))
+        if raw_last is None:
+            raise ValueError(f"--append: cannot read the last row of {self._raw_path()}")
+
+        self.last = last
+        self.after = (last.index[0], pd.Timestamp(raw_last))
+        for cfg in self.configs:
+            self.bar_files.append((open(self._path(cfg, ".hst"), 'ab'),
+                                   open(self._path(cfg, ".csv"), 'a', newline='')))
+        self.raw_file = open(self._raw_path(), 'a', newline='')
+        return True
+
+    def resume_from(self, tz_local: pytz.timezone) -> datetime:
+        """Source-time point to start reading the input from (a day of margin)."""
+        london, raw = self.after
+        src = london.tz_convert(tz_local).tz_localize(None)
+        return min(src, raw).to_pydatetime() - timedelta(days=1)
+
+    def add(self, df_raw: pd.DataFrame, df: pd.DataFrame, pool=None):
+        """Append raw rows and their London-indexed OHLCV rows (sorted, no NaT)."""
+        if self.after is not None:
+            df_raw = df_raw[df_raw['datetime'] > self.after[1]]
+            df = df[df.index > self.after[0]]
+        tasks = []
+        if not df_raw.empty:
+            if self.raw_file is None:
+                os.makedirs(os.path.dirname(self._raw_path()), exist_ok=True)
+                self.raw_file = open(self._raw_path(), 'w', newline='')
+            tasks.append((_write_raw_csv, (df_raw.copy(), self.raw_file)))
+        if not df.empty:
+            filled, self.last, missing = fill_minutes_after(df, self.last, self.args.keep_weekends,
+                                                            self.args.holidays, self.report)
+            self.missing += missing
+            if not filled.empty:
+                if not self.bar_files:
+                    self._open_bar_files()
+                self.bars += len(filled)
+                rates = build_rates(filled, self.args.spread, self.args.digits)
+                for hst, csv in self.bar_files:
+                    tasks.append((rates.tofile, (hst,)))
+                    tasks.append((write_csv_rows, (csv, filled, self.args.digits)))
+        if pool is None:
+            for fn, a in tasks:
+                fn(*a)
+        else:
+            for fut in [pool.submit(fn, *a) for fn, a in tasks]:
+                fut.result()
+
+    def close(self):
+        for hst, csv in self.bar_files:
+            hst.close()
+            csv.close()
+        if self.raw_file:
+            self.raw_file.close()
+        if self.missing:
+            logging.info(f"Filled {self.missing} missing minutes (OHLC ffill) for {self.label}.")
+        if self.after is not None:
+            for cfg in self.configs:
+                logging.info(f"Appended {self.bars} bars: {self._path(cfg, '.hst')}")
+        elif self.bar_files:
+            for cfg in self.configs:
+                logging.info(f"Wrote HST + CSV ({self.bars} bars): {self._path(cfg, '.hst')}")
+        else:
+            logging.warning(f"No processed data for {self.label} after localization.")
+        if self.raw_file:
+            logging.info(f"Wrote RAW CSV for {self.label} => {self._raw_path()}")
+        if self.report is not None:
+            tag = self.year if self.year is not None else "combined"
+            write_fill_report(self.report,
+                              os.path.join(self.args.output_base_dir, f"fill_report_{tag}.csv"))
+
+def convert_chunked(args, tz_local: pytz.timezone, years: list, configs: list):
+    """
+    Year (or combined) outputs straight from the CSV, args.chunk_rows rows at a
+    time: each chunk is parsed, localized and appended to its output set, so
+    peak memory is one chunk rather than the whole file. Gives the same files
+    as the in-memory path for input in time order (the raw segments keep file
+    order across chunks instead of re-sorting the whole year).
+
+    With --append, output sets that already exist are resumed (see
+    ChunkedOutput.resume) and the input is only read from shortly before the
+    earliest point any requested output still needs.
+    """
+    outputs = {}
+    offset = 0
+    if args.append:
+        starts = []
+        for y in ([None] if args.combine_years else years):
+            out = ChunkedOutput(y, configs, args)
+            try:
+                resumed = out.resume()
+            except Exception:
+                for o in outputs.values():
+                    o.close()
+                raise
+            if resumed:
+                outputs[y] = out
+                starts.append(out.resume_from(tz_local))
+            elif y is not None:
+                starts.append(datetime(y, 1, 1))
+            else:
+                starts = []
+        if starts:
+            offset = find_csv_offset(args.input_csv, min(starts))
+
+    pool = ThreadPoolExecutor(max_workers=args.threads) if args.threads > 1 else None
+    try:
+        for chunk in iter_raw_chunks(args.input_csv, args.chunk_rows or DEFAULT_CHUNK_ROWS, offset):
+            chunk = chunk[chunk['datetime'].dt.year.isin(years)]
+            if chunk.empty:
+                continue
+            chunk = chunk.assign(dt_london=to_london(chunk['datetime'], tz_local))
+            if args.combine_years:
+                groups = [(None, chunk)]
+            else:
+                groups = chunk.groupby(chunk['datetime'].dt.year, sort=True)
+            for y, df_raw_y in groups:
+                y = None if y is None else int(y)
+                if y not in outputs:
+                    outputs[y] = ChunkedOutput(y, configs, args)
+                df = df_raw_y.set_index('dt_london')[['Open','High','Low','Close','Volume']]
+                df = df[df.index.notna()].sort_index()
+                outputs[y].add(df_raw_y, df, pool)
+    finally:
+        for out in outputs.values():
+            out.close()
+        if pool:
+            pool.shutdown()
+    if args.combine_years:
+        if not outputs:
+            logging.warning(f"No raw data for combined years {years}")
+    else:
+        for y in years:
+            if y not in outputs:
+                logging.warning(f"No raw data for year {y}")
+
 def main():
     args = parse_args()
     setup_logging(args.verbose)
@@ -262,11 +814,13 @@ def main():
         logging.error(f"Invalid timezone '{args.input_timezone}': {e}")
         return
 
-    # 2) Read raw CSV
-    df_raw = read_raw_csv(args.input_csv)
-    if df_raw.empty:
-        logging.error("No valid data in raw CSV. Check input file.")
-        return
+    # 2) Read raw CSV (left to the chunked writer with --chunk_rows)
+    chunked = (args.chunk_rows > 0 or args.append) and not args.single_day
+    if not chunked:
+        df_raw = read_raw_csv(args.input_csv)
+        if df_raw.empty:
+            logging.error("No valid data in raw CSV. Check input file.")
+            return
 
     # ============ SINGLE-DAY MODE ====================================
     if args.single_day:
@@ -285,7 +839,7 @@ def main():
         
         # Localize + fill
         df_day_local = localize_and_clean(df_day_raw, tz_local)
-        df_day_filled = fill_missing_minutes(df_day_local, args.keep_weekends)
+        df_day_filled = fill_missing_minutes(df_day_local, args.keep_weekends, args.holidays)
         if df_day_filled.empty:
             logging.warning(f"No processed data left after fill_missing for {single_str}")
             return
@@ -330,10 +884,17 @@ def main():
         {"env": "IG-LIVE", "file_sym": f"GER30{suffix}",    "hdr_sym": f"GER30{suffix}"}
     ]
 
-    # 4) If combining years into 1
-    if args.combine_years:
+    # 4) Streamed per-year (or combined) outputs
+    if chunked:
+        convert_chunked(args, tz_local, years, configs)
+
+    # If combining years into 1
+    elif args.combine_years:
         df_combined = localize_and_clean(df_raw[df_raw['datetime'].dt.year.isin(years)], tz_local)
-        df_combined = fill_missing_minutes(df_combined, args.keep_weekends)
+        report = {} if args.fill_report else None
+        df_combined = fill_missing_minutes(df_combined, args.keep_weekends, args.holidays, report)
+        if report is not None:
+            write_fill_report(report, os.path.join(args.output_base_dir, "fill_report_combined.csv"))
         if df_combined.empty:
             logging.warning(f"No processed data for combined years: {years}")
         else:
@@ -352,32 +913,22 @@ def main():
         create_raw_segment_csv(df_raw, raw_out, years, combine=True)
 
     else:
-        # Year-by-year approach (filter BEFORE time zone conversion)
+        # Year-by-year approach: parse/localize once, split by source-time year
+        pool = ThreadPoolExecutor(max_workers=args.threads) if args.threads > 1 else None
+        done = set()
+        try:
+            reports = {} if args.fill_report else None
+            for y, df_raw_y, df_y in process_years(df_raw, tz_local, years, args.keep_weekends,
+                                                   args.holidays, reports):
+                write_year_outputs(y, df_raw_y, df_y, configs, args, pool,
+                                   reports.get(y) if reports is not None else None)
+                done.add(y)
+        finally:
+            if pool:
+                pool.shutdown()
         for y in years:
-            df_filtered = df_raw[df_raw['datetime'].dt.year == y].copy()
-            if df_filtered.empty:
+            if y not in done:
                 logging.warning(f"No raw data for year {y}")
-                continue
-
-            df_processed_y = localize_and_clean(df_filtered, tz_local)
-            df_processed_y = fill_missing_minutes(df_processed_y, args.keep_weekends)
-
-            if df_processed_y.empty:
-                logging.warning(f"No processed data for year {y} after localization.")
-                continue
-
-            for cfg in configs:
-                base = os.path.join(args.output_base_dir, cfg["env"])
-                hst_fn = f"{cfg['file_sym']}1_{y}.hst"
-                csv_fn = f"{cfg['file_sym']}1_{y}.csv"
-                create_hst(df_processed_y, os.path.join(base, hst_fn),
-                           cfg['hdr_sym'], 1, args.digits,
-                           args.copyright, args.spread)
-                create_csv(df_processed_y, os.path.join(base, csv_fn), args.digits)
-
-        # The raw data for each year (unmodified, from df_raw)
-        raw_out = os.path.join(args.output_base_dir, "raw_segments", "raw_segment.csv")
-        create_raw_segment_csv(df_raw, raw_out, years, combine=False)
 
 if __name__ == "__main__":
     main()
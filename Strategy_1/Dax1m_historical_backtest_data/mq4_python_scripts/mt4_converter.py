@@ -32,6 +32,13 @@ RATE_FORMAT = (
     "q"   # real_vol (long long / int64)
 ) # Total 60 bytes
 
+# Same record as a packed NumPy dtype, so a whole year is written in one go
+RATE_DTYPE = np.dtype([
+    ("ctm", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("vol", "<i8"), ("spread", "<i4"), ("real_vol", "<i8"),
+]) # Total 60 bytes
+assert RATE_DTYPE.itemsize == struct.calcsize(RATE_FORMAT)
+
 def parse_year_argument(year_arg):
     """Parses year argument string like '2024' or '2000-2023'."""
     if '-' in year_arg:
@@ -74,24 +81,24 @@ def create_hst_file(df_utc, output_filepath, symbol_name_for_header, period, dig
         
         df_sorted = df_utc.sort_index()
 
-        for timestamp_utc_dt, row in df_sorted.iterrows():
-            ctm = int(timestamp_utc_dt.timestamp())
-            try:
-                # These float/int conversions will fail if any NaNs survived, which they shouldn't for OHLCV
-                rate_data = struct.pack(
-                    RATE_FORMAT, ctm,
-                    float(row['Open']), float(row['High']), float(row['Low']), float(row['Close']),
-                    int(row['Volume']),
-                    int(spread_points), 0
-                )
-                f.write(rate_data)
-            except Exception as e:
-                print(f"CRITICAL ERROR packing/writing rate data for HST: Timestamp {timestamp_utc_dt}, Row: {row}. Error: {e}")
-                # raise # Re-raise to stop, or comment out to try to continue (not recommended for HST)
-                # For HST, it's usually better to ensure data is clean beforehand.
-                # If we reach here, it means dropna didn't work and NaNs are still in df_year_utc
-                print("This indicates NaNs are still present in df_year_utc. Please check data cleaning steps.")
-                return # Stop creating this specific HST file if bad data is encountered
+        # int(vol) is the one conversion that can fail (NaN/inf): write the clean
+        # bars before the first bad one, then stop, as the per-bar loop did
+        vol = df_sorted['Volume'].to_numpy(dtype=np.float64)
+        bad = np.flatnonzero(~np.isfinite(vol))
+        n_ok = int(bad[0]) if len(bad) else len(df_sorted)
+
+        rates = np.zeros(n_ok, dtype=RATE_DTYPE)
+        rates['ctm'] = ((df_sorted.index[:n_ok] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1))
+        for col in ('Open', 'High', 'Low', 'Close'):
+            rates[col.lower()] = df_sorted[col].to_numpy(dtype=np.float64)[:n_ok]
+        rates['vol'] = vol[:n_ok].astype(np.int64)
+        rates['spread'] = int(spread_points)
+        rates.tofile(f)
+
+        if len(bad):
+            print(f"CRITICAL ERROR packing/writing rate data for HST: Timestamp {df_sorted.index[n_ok]}, Row: {df_sorted.iloc[n_ok]}. Error: cannot convert volume {vol[n_ok]} to integer")
+            print("This indicates NaNs are still present in df_year_utc. Please check data cleaning steps.")
+            return # Stop creating this specific HST file if bad data is encountered
     print(f"Generated HST: {output_filepath} (Spread: {spread_points}, Digits: {digits})")
 
 
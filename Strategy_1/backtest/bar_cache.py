@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Binary columnar bar cache for dax-1m.csv, shared by the v1/v2/v3 backtesters.
+
+The semicolon CSV (D/M/Y;H:M:S;O;H;L;C[;V]) is parsed ONCE and written to a
+memory-mappable file:
+
+    header   : magic, version, flags, row count, year count
+    yearIndex: (year, startRow, endRow) per calendar year of the *source* time
+    columns  : int64 epoch minutes (naive source time, as written in the CSV),
+               then float64 open, high, low, close, volume
+
+Times stay in --src_tz exactly as in the CSV, so one cache serves any
+--src_tz/--dst_tz pair. The backtesters still do the tz conversion and the
+per-row --year_range filter; the cache only hands them the row slice that can
+possibly fall inside the requested years.
+
+Usage:
+  # one-time ingest
+  python bar_cache.py --csv dax-1m.csv --out dax-1m.bars
+
+  # then pass the .bars file wherever a --csv is expected
+  python v2/mq4_backtest_v3.py --csv dax-1m.bars --year_range 2024 --excel
+
+  # after new rows were appended to dax-1m.csv: parse only those
+  python bar_cache.py --csv dax-1m.csv --out dax-1m.bars --append
+"""
+
+import argparse
+import bisect
+import csv
+import logging
+import mmap
+import pathlib
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+MAGIC   = b"DAXBARS1"
+VERSION = 1
+
+FLAG_SORTED     = 0x1   # times are non-decreasing => year slicing allowed
+FLAG_BIG_ENDIAN = 0x2   # columns written on a big-endian host
+
+HEADER_FMT = "<8sIIqq"
+YEAR_FMT   = "<qqq"
+COLUMNS    = ("time", "open", "high", "low", "close", "volume")
+
+EPOCH = datetime(1970, 1, 1)
+
+# A year slice is widened by this much on both sides so that bars which land
+# inside the requested years only *after* the tz shift are still included.
+SLICE_PAD_MINUTES = 2 * 24 * 60
+
+# -------------------------------------------------------------------------
+def to_epoch_minutes(naive):
+    return int((naive - EPOCH).total_seconds() // 60)
+
+def from_epoch_minutes(m):
+    return EPOCH + timedelta(minutes=m)
+
+def is_bar_cache(path):
+    """True if *path* starts with the bar-cache magic bytes."""
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def iter_csv_bars(csv_path, offset=0):
+    """
+    Yield (naive, op, hi, lo, cl, vol) from the semicolon CSV, skipping the
+    same malformed rows the backtesters skip. *offset* is a byte position
+    to start at (the start of a line, e.g. from find_csv_offset).
+    """
+    with open(csv_path, "r", newline="") as fh:
+        fh.seek(offset)
+        rdr = csv.reader(fh, delimiter=';')
+        for row in rdr:
+            if len(row) < 6:
+                continue
+            dtRaw = f"{row[0].strip()} {row[1].strip()}"
+            try:
+                naive = datetime.strptime(dtRaw, "%d/%m/%Y %H:%M:%S")
+            except:
+                continue
+            try:
+                op = float(row[2])
+                hi = float(row[3])
+                lo = float(row[4])
+                cl = float(row[5])
+            except:
+                continue
+            try:
+                vol = float(row[6]) if len(row) > 6 else 0.0
+            except:
+                vol = 0.0
+            yield naive, op, hi, lo, cl, vol
+
+def line_naive(line):
+    """Naive time of one raw CSV line (bytes), None if it does not parse."""
+    parts = line.split(b";")
+    if len(parts) < 6:
+        return None
+    try:
+        return datetime.strptime(f"{parts[0].decode().strip()} {parts[1].decode().strip()}",
+                                 "%d/%m/%Y %H:%M:%S")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def find_csv_offset(csv_path, naive):
+    """
+    Byte offset of the first row timed >= *naive* in a time-ordered CSV, by
+    bisecting on file positions rather than parsing from the top.
+    """
+    with open(csv_path, "rb") as fh:
+        size = fh.seek(0, 2)
+
+        def first_row_from(pos):
+            fh.seek(pos)
+            if pos:
+                fh.readline()           # partial line
+            while True:
+                start = fh.tell()
+                line = fh.readline()
+                if not line:
+                    return start, None
+                t = line_naive(line)
+                if t is not None:
+                    return start, t
+
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            t = first_row_from(mid)[1]
+            if t is None or t >= naive:
+                hi = mid
+            else:
+                lo = mid + 1
+        return first_row_from(lo)[0] if lo else 0
+
+def iter_source_bars(path, src_tz):
+    """
+    iter_csv_bars for the semicolon CSV, or the bars of an MT4 .hst file
+    (via hst_reader, needs numpy) as naive wall-clock times in *src_tz*.
+    """
+    if pathlib.Path(path).suffix.lower() == ".hst":
+        import hst_reader
+        return hst_reader.iter_hst_bars(path, src_tz)
+    return iter_csv_bars(path)
+
+# -------------------------------------------------------------------------
+# Ingest
+# -------------------------------------------------------------------------
+def ingest_csv(csv_path, out_path):
+    """Parse *csv_path* once and write the columnar cache to *out_path*."""
+    cols = {
+        "time":   array("q"),
+        "open":   array("d"),
+        "high":   array("d"),
+        "low":    array("d"),
+        "close":  array("d"),
+        "volume": array("d"),
+    }
+    is_sorted = True
+    prev = None
+    for naive, op, hi, lo, cl, vol in iter_csv_bars(csv_path):
+        m = to_epoch_minutes(naive)
+        if prev is not None and m < prev:
+            is_sorted = False
+        prev = m
+        cols["time"].append(m)
+        cols["open"].append(op)
+        cols["high"].append(hi)
+        cols["low"].append(lo)
+        cols["close"].append(cl)
+        cols["volume"].append(vol)
+
+    n = len(cols["time"])
+    if not is_sorted:
+        logging.warning(f"{csv_path}: rows are not in time order => "
+                        "year slicing disabled, every run scans all rows.")
+
+    # year -> [startRow, endRow)
+    years = {}
+    for i, m in enumerate(cols["time"]):
+        y = from_epoch_minutes(m).year
+        if y not in years:
+            years[y] = [i, i + 1]
+        else:
+            years[y][1] = i + 1
+
+    _write_cache(out_path, [[cols[name]] for name in COLUMNS], n, years, is_sorted).replace(out_path)
+    logging.info(f"Wrote {n} bars ({len(years)} years) => {out_path}")
+    return n
+
+def _write_cache(out_path, parts, n, years, is_sorted):
+    """
+    Write a cache of *n* rows next to *out_path* and return the temp path
+    (the caller moves it into place). parts[c] lists buffers (arrays or
+    memoryviews) whose concatenation is column c; years maps year => [start, end).
+    """
+    flags = (FLAG_SORTED if is_sorted else 0) | \
+            (FLAG_BIG_ENDIAN if sys.byteorder == "big" else 0)
+
+    outp = pathlib.Path(out_path)
+    tmp = outp.with_suffix(outp.suffix + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(struct.pack(HEADER_FMT, MAGIC, VERSION, flags, n, len(years)))
+        for y in sorted(years):
+            fh.write(struct.pack(YEAR_FMT, y, *years[y]))
+        for col in parts:
+            for buf in col:
+                fh.write(buf)
+    return tmp
+
+def append_csv(csv_path, out_path):
+    """
+    Add the CSV rows newer than the cache's last bar. Only the tail of the CSV
+    is parsed (find_csv_offset); the existing columns are copied over as bytes.
+    Falls back to a full ingest_csv if there is no usable cache yet.
+    """
+    outp = pathlib.Path(out_path)
+    if not is_bar_cache(outp):
+        return ingest_csv(csv_path, outp)
+    with BarCache(outp) as bc:
+        usable = bc.is_sorted and bc.n > 0
+    if not usable:
+        logging.warning(f"{outp}: unsorted or empty cache => full re-ingest")
+        return ingest_csv(csv_path, outp)
+
+    with BarCache(outp) as bc:
+        last = bc.times[bc.n - 1]
+        cols = {name: array(code) for name, code in zip(COLUMNS, "qddddd")}
+        offset = find_csv_offset(csv_path, from_epoch_minutes(last) - timedelta(days=1))
+        prev = last
+        for naive, op, hi, lo, cl, vol in iter_csv_bars(csv_path, offset):
+            m = to_epoch_minutes(naive)
+            if m <= last:
+                continue
+            if m < prev:
+                raise ValueError(f"{csv_path}: rows after {from_epoch_minutes(last)} are not "
+                                 "in time order; rebuild without --append")
+            prev = m
+            for name, v in zip(COLUMNS, (m, op, hi, lo, cl, vol)):
+                cols[name].append(v)
+
+        k = len(cols["time"])
+        if k == 0:
+            logging.info(f"{outp} is up to date (last bar {from_epoch_minutes(last)})")
+            return 0
+        years = {y: list(se) for y, se in bc.year_index.items()}
+        for i, m in enumerate(cols["time"], bc.n):
+            y = from_epoch_minutes(m).year
+            if y not in years:
+                years[y] = [i, i + 1]
+            else:
+                years[y][1] = i + 1
+        parts = [[old, cols[name]] for old, name in zip(bc._views, COLUMNS)]
+        tmp = _write_cache(outp, parts, bc.n + k, years, True)
+    tmp.replace(outp)
+
+    logging.info(f"Appended {k} bars ({bc.n + k} total) => {outp}")
+    return k
+
+# -------------------------------------------------------------------------
+# Reader
+# -------------------------------------------------------------------------
+class BarCache:
+    """
+    Memory-mapped view of a bar-cache file. Columns are exposed as zero-copy
+    memoryviews (``times`` int64, ``opens``/``highs``/``lows``/``closes``/
+    ``volumes`` float64), so only the pages a run touches are read from disk.
+    """
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._fh = open(self.path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        hsize = struct.calcsize(HEADER_FMT)
+        magic, version, flags, n, nyears = struct.unpack_from(HEADER_FMT, self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a bar-cache file")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported bar-cache version {version}")
+        if bool(flags & FLAG_BIG_ENDIAN) != (sys.byteorder == "big"):
+            raise ValueError(f"{path}: written on a host with different byte order; re-ingest")
+
+        self.n = n
+        self.is_sorted = bool(flags & FLAG_SORTED)
+
+        ysize = struct.calcsize(YEAR_FMT)
+        self.year_index = {}
+        off = hsize
+        for _ in range(nyears):
+            y, s, e = struct.unpack_from(YEAR_FMT, self._mm, off)
+            self.year_index[y] = (s, e)
+            off += ysize
+
+        buf = memoryview(self._mm)
+        self._views = []
+        for name, code in zip(COLUMNS, "qddddd"):
+            col = buf[off:off + 8 * n].cast(code)
+            self._views.append(col)
+            off += 8 * n
+        buf.release()
+        (self.times, self.opens, self.highs,
+         self.lows, self.closes, self.volumes) = self._views
+
+    def close(self):
+        for v in self._views:
+            v.release()
+        self._views = []
+        self._mm.close()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def years(self):
+        return sorted(self.year_index)
+
+    def last_naive(self):
+        """Naive source time of the final bar in the file (None if empty)."""
+        if self.n == 0:
+            return None
+        return from_epoch_minutes(self.times[self.n - 1])
+
+    def slice_for_years(self, yrs, pad_minutes=SLICE_PAD_MINUTES):
+        """
+        Row range [lo, hi) covering every bar that can fall inside *yrs* after
+        a tz shift of up to *pad_minutes*. ``yrs=None`` means all rows.
+        """
+        if yrs is None or not self.is_sorted or self.n == 0:
+            return 0, self.n
+        y0, y1 = min(yrs), max(yrs)
+        tLo = to_epoch_minutes(datetime(y0, 1, 1)) - pad_minutes
+        tHi = to_epoch_minutes(datetime(y1 + 1, 1, 1)) + pad_minutes
+
+        # the padded bounds sit inside the neighbouring years => search only there
+        sLo = self.year_index.get(y0 - 1, (0, 0))[0]
+        sHi = self.year_index.get(y1 + 1, (self.n, self.n))[1]
+        lo = bisect.bisect_left(self.times, tLo, sLo, sHi)
+        hi = bisect.bisect_left(self.times, tHi, lo, sHi)
+        return lo, hi
+
+    def iter_bars(self, yrs=None, conv=None):
+        """
+        Yield (naive, op, hi, lo, cl, vol) for the slice covering *yrs*.
+        With a tz_convert.TzConverter as *conv* the first field is the aware
+        destination datetime instead, converted for the whole slice up front.
+        """
+        lo, hi = self.slice_for_years(yrs)
+        times, ops, his, los, cls, vols = self._views
+        if conv is None:
+            for i in range(lo, hi):
+                yield (EPOCH + timedelta(minutes=times[i]),
+                       ops[i], his[i], los[i], cls[i], vols[i])
+            return
+        dstMin, folds = conv.convert_minutes(times, lo, hi, self.is_sorted)
+        make_dt = conv.make_dt
+        for j in range(hi - lo):
+            i = lo + j
+            yield (make_dt(dstMin[j], folds[j]),
+                   ops[i], his[i], los[i], cls[i], vols[i])
+
+# -------------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------------
+def parse_args():
+    ap = argparse.ArgumentParser(description="Build the binary bar cache from dax-1m.csv")
+    ap.add_argument("--csv", required=True,
+                    help="CSV with D/M/Y;H:M:S;O;H;L;C[;V] (in --src_tz of the backtesters).")
+    ap.add_argument("--out", default=None,
+                    help="Output cache path (default=<csv>.bars).")
+    ap.add_argument("--append", action="store_true",
+                    help="Only add CSV rows newer than the existing cache's last bar.")
+    return ap.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+    args = parse_args()
+    out = args.out or str(pathlib.Path(args.csv).with_suffix(".bars"))
+    if args.append:
+        append_csv(args.csv, out)
+    else:
+        ingest_csv(args.csv, out)
+    with BarCache(out) as bc:
+        for y in bc.years():
+            s, e = bc.year_index[y]
+            logging.info(f"  {y}: rows {s}..{e} ({e - s} bars)")
+
+if __name__ == "__main__":
+    main()
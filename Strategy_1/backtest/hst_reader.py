@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped reader and validator for the MT4 .hst files written by the
+converters in Dax1m_historical_backtest_data/mq4_python_scripts.
+
+    header : 148 bytes  version, copyright[64], symbol[12], period, digits,
+                        timesign, last_sync, reserved[52]
+    records: 60 bytes   <qddddqiq  time, open, high, low, close,
+                                   volume, spread, real_volume
+
+HstFile maps the records as a NumPy structured array (no copy), so even a
+25-year 1-minute history opens instantly and only the pages touched are read.
+
+Two non-standard variants produced by the converters are recognised and
+reported rather than misread:
+  - convert_to_mt4.py: 160-byte header (64-byte symbol, digits at byte 132),
+    millisecond times, low/high written into the high/low slots
+  - mt4_converter.py : version 401 stamped on v509 records
+
+Times in the records are UTC epoch seconds. Any backtester --csv also accepts
+a .hst file; the bars are re-expressed in its --src_tz (see iter_bars).
+
+Usage:
+  python hst_reader.py info     "GER30(£)1_2024.hst"
+  python hst_reader.py validate "GER30(£)1_2024.hst" GER301_2024.hst --digits 1
+"""
+
+import argparse
+import logging
+import os
+import pathlib
+import struct
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import tz_convert
+
+HEADER_FMT  = "<i64s12siiii52s"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)          # 148
+WIDE_HEADER_FMT  = "<i64s64siiiiiii"               # convert_to_mt4.build_header
+WIDE_HEADER_SIZE = struct.calcsize(WIDE_HEADER_FMT)  # 160
+
+RATE_DTYPE = np.dtype([
+    ("time",        "<i8"),
+    ("open",        "<f8"),
+    ("high",        "<f8"),
+    ("low",         "<f8"),
+    ("close",       "<f8"),
+    ("volume",      "<i8"),
+    ("spread",      "<i4"),
+    ("real_volume", "<i8"),
+])
+RATE_SIZE = RATE_DTYPE.itemsize                    # 60
+
+EPOCH = datetime(1970, 1, 1)
+CHUNK = 1 << 16
+
+def _cstr(raw):
+    return raw.split(b"\0", 1)[0].decode("cp1252", errors="replace")
+
+def utc_offsets(tz_name, t):
+    """UTC offset in seconds of *tz_name* at each UTC epoch second in array *t*."""
+    if not len(t):
+        return np.zeros(0, dtype=np.int64)
+    tz = ZoneInfo(tz_name)
+    lo = int(t.min()) // 60 - tz_convert.DAY
+    hi = int(t.max()) // 60 + tz_convert.DAY
+    first = datetime.fromtimestamp(lo * 60, tz).utcoffset()
+    trans = tz_convert.find_transitions(tz, lo, hi)
+    starts = np.array([T * 60 for T, _, _ in trans], dtype=np.int64)
+    offs = np.array([int(first.total_seconds())] + [b * 60 for _, _, b in trans], dtype=np.int64)
+    return offs[np.searchsorted(starts, t, side="right")]
+
+# -------------------------------------------------------------------------
+# Reader
+# -------------------------------------------------------------------------
+class HstFile:
+    """
+    Header fields as attributes (version, copyright, symbol, period, digits,
+    timesign, layout) and the bars as ``rates``, a read-only memory-mapped
+    RATE_DTYPE array. ``layout`` is "v509" or "wide" (convert_to_mt4.py).
+    """
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        size = os.path.getsize(self.path)
+        if size < HEADER_SIZE:
+            raise ValueError(f"{path}: {size} bytes is shorter than an HST header")
+        with open(self.path, "rb") as fh:
+            head = fh.read(WIDE_HEADER_SIZE)
+
+        if (size - HEADER_SIZE) % RATE_SIZE and size >= WIDE_HEADER_SIZE \
+                and (size - WIDE_HEADER_SIZE) % RATE_SIZE == 0:
+            (self.version, cp, sym, self.digits, self.header_spread,
+             _, self.header_bars, _, _, _) = struct.unpack(WIDE_HEADER_FMT, head)
+            self.layout = "wide"
+            self.header_size = WIDE_HEADER_SIZE
+            self.period = None
+            self.timesign = 0
+        else:
+            (self.version, cp, sym, self.period, self.digits,
+             self.timesign, _, _) = struct.unpack_from(HEADER_FMT, head)
+            self.layout = "v509"
+            self.header_size = HEADER_SIZE
+            self.header_spread = None
+            self.header_bars = None
+        self.copyright = _cstr(cp)
+        self.symbol = _cstr(sym)
+
+        body = size - self.header_size
+        self.n = body // RATE_SIZE
+        self.trailing_bytes = body % RATE_SIZE
+        if self.n:
+            self.rates = np.memmap(self.path, dtype=RATE_DTYPE, mode="r",
+                                   offset=self.header_size, shape=(self.n,))
+        else:
+            self.rates = np.zeros(0, dtype=RATE_DTYPE)
+
+        # the wide writer stores milliseconds and swaps the high/low slots
+        self.time_scale = 1
+        if self.n and int(self.rates["time"][self.n // 2]) > 10**11:
+            self.time_scale = 1000
+        self.high_field, self.low_field = ("low", "high") if self.layout == "wide" else ("high", "low")
+
+    def close(self):
+        self.rates = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # column accessors (views, except seconds() when times are in ms)
+    def seconds(self):
+        t = self.rates["time"]
+        return t // self.time_scale if self.time_scale != 1 else t
+
+    def opens(self):  return self.rates["open"]
+    def highs(self):  return self.rates[self.high_field]
+    def lows(self):   return self.rates[self.low_field]
+    def closes(self): return self.rates["close"]
+
+    def iter_bars(self, tz_name="UTC"):
+        """
+        Yield (naive, op, hi, lo, cl, vol) like bar_cache.iter_csv_bars, with
+        *naive* the wall-clock time in *tz_name*, so the bars drop straight
+        into a backtester whose --src_tz is *tz_name*.
+        """
+        for s in range(0, self.n, CHUNK):
+            e = min(s + CHUNK, self.n)
+            t = self.seconds()[s:e]
+            local = (t + utc_offsets(tz_name, t)).tolist()
+            ops = self.opens()[s:e].tolist()
+            his = self.highs()[s:e].tolist()
+            los = self.lows()[s:e].tolist()
+            cls = self.closes()[s:e].tolist()
+            vols = self.rates["volume"][s:e].astype(np.float64).tolist()
+            for j in range(e - s):
+                yield (EPOCH + timedelta(seconds=local[j]),
+                       ops[j], his[j], los[j], cls[j], vols[j])
+
+def iter_hst_bars(path, tz_name="UTC"):
+    """HstFile(path).iter_bars(tz_name), closing the map when exhausted."""
+    with HstFile(path) as hf:
+        yield from hf.iter_bars(tz_name)
+
+# -------------------------------------------------------------------------
+# Validator
+# -------------------------------------------------------------------------
+def _utc(sec):
+    return datetime.fromtimestamp(int(sec), timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+def validate(hf, digits=None, symbol=None, max_list=10):
+    """
+    Check one HstFile. Returns (errors, warnings, stats): two lists of
+    messages and a dict of counts.
+    """
+    errors, warnings = [], []
+    stats = {"bars": hf.n}
+
+    # --- header ---------------------------------------------------------
+    if hf.trailing_bytes:
+        errors.append(f"{hf.trailing_bytes} trailing bytes: file is not header + n*{RATE_SIZE}-byte records")
+    if hf.layout == "wide":
+        warnings.append(f"non-standard {WIDE_HEADER_SIZE}-byte header (convert_to_mt4 layout); "
+                        "MT4 expects 148 bytes and will misread every record")
+        warnings.append("low/high stored in the high/low slots (read back swapped here)")
+        if hf.header_bars is not None and hf.header_bars != hf.n:
+            warnings.append(f"header bar count {hf.header_bars} != {hf.n} records")
+    if hf.version != 509:
+        warnings.append(f"header version {hf.version} with 60-byte v509 records")
+    if hf.period not in (None, 1):
+        warnings.append(f"period {hf.period} (expected 1 for M1 files)")
+    if "?" in hf.symbol or "�" in hf.symbol:
+        warnings.append(f"header symbol {hf.symbol!r} has replaced characters (not cp1252-encoded)")
+    if symbol is not None and hf.symbol != symbol:
+        warnings.append(f"header symbol {hf.symbol!r} != expected {symbol!r}")
+    if not hf.path.stem.startswith(hf.symbol):
+        warnings.append(f"header symbol {hf.symbol!r} does not match file name {hf.path.name!r}")
+    if digits is not None and hf.digits != digits:
+        warnings.append(f"header digits {hf.digits} != expected {digits}")
+    if hf.time_scale != 1:
+        warnings.append("times are in milliseconds, MT4 expects seconds")
+    if not hf.n:
+        warnings.append("no bars")
+        return errors, warnings, stats
+
+    # --- timestamps -----------------------------------------------------
+    t = hf.seconds()
+    d = np.diff(t)
+    step = 60 * (hf.period or 1)
+    back = np.flatnonzero(d < 0)
+    dup = np.flatnonzero(d == 0)
+    gap = np.flatnonzero(d > step)
+    stats.update(first=_utc(t[0]), last=_utc(t[-1]),
+                 out_of_order=len(back), duplicates=len(dup), gaps=len(gap))
+    if len(back):
+        errors.append(f"{len(back)} out-of-order bars, first at #{back[0] + 1} "
+                      f"({_utc(t[back[0]])} -> {_utc(t[back[0] + 1])})")
+    if len(dup):
+        errors.append(f"{len(dup)} duplicate timestamps, first {_utc(t[dup[0]])}")
+    if len(gap):
+        # weekday 0=Mon of each gap start/end (1970-01-01 was a Thursday)
+        wd0 = (t[gap] // 86400 + 3) % 7
+        wd1 = (t[gap + 1] // 86400 + 3) % 7
+        weekend = (wd0 >= 4) & ((wd1 == 6) | (wd1 == 0)) & (d[gap] < 4 * 86400)
+        missing = d[gap] // step - 1
+        stats.update(weekend_gaps=int(weekend.sum()),
+                     weekday_gaps=int((~weekend).sum()),
+                     missing_weekday_bars=int(missing[~weekend].sum()))
+        wk = gap[~weekend]
+        if len(wk):
+            warnings.append(f"{len(wk)} weekday gaps ({stats['missing_weekday_bars']} missing bars); largest:")
+            for i in wk[np.argsort(d[wk])[::-1][:max_list]]:
+                warnings.append(f"    {_utc(t[i])} -> {_utc(t[i + 1])} ({d[i] // step - 1} bars)")
+
+    # --- prices ---------------------------------------------------------
+    o, h, l, c = hf.opens(), hf.highs(), hf.lows(), hf.closes()
+    px = np.stack([o, h, l, c])
+    bad_num = ~np.isfinite(px).all(axis=0) | (px <= 0).any(axis=0)
+    bad_ohlc = (h < np.maximum(o, c)) | (l > np.minimum(o, c)) | (h < l)
+    stats.update(bad_prices=int(bad_num.sum()), bad_ohlc=int(bad_ohlc.sum()))
+    if bad_num.any():
+        errors.append(f"{int(bad_num.sum())} bars with non-finite or non-positive prices, "
+                      f"first {_utc(t[np.argmax(bad_num)])}")
+    if bad_ohlc.any():
+        i = int(np.argmax(bad_ohlc))
+        errors.append(f"{int(bad_ohlc.sum())} bars violate low <= open/close <= high, first "
+                      f"{_utc(t[i])} O={o[i]} H={h[i]} L={l[i]} C={c[i]}")
+    if hf.digits is not None and 0 <= hf.digits <= 8:
+        scaled = px * 10.0 ** hf.digits
+        off_grid = (np.abs(scaled - np.round(scaled)) > 1e-6).any(axis=0) & ~bad_num
+        stats["off_grid"] = int(off_grid.sum())
+        if off_grid.any():
+            warnings.append(f"{int(off_grid.sum())} bars have prices finer than {hf.digits} digits")
+    neg_vol = int((hf.rates["volume"] < 0).sum())
+    if neg_vol:
+        errors.append(f"{neg_vol} bars with negative volume")
+    return errors, warnings, stats
+
+# -------------------------------------------------------------------------
+# CLI
+# -------------------------------------------------------------------------
+def parse_args():
+    ap = argparse.ArgumentParser(description="Inspect and validate MT4 .hst history files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("info", help="Print the header and bar range")
+    p.add_argument("files", nargs="+")
+    p = sub.add_parser("validate", help="Check record size, order, gaps, duplicates, OHLC")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--digits", type=int, default=None, help="Expected header digits")
+    p.add_argument("--symbol", default=None, help="Expected header symbol, e.g. 'GER30(£)'")
+    p.add_argument("--max_list", type=int, default=10, help="Largest gaps to list")
+    return ap.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    args = parse_args()
+    failed = 0
+    for fn in args.files:
+        try:
+            hf = HstFile(fn)
+        except (OSError, ValueError) as e:
+            logging.error(f"{fn}: {e}")
+            failed += 1
+            continue
+        with hf:
+            t = hf.seconds()
+            span = f"{_utc(t[0])} .. {_utc(t[-1])}" if hf.n else "-"
+            print(f"{fn}: v{hf.version} {hf.layout} symbol={hf.symbol!r} period={hf.period} "
+                  f"digits={hf.digits} bars={hf.n} {span}")
+            if args.cmd == "info":
+                continue
+            errors, warnings, stats = validate(hf, args.digits, args.symbol, args.max_list)
+            for m in errors:
+                print(f"  ERROR   {m}")
+            for m in warnings:
+                print(f"  WARNING {m}")
+            print("  " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+            print(f"  => {'FAILED' if errors else 'OK'}")
+            failed += bool(errors)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Intraday spread model shared by the backtesters and the MT4 converters.
+
+SPREAD_SCHEDULE lists (start (h, m), end (h, m), spread) windows in index
+points. Both ends are inclusive and the first matching window wins; a window
+whose start is after its end wraps midnight. Anything unmatched gets
+DEFAULT_SPREAD.
+
+SpreadTable compiles a schedule ONCE into a 1440-slot minute-of-day table,
+
+    table.by_minute[h * 60 + m] == spread at hh:mm:00
+
+so a per-bar lookup is one index instead of a walk over the schedule with two
+``time`` objects per entry. ``for_minutes`` does the same for whole bar arrays
+(epoch minutes as used by bar_cache / tz_convert, or minute-of-day numbers);
+``points`` scales the result to the integer MT4 spread of a symbol with
+*digits* decimals, for the converters' ``--spread schedule``.
+
+NumPy is optional: without it the array variants return array('d') / lists.
+"""
+
+from array import array
+from datetime import time
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+# Dynamic spread schedule (index points)
+SPREAD_SCHEDULE = [
+    ((1, 15),  (8, 0),  4.0),
+    ((8, 0),   (9, 0),  2.0),
+    ((9, 0),   (17, 30), 1.2),
+    ((17, 30), (22, 0), 2.0),
+    ((22, 0),  (23, 59), 5.0),
+    ((0, 0),   (1, 15), 5.0),
+]
+DEFAULT_SPREAD = 5.0
+
+MINUTES_PER_DAY = 24 * 60
+
+# -------------------------------------------------------------------------
+class SpreadTable:
+    def __init__(self, schedule=SPREAD_SCHEDULE, default=DEFAULT_SPREAD):
+        self.windows = [(time(*st), time(*en), val) for st, en, val in schedule]
+        self.default = default
+        self.by_minute = array("d", (self.walk(time(m // 60, m % 60))
+                                     for m in range(MINUTES_PER_DAY)))
+
+    def walk(self, t):
+        """Spread at time-of-day *t* by walking the schedule (the reference definition)."""
+        for (st_t, en_t, val) in self.windows:
+            if st_t <= en_t:
+                if st_t <= t <= en_t:
+                    return val
+            else:  # wrap midnight
+                if t >= st_t or t <= en_t:
+                    return val
+        return self.default
+
+    def at(self, dt):
+        """Spread for a datetime: table lookup on whole minutes (every bar), walk otherwise."""
+        if dt.second or dt.microsecond:
+            return self.walk(dt.time())
+        return self.by_minute[dt.hour * 60 + dt.minute]
+
+    def for_minutes(self, minutes):
+        """
+        Spreads for a sequence of epoch minutes (wall clock) or minute-of-day
+        numbers: a NumPy array when NumPy is available, else array('d').
+        """
+        if HAVE_NUMPY:
+            table = np.frombuffer(self.by_minute, dtype=np.float64)
+            return table[np.asarray(minutes, dtype=np.int64) % MINUTES_PER_DAY]
+        bm = self.by_minute
+        return array("d", (bm[m % MINUTES_PER_DAY] for m in minutes))
+
+    def points(self, minutes, digits):
+        """for_minutes in MT4 points (spread * 10**digits, rounded to int)."""
+        scale = 10 ** digits
+        if HAVE_NUMPY:
+            return np.rint(self.for_minutes(minutes) * scale).astype(np.int32)
+        return [int(round(v * scale)) for v in self.for_minutes(minutes)]
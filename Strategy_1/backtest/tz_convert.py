@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Table-driven --src_tz -> --dst_tz conversion for the backtesters.
+
+The per-row path
+
+    naive.replace(tzinfo=tzSrc).astimezone(tzDst)
+
+only ever produces a handful of distinct (wall-clock shift, fold) pairs per
+year, changing at the DST transitions of either zone. TzConverter finds those
+transitions once for the requested years and compiles them into a table of
+segments keyed by *source wall-clock* epoch minutes:
+
+    segStart[k] <= srcMinute < segStart[k+1]  =>  dstMinute = srcMinute + segDelta[k]
+                                                  fold      = segFold[k]
+
+Each segment value is taken from the per-row path itself, so nonexistent
+(spring-forward) and ambiguous (fall-back) source hours resolve exactly as
+``replace(tzinfo=...)`` does (fold=0), and the output carries the same fold
+``astimezone`` would set. Minutes outside the table fall back to the per-row
+path.
+"""
+
+import bisect
+from array import array
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+EPOCH     = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+DAY       = 24 * 60
+
+# -------------------------------------------------------------------------
+def to_epoch_minutes(naive):
+    return int((naive - EPOCH).total_seconds() // 60)
+
+def _offset_minutes(tz, utcMinute):
+    aware = (EPOCH_UTC + timedelta(minutes=utcMinute)).astimezone(tz)
+    return int(aware.utcoffset().total_seconds() // 60)
+
+def find_transitions(tz, utcLo, utcHi):
+    """
+    List of (utcMinute, offsetBefore, offsetAfter) for every UTC-offset change
+    of *tz* in [utcLo, utcHi). Scans day by day, then bisects to the minute.
+    """
+    out = []
+    prev = _offset_minutes(tz, utcLo)
+    d = utcLo
+    while d < utcHi:
+        nxt = min(d + DAY, utcHi)
+        off = _offset_minutes(tz, nxt)
+        if off != prev:
+            a, b = d, nxt          # offset(a)==prev, offset(b)!=prev
+            while b - a > 1:
+                mid = (a + b) // 2
+                if _offset_minutes(tz, mid) == prev:
+                    a = mid
+                else:
+                    b = mid
+            out.append((b, prev, _offset_minutes(tz, b)))
+        prev = off
+        d = nxt
+    return out
+
+# -------------------------------------------------------------------------
+class TzConverter:
+    def __init__(self, src_tz, dst_tz, firstYear, lastYear):
+        self.tzSrc = ZoneInfo(src_tz)
+        self.tzDst = ZoneInfo(dst_tz)
+
+        # table bounds in source wall minutes
+        self.lo = to_epoch_minutes(datetime(firstYear, 1, 1))
+        self.hi = to_epoch_minutes(datetime(lastYear + 1, 1, 1))
+
+        # transitions in UTC, padded by a day so offsets at the bounds are covered
+        srcTr = find_transitions(self.tzSrc, self.lo - 2 * DAY, self.hi + 2 * DAY)
+        dstTr = find_transitions(self.tzDst, self.lo - 2 * DAY, self.hi + 2 * DAY)
+
+        srcOffsets = {_offset_minutes(self.tzSrc, self.lo)}
+        for (_, a, b) in srcTr:
+            srcOffsets.update((a, b))
+
+        # Candidate segment starts (source wall minutes):
+        #  - a source transition at UTC T switches the fold=0 offset at wall T+max(a,b)
+        #  - a destination transition at UTC S (plus S+(a-b), the end of the repeated
+        #    hour that carries fold=1) lands at wall S+c for the source offset c in force
+        cands = {self.lo}
+        for (T, a, b) in srcTr:
+            cands.add(T + max(a, b))
+        for (S, a, b) in dstTr:
+            events = [S, S + (a - b)] if a > b else [S]
+            for E in events:
+                for c in srcOffsets:
+                    cands.add(E + c)
+
+        self.segStart = array("q")
+        self.segDelta = array("q")
+        self.segFold  = array("b")
+        for w in sorted(c for c in cands if self.lo <= c < self.hi):
+            delta, fold = self._exact(w)
+            if self.segStart and self.segDelta[-1] == delta and self.segFold[-1] == fold:
+                continue
+            self.segStart.append(w)
+            self.segDelta.append(delta)
+            self.segFold.append(fold)
+
+    @classmethod
+    def for_years(cls, src_tz, dst_tz, yrs):
+        """Table spanning *yrs* plus one year either side (the tz shift crosses years)."""
+        return cls(src_tz, dst_tz, min(yrs) - 1, max(yrs) + 1)
+
+    def _exact(self, srcMinute):
+        """(dstMinute - srcMinute, fold) via the per-row path."""
+        naive = EPOCH + timedelta(minutes=srcMinute)
+        dt = naive.replace(tzinfo=self.tzSrc).astimezone(self.tzDst)
+        return to_epoch_minutes(dt.replace(tzinfo=None)) - srcMinute, dt.fold
+
+    def lookup(self, srcMinute):
+        """(delta, fold) for one source wall minute."""
+        if srcMinute < self.lo or srcMinute >= self.hi:
+            return self._exact(srcMinute)
+        k = bisect.bisect_right(self.segStart, srcMinute) - 1
+        return self.segDelta[k], self.segFold[k]
+
+    def to_dst(self, naive):
+        """Drop-in for ``naive.replace(tzinfo=tzSrc).astimezone(tzDst)``."""
+        delta, fold = self.lookup(to_epoch_minutes(naive))
+        return (naive + timedelta(minutes=delta)).replace(tzinfo=self.tzDst, fold=fold)
+
+    def make_dt(self, dstMinute, fold):
+        """Aware destination datetime from converted epoch minutes."""
+        return (EPOCH + timedelta(minutes=dstMinute)).replace(tzinfo=self.tzDst, fold=fold)
+
+    def convert_minutes(self, times, lo, hi, is_sorted=True):
+        """
+        Convert source wall minutes ``times[lo:hi]`` to destination wall minutes.
+        Returns (array('q') dstMinutes, array('b') folds).
+
+        For sorted input the offsets are applied a whole segment at a time: one
+        bisect per segment boundary instead of one tz lookup per bar.
+        """
+        outMin  = array("q")
+        outFold = array("b")
+        if not is_sorted:
+            for i in range(lo, hi):
+                d, f = self.lookup(times[i])
+                outMin.append(times[i] + d)
+                outFold.append(f)
+            return outMin, outFold
+
+        starts = self.segStart
+        i = lo
+        while i < hi:
+            t = times[i]
+            if t < self.lo or t >= self.hi:
+                # outside the table => per-row path until we re-enter it
+                end = bisect.bisect_left(times, self.lo, i, hi) if t < self.lo else hi
+                for j in range(i, end):
+                    d, f = self._exact(times[j])
+                    outMin.append(times[j] + d)
+                    outFold.append(f)
+                i = end
+                continue
+            k = bisect.bisect_right(starts, t) - 1
+            segEnd = starts[k + 1] if k + 1 < len(starts) else self.hi
+            end = bisect.bisect_left(times, segEnd, i, hi)
+            d = self.segDelta[k]
+            outMin.extend([x + d for x in times[i:end]])
+            outFold.frombytes(bytes([self.segFold[k]]) * (end - i))
+            i = end
+        return outMin, outFold
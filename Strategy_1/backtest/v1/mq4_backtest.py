@@ -15,7 +15,6 @@ Usage Examples:
   python ger30_backtest.py --csv dax-1m.csv --year_range 2020-2025 --verbose
 """
 
-import csv
 import argparse
 import logging
 from datetime import datetime, time
@@ -24,6 +23,11 @@ from zoneinfo import ZoneInfo
 import os
 import re
 import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import bar_cache
+from spread_schedule import SPREAD_SCHEDULE, DEFAULT_SPREAD, SpreadTable
 
 # -------------------------------------------------------------------------
 # CONFIG (identical to your final logic)
@@ -37,16 +41,10 @@ MIDDAY_LIMIT    = 150.0
 TIME_CLOSE_45_69   = 16
 TIME_CLOSE_70_PLUS = 31
 
-# Dynamic spread schedule (index points)
-SPREAD_SCHEDULE = [
-    ((1, 15),  (8, 0),  4.0),
-    ((8, 0),   (9, 0),  2.0),
-    ((9, 0),   (17, 30), 1.2),
-    ((17, 30), (22, 0), 2.0),
-    ((22, 0),  (23, 59), 5.0),
-    ((0, 0),   (1, 15), 5.0),
-]
-DEFAULT_SPREAD = 5.0
+# Dynamic spread schedule: SPREAD_SCHEDULE / DEFAULT_SPREAD live in
+# ../spread_schedule.py (shared with the converters' --spread schedule),
+# compiled once into a minute-of-day table.
+SPREAD = SpreadTable(SPREAD_SCHEDULE, DEFAULT_SPREAD)
 
 RETRACTION_TABLE = [
     (15.0, 29.9, 0, 18.0),
@@ -123,22 +121,12 @@ state = {
 # -------------------------------------------------------------------------
 def get_spread(dt):
     """Return spread value for the given datetime."""
-    t = dt.time()
-    for (st, en, val) in SPREAD_SCHEDULE:
-        st_t = time(*st)
-        en_t = time(*en)
-        if st_t <= en_t:
-            if st_t <= t <= en_t:
-                return val
-        else:  # wrap midnight
-            if t >= st_t or t <= en_t:
-                return val
-    return DEFAULT_SPREAD
+    return SPREAD.at(dt)
 
 def parse_args():
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv", required=True,
-                    help="CSV file with D/M/Y;H:M:S;O;H;L;C")
+                    help="CSV file with D/M/Y;H:M:S;O;H;L;C, a .bars file from bar_cache.py, or an MT4 .hst")
     ap.add_argument("--year_range", default="2024",
                     help="e.g. 2024 or 2020-2025 (default=2024)")
     ap.add_argument("--verbose", action="store_true")
@@ -490,65 +478,54 @@ def run_backtest(csvPath, yrs, srcTz, dstTz, quiet=False):
     DEBUG_LIMIT = 20  # Number of rows to debug
     line_count = 0    # Initialize line counter
 
-    with open(csvPath, "r", newline="") as f:
-        rdr = csv.reader(f, delimiter=';')
-        for row in rdr:
-            if len(row) < 6:
-                continue
-            dstr = row[0].strip()  # dd/mm/yyyy
-            tstr = row[1].strip()  # hh:mm:ss
-            dtRaw = f"{dstr} {tstr}"
-            try:
-                # naive parse
-                naive = datetime.strptime(dtRaw, "%d/%m/%Y %H:%M:%S")
-            except:
-                continue
-
-            # interpret as srcTz
-            dtSrc = naive.replace(tzinfo=tzSrc)
-            # convert to London
-            dt = dtSrc.astimezone(tzDst)
-
-            # Year filtering
-            if yrs and dt.year not in yrs:
-                continue
-
-            try:
-                op = float(row[2])
-                hi = float(row[3])
-                lo = float(row[4])
-                cl = float(row[5])
-            except:
-                continue
-
-            price = op
-
-            # Debug the first few rows
-            line_count += 1
-            if not quiet and line_count <= DEBUG_LIMIT:
-                logging.debug(
-                    f"LINE {line_count}: "
-                    f"naive={naive} "
-                    f"dtSrc={dtSrc} "
-                    f"dtDst={dt} "
-                    f"price={price:.2f}"
-                )
-
-            # Daily reset of session flags
-            handle_daily_reset(dt)
-
-            # Continue with existing logic
-            for price in [lo, hi]:  # Check low first (for SL), then high (for TP)
-                handle_session(dt, price, state["session1"], 1)
-                handle_session(dt, price, state["session2"], 2)
-                check_volatility(dt, price)
-                check_sweeps(dt, price)
-                check_outside_sessions(dt, price)
-                if state["session1"].active:
-                    try_open_trade(dt, price, state["session1"], 1)
-                if state["session2"].active:
-                    try_open_trade(dt, price, state["session2"], 2)
-                manage_trade(dt, price)
+    cache = None
+    if bar_cache.is_bar_cache(csvPath):
+        cache = bar_cache.BarCache(csvPath)
+        rows = cache.iter_bars(yrs)
+    else:
+        rows = bar_cache.iter_source_bars(csvPath, srcTz)
+
+    for naive, op, hi, lo, cl, _vol in rows:
+        # interpret as srcTz
+        dtSrc = naive.replace(tzinfo=tzSrc)
+        # convert to London
+        dt = dtSrc.astimezone(tzDst)
+
+        # Year filtering
+        if yrs and dt.year not in yrs:
+            continue
+
+        price = op
+
+        # Debug the first few rows
+        line_count += 1
+        if not quiet and line_count <= DEBUG_LIMIT:
+            logging.debug(
+                f"LINE {line_count}: "
+                f"naive={naive} "
+                f"dtSrc={dtSrc} "
+                f"dtDst={dt} "
+                f"price={price:.2f}"
+            )
+
+        # Daily reset of session flags
+        handle_daily_reset(dt)
+
+        # Continue with existing logic
+        for price in [lo, hi]:  # Check low first (for SL), then high (for TP)
+            handle_session(dt, price, state["session1"], 1)
+            handle_session(dt, price, state["session2"], 2)
+            check_volatility(dt, price)
+            check_sweeps(dt, price)
+            check_outside_sessions(dt, price)
+            if state["session1"].active:
+                try_open_trade(dt, price, state["session1"], 1)
+            if state["session2"].active:
+                try_open_trade(dt, price, state["session2"], 2)
+            manage_trade(dt, price)
+
+    if cache:
+        cache.close()
 
     for tr in state["activeTrades"].values():  # Iterate over activeTrades
         if tr and tr.active:
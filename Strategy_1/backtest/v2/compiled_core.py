@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Compiled core loop for mq4_backtest_v3 (--engine numba).
+
+run_core() is StrategyEngine's per-price loop (feed_market, then
+check_sweeps / check_outside_sessions / try_open_trade / manage_trade for
+every strategy and session) written over flat NumPy arrays and typed state
+arrays instead of engine objects, so numba can compile it:
+
+  minutes   destination-wall epoch minute of every bar
+  prices    every bar's intrabar path, concatenated (IntrabarPath.flat)
+  starts    bar k's prices are prices[starts[k]:starts[k+1]]
+
+plus the DaySchedule tables (DaySchedule.arrays), the retraction table, the
+distance levels and the StrategyConfig values. It returns the closed-trade
+table in close order, the trades still open at the end after it, and the
+trades opened per distance level; StrategyEngine.run_compiled
+replays the table through close_trade, so every report matches the
+pure-Python engines trade for trade.
+
+numba is optional. Without it the functions stay plain Python (correct,
+but far slower than the engines they mirror) and HAVE_NUMBA is False, which
+mq4_backtest_v3 takes as the cue to fall back to --engine events.
+"""
+
+import numpy as np
+
+try:
+    import numba
+    HAVE_NUMBA= True
+    njit= numba.njit(cache=True)
+except ImportError:
+    HAVE_NUMBA= False
+    def njit(fn):
+        return fn
+
+# trade state: tr[sid, sessNum, T_*]
+T_ACTIVE, T_DIR, T_ENTRY, T_ZONE, T_FORCED, T_OPENBAR, T_FINAL, T_NOCLOSE, \
+    T_PEAKHI, T_PEAKLO, T_PEAKMIN, T_PEAKBAR= range(12)
+T_FIELDS= 12
+
+# closed-trade table columns (R_DIR: +1 BUY, -1 SELL; open trades have R_REASON -1)
+R_SID, R_SESS, R_ZONE, R_DIR, R_ENTRY, R_EXIT, R_REASON, R_OPENBAR, R_CLOSEBAR, \
+    R_FINAL, R_PEAKHI, R_PEAKLO, R_PEAKBAR, R_NOCLOSE, R_FORCED= range(15)
+R_FIELDS= 15
+
+# R_REASON codes, in the order of mq4_backtest_v3.CORE_REASONS
+RS_FORCED, RS_GSL, RS_PARTIAL32, RS_BREAKEVEN, RS_TIME45, RS_TIME70, \
+    RS_SWEEP, RS_OUTSIDE= range(8)
+
+# DaySchedule.event codes
+EV_OVERNIGHT_SET, EV_OVERNIGHT_CHECK, EV_MIDDAY_SET, EV_MIDDAY_CHECK= 1, 2, 3, 4
+
+@njit
+def retraction_lookup(r, table):
+    for i in range(table.shape[0]):
+        if table[i,0]<= r<= table[i,1]:
+            return int(table[i,2]), table[i,3]
+    return 0, 0.0
+
+@njit
+def pick_final_distance(baseDist, skip, shift, tolerance, levels):
+    """mq4_backtest_v3.pick_final_distance; -1.0 for None."""
+    baseIdx= -1
+    for i in range(len(levels)):
+        if levels[i]== baseDist:
+            baseIdx= i
+            break
+    if baseIdx< 0:
+        return -1.0
+    fIdx= baseIdx+ skip
+    if fIdx> 3: fIdx= 3
+    chosen= max(levels[baseIdx]+ shift, levels[fIdx])
+    if chosen> 130+ tolerance:
+        return -1.0
+    for i in range(len(levels)):
+        lv= levels[i]
+        if abs(chosen- lv)< 0.5:
+            return lv
+        if i< 3 and chosen> lv and chosen< levels[i+1]:
+            return levels[i+1]
+        if i== 3 and chosen> lv:
+            return lv
+    return -1.0
+
+@njit
+def skip_break_even(sid, sessNum, zoneID):
+    if sid== 2:
+        return sessNum== 1 and zoneID== 1
+    if sid== 3:
+        return True
+    if sid== 4:
+        return not (sessNum== 1 and zoneID== 1)
+    return False
+
+@njit
+def close_row(rows, nRows, tr, sid, sessNum, price, reason, k):
+    """Append trade (sid, sessNum) closed at *price* on bar k; returns (rows, nRows)."""
+    if nRows== rows.shape[0]:
+        grown= np.empty((2* rows.shape[0], R_FIELDS))
+        grown[:nRows]= rows[:nRows]
+        rows= grown
+    t= tr[sid, sessNum]
+    row= rows[nRows]
+    row[R_SID]= sid
+    row[R_SESS]= sessNum
+    row[R_ZONE]= t[T_ZONE]
+    row[R_DIR]= t[T_DIR]
+    row[R_ENTRY]= t[T_ENTRY]
+    row[R_EXIT]= price
+    row[R_REASON]= reason
+    row[R_OPENBAR]= t[T_OPENBAR]
+    row[R_CLOSEBAR]= k
+    row[R_FINAL]= t[T_FINAL]
+    row[R_PEAKHI]= t[T_PEAKHI]
+    row[R_PEAKLO]= t[T_PEAKLO]
+    row[R_PEAKBAR]= t[T_PEAKBAR]
+    row[R_NOCLOSE]= t[T_NOCLOSE]
+    row[R_FORCED]= t[T_FORCED]
+    t[T_ACTIVE]= 0.0
+    return rows, nRows+ 1
+
+@njit
+def run_core(minutes, prices, starts,
+             inSession, outside, zoneId, zoneBD, zoneFc, zoneNC, event,
+             retrTable, levels,
+             tolerance, gsl, sweepClose, overnightLimit, middayLimit, tc45, tc70,
+             overnightRef, middayRef):
+    """
+    The whole bar stream on a fresh engine whose volatility references are
+    overnightRef/middayRef (NaN for None). Returns (rows, nClosed, nRows,
+    opened): rows[:nClosed] the closed trades in close order,
+    rows[nClosed:nRows] the trades left open; opened[i] holds the number of
+    trades opened at levels[i] and the sequence number of the first one.
+    """
+    n= len(minutes)
+    rows= np.empty((1024, R_FIELDS))
+    nRows= 0
+    opened= np.zeros((len(levels), 2), dtype=np.int64)
+    nOpened= 0
+
+    tr= np.zeros((5, 3, T_FIELDS))
+    blocked= np.zeros((5, 3), dtype=np.bool_)
+    sActive= np.zeros(3, dtype=np.bool_)
+    sAllowed= np.ones(3, dtype=np.bool_)
+    sOpen= np.zeros(3)
+    sHigh= np.zeros(3)
+    sLow= np.zeros(3)
+    curDay= 0
+    started= False
+
+    for k in range(n):
+        minute= minutes[k]
+        day= minute// 1440
+        mod= minute- day* 1440
+
+        # daily_reset_if_new_date: open trades are dropped, not closed
+        if not started or day!= curDay:
+            started= True
+            curDay= day
+            for s in range(1, 3):
+                sAllowed[s]= True
+                sActive[s]= False
+            for sid in range(1, 5):
+                for s in range(1, 3):
+                    blocked[sid, s]= False
+                    tr[sid, s, T_ACTIVE]= 0.0
+
+        inZone= zoneId[1, mod]!= 0 or zoneId[2, mod]!= 0
+        for j in range(starts[k], starts[k+1]):
+            p= prices[j]
+
+            # feed_market: handle_session x2, check_volatility
+            for s in range(1, 3):
+                if not sAllowed[s]:
+                    sActive[s]= False
+                elif inSession[s, mod]:
+                    if not sActive[s]:
+                        sActive[s]= True
+                        sOpen[s]= p
+                        sHigh[s]= p
+                        sLow[s]= p
+                    else:
+                        if p> sHigh[s]: sHigh[s]= p
+                        if p< sLow[s] : sLow[s]= p
+                else:
+                    sActive[s]= False
+            ev= event[mod]
+            if ev== EV_OVERNIGHT_SET:
+                overnightRef= p
+            elif ev== EV_OVERNIGHT_CHECK:
+                if not np.isnan(overnightRef) and abs(p- overnightRef)>= overnightLimit:
+                    sAllowed[1]= False
+                overnightRef= np.nan
+            elif ev== EV_MIDDAY_SET:
+                middayRef= p
+            elif ev== EV_MIDDAY_CHECK:
+                if not np.isnan(middayRef) and abs(p- middayRef)>= middayLimit:
+                    sAllowed[2]= False
+                middayRef= np.nan
+
+            for sid in range(1, 5):
+                if not inZone and tr[sid, 1, T_ACTIVE]== 0.0 and tr[sid, 2, T_ACTIVE]== 0.0:
+                    continue
+                # check_sweeps
+                for s in range(1, 3):
+                    if tr[sid, s, T_ACTIVE]!= 0.0 and sActive[s]:
+                        if abs(p- sOpen[s])>= sweepClose:
+                            rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_SWEEP, k)
+                # check_outside_sessions
+                if outside[mod]:
+                    for s in range(1, 3):
+                        if tr[sid, s, T_ACTIVE]!= 0.0:
+                            rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_OUTSIDE, k)
+                # try_open_trade
+                for s in range(1, 3):
+                    if tr[sid, s, T_ACTIVE]!= 0.0:
+                        continue
+                    if not sActive[s] or blocked[sid, s]:
+                        continue
+                    zID= zoneId[s, mod]
+                    if zID== 0:
+                        continue
+                    bD= zoneBD[s, mod]
+                    if p>= sOpen[s]:
+                        r= sHigh[s]- p
+                    else:
+                        r= p- sLow[s]
+                    skip, shift= retraction_lookup(r, retrTable)
+                    if skip== -1:
+                        blocked[sid, s]= True
+                        continue
+                    dist= abs(p- sOpen[s])
+                    if dist< bD or dist> bD+ tolerance:
+                        continue
+                    finalDist= pick_final_distance(bD, skip, shift, tolerance, levels)
+                    if finalDist< 0.0:
+                        continue
+                    if dist< finalDist or dist> finalDist+ tolerance:
+                        continue
+                    for i in range(len(levels)):
+                        if levels[i]== finalDist:
+                            if opened[i,0]== 0:
+                                opened[i,1]= nOpened
+                            opened[i,0]+= 1
+                    nOpened+= 1
+                    t= tr[sid, s]
+                    t[T_ACTIVE]= 1.0
+                    t[T_DIR]= 1.0 if p< sOpen[s] else -1.0
+                    t[T_ENTRY]= p
+                    t[T_ZONE]= zID
+                    t[T_FORCED]= day* 1440+ zoneFc[s, mod]
+                    t[T_OPENBAR]= k
+                    t[T_FINAL]= finalDist
+                    t[T_NOCLOSE]= 1.0 if zoneNC[s, mod] else 0.0
+                    t[T_PEAKHI]= p
+                    t[T_PEAKLO]= p
+                    t[T_PEAKMIN]= minute
+                    t[T_PEAKBAR]= k
+                # manage_trade
+                for s in range(1, 3):
+                    t= tr[sid, s]
+                    if t[T_ACTIVE]== 0.0:
+                        continue
+                    entry= t[T_ENTRY]
+                    if minute>= t[T_FORCED]:
+                        rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_FORCED, k)
+                        continue
+                    if abs(p- entry)>= gsl:
+                        rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_GSL, k)
+                        continue
+                    if p> t[T_PEAKHI]:
+                        t[T_PEAKHI]= p
+                        t[T_PEAKMIN]= minute
+                        t[T_PEAKBAR]= k
+                    if p< t[T_PEAKLO]:
+                        t[T_PEAKLO]= p
+                        t[T_PEAKMIN]= minute
+                        t[T_PEAKBAR]= k
+                    if t[T_NOCLOSE]!= 0.0 and sid!= 1:
+                        continue
+                    buy= t[T_DIR]> 0.0
+                    elap= minute- t[T_PEAKMIN]
+                    if 45<= t[T_FINAL]< 70:
+                        if buy:
+                            peakProfit= t[T_PEAKHI]- entry
+                        else:
+                            peakProfit= entry- t[T_PEAKLO]
+                        if 32<= peakProfit<= 35 and elap>= 16:
+                            forcedP= entry+ 32 if buy else entry- 32
+                            rows, nRows= close_row(rows, nRows, tr, sid, s, forcedP, RS_PARTIAL32, k)
+                            continue
+                        if not skip_break_even(sid, s, int(t[T_ZONE])):
+                            if buy:
+                                mae= entry- t[T_PEAKLO]
+                            else:
+                                mae= t[T_PEAKHI]- entry
+                            if mae>= 15 and abs(p- entry)< 1.0:
+                                rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_BREAKEVEN, k)
+                                continue
+                        if elap>= tc45:
+                            rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_TIME45, k)
+                    else:
+                        if elap>= tc70:
+                            rows, nRows= close_row(rows, nRows, tr, sid, s, p, RS_TIME70, k)
+
+    nClosed= nRows
+    for sid in range(1, 5):
+        for s in range(1, 3):
+            if tr[sid, s, T_ACTIVE]!= 0.0:
+                rows, nRows= close_row(rows, nRows, tr, sid, s, np.nan, -1, -1)
+    return rows, nClosed, nRows, opened
@@ -21,7 +21,6 @@ Usage Example:
     --verbose
 """
 
-import csv
 import argparse
 import logging
 from datetime import datetime, time
@@ -29,8 +28,12 @@ import math
 from zoneinfo import ZoneInfo
 import pathlib
 import re
+import sys
 from collections import defaultdict, Counter
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import bar_cache
+
 # Attempt to import openpyxl (for Excel output). If missing, we'll skip it.
 try:
     import openpyxl
@@ -154,7 +157,7 @@ def init_strategy_states():
 def parse_args():
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv", required=True,
-                    help="CSV with D/M/Y;H:M:S;O;H;L;C (in --src_tz).")
+                    help="CSV with D/M/Y;H:M:S;O;H;L;C (in --src_tz), a .bars file from bar_cache.py, or an MT4 .hst.")
     ap.add_argument("--year_range", default="2024",
                     help="e.g. 2024 or 2020-2025 (default=2024)")
     ap.add_argument("--verbose", action="store_true")
@@ -532,60 +535,50 @@ def run_backtest(csv_file, yrs, src_tz, dst_tz, produce_excel=False, out_dir="."
         logging.error(f"CSV file not found: {csv_file}")
         return
 
-    with f.open("r", newline="") as fh:
-        rdr= csv.reader(fh, delimiter=';')
-        naive= None
-        for row in rdr:
-            if len(row)<6:  # skip invalid
-                continue
-            dstr= row[0].strip()
-            tstr= row[1].strip()
-            dtRaw= f"{dstr} {tstr}"
-            try:
-                naive= datetime.strptime(dtRaw, "%d/%m/%Y %H:%M:%S")
-            except:
-                continue
+    cache= None
+    if bar_cache.is_bar_cache(f):
+        cache= bar_cache.BarCache(f)
+        rows= cache.iter_bars(yrs)
+    else:
+        rows= bar_cache.iter_source_bars(f, src_tz)
 
-            dtSrc= naive.replace(tzinfo=tzSrc)
-            dt= dtSrc.astimezone(tzDst)
-            if dt.year not in yrs:
-                continue
+    naive= None
+    for naive, op, hi, lo, cl, _vol in rows:
+        dtSrc= naive.replace(tzinfo=tzSrc)
+        dt= dtSrc.astimezone(tzDst)
+        if dt.year not in yrs:
+            continue
 
-            try:
-                op= float(row[2])
-                hi= float(row[3])
-                lo= float(row[4])
-                cl= float(row[5])
-            except:
-                continue
+        # daily reset for each strategy
+        for sid in (1,2,3,4):
+            daily_reset_if_new_date(dt, sid)
 
-            # daily reset for each strategy
-            for sid in (1,2,3,4):
-                daily_reset_if_new_date(dt, sid)
-
-            # we feed lo & hi
-            for p in [lo, hi]:
-                for sid in (1,2,3,4):
-                    handle_session(dt, p, sid, 1)
-                    handle_session(dt, p, sid, 2)
-                    check_volatility(dt, p, sid)
-                    check_sweeps(dt, p, sid, 1)
-                    check_sweeps(dt, p, sid, 2)
-                    check_outside_sessions(dt, p, sid, 1)
-                    check_outside_sessions(dt, p, sid, 2)
-                    try_open_trade(dt, p, sid, 1)
-                    try_open_trade(dt, p, sid, 2)
-                    manage_trade(dt, p, sid, 1)
-                    manage_trade(dt, p, sid, 2)
-
-        # end-of-file => close any open trades
-        if naive:
-            last_dt= naive.replace(tzinfo=tzSrc).astimezone(tzDst)
+        # we feed lo & hi
+        for p in [lo, hi]:
             for sid in (1,2,3,4):
-                st= STRAT_STATE[sid]
-                for sID,tr in st["activeTrades"].items():
-                    if tr and tr.active:
-                        close_trade(tr, tr.entry, "EndOfBacktest", last_dt)
+                handle_session(dt, p, sid, 1)
+                handle_session(dt, p, sid, 2)
+                check_volatility(dt, p, sid)
+                check_sweeps(dt, p, sid, 1)
+                check_sweeps(dt, p, sid, 2)
+                check_outside_sessions(dt, p, sid, 1)
+                check_outside_sessions(dt, p, sid, 2)
+                try_open_trade(dt, p, sid, 1)
+                try_open_trade(dt, p, sid, 2)
+                manage_trade(dt, p, sid, 1)
+                manage_trade(dt, p, sid, 2)
+
+    # end-of-file => close any open trades
+    if cache:
+        naive= cache.last_naive()
+        cache.close()
+    if naive:
+        last_dt= naive.replace(tzinfo=tzSrc).astimezone(tzDst)
+        for sid in (1,2,3,4):
+            st= STRAT_STATE[sid]
+            for sID,tr in st["activeTrades"].items():
+                if tr and tr.active:
+                    close_trade(tr, tr.entry, "EndOfBacktest", last_dt)
 
     produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel)
 
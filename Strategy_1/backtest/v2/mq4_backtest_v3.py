@@ -11,6 +11,18 @@ and produces a single-sheet Excel with multiple sections:
 (5)  Major Metrics Table
 (6)  Optimal Levels Analysis
 
+With --format parquet|arrow|csv the closed trades, the (sid,year,month)
+aggregates and the major-metrics buckets are also written as typed columnar
+files (trades_/aggregates_/major_metrics_<date>) for reloading elsewhere.
+
+--path picks the order the prices inside each bar are visited in (LH, OLHC,
+OHLC, NEAREST, or LTF from a lower-timeframe --path_file); see IntrabarPath.
+--engine events (the default when numpy is installed) jumps from one bar that
+can change something to the next instead of visiting every bar; see
+StrategyEngine.run_index. --engine bars is the plain bar-by-bar loop.
+--engine numba runs the same loop compiled (compiled_core.py, optional numba
+dependency; without numba it falls back to events).
+
 We remove the “Total_hcXX” columns from the pivot (4). 
 We keep “dist70_99”, “dist100_129”, “dist130_plus” for finalDist≥70,≥100,≥130. 
 We also do a partial close if 16 min pass since peak & peakProfit in [32..35] => forcibly +32 pips. 
@@ -19,28 +31,98 @@ We also do a partial close if 16 min pass since peak & peakProfit in [32..35] =>
 import csv
 import argparse
 import logging
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 from zoneinfo import ZoneInfo
 import pathlib
 import re
-from collections import defaultdict, Counter
+import sys
+from collections import defaultdict, Counter, deque
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+import bar_cache
+import tz_convert
 try:
     import openpyxl
     from openpyxl.styles import Font, PatternFill
+    from openpyxl.cell import WriteOnlyCell
     HAVE_OPENPYXL = True
 except ImportError:
     HAVE_OPENPYXL = False
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+try:
+    import compiled_core
+    HAVE_NUMBA = compiled_core.HAVE_NUMBA
+except ImportError:
+    HAVE_NUMBA = False
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
 
 # ---------------------------
 # Data Aggregation
 # ---------------------------
+class StreamStat:
+    """
+    Running count / sum / min / max of one pips series, folded in trade by
+    trade with add() and combined with merge() for the rollups. With
+    keep_values=True the values are also kept in a typed array('d') (8 bytes
+    each, no float objects) so medians stay exact; without it the stat is a
+    fixed-size record no matter how many trades it has seen.
+    """
+    __slots__= ("count","total","lo","hi","values")
+
+    def __init__(self, keep_values=False):
+        self.count= 0
+        self.total= 0.0
+        self.lo= None
+        self.hi= None
+        self.values= array("d") if keep_values else None
+
+    def add(self, x):
+        self.count+= 1
+        self.total+= x
+        if self.lo is None or x< self.lo: self.lo= x
+        if self.hi is None or x> self.hi: self.hi= x
+        if self.values is not None:
+            self.values.append(x)
+
+    def merge(self, other):
+        self.count+= other.count
+        self.total+= other.total
+        if other.lo is not None and (self.lo is None or other.lo< self.lo): self.lo= other.lo
+        if other.hi is not None and (self.hi is None or other.hi> self.hi): self.hi= other.hi
+        if self.values is not None:
+            self.values.extend(other.values)
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def mean(self):
+        return self.total/ self.count if self.count else 0.0
+
+    def median(self):
+        return median(self.values)
+
 def aggregator_factory():
     return {
         "count":0,
         "wins":0,
         "loses":0,
-        "pips_list":[],
-        "hc_50_list":[],"hc_60_list":[],"hc_70_list":[],"hc_80_list":[],"hc_90_list":[],"hc_100_list":[],
+        "pips":StreamStat(True),
+        "hc_50":StreamStat(True),"hc_60":StreamStat(True),"hc_70":StreamStat(True),
+        "hc_80":StreamStat(True),"hc_90":StreamStat(True),"hc_100":StreamStat(True),
 
         "sumDD":0.0,
         "maxDD":0.0,
@@ -48,27 +130,35 @@ def aggregator_factory():
         "maxProfitPeak":0.0
     }
 
-data = defaultdict(aggregator_factory)
+def merge_aggregator(ma, b_):
+    """Fold data bucket *b_* into rollup *ma* (both from aggregator_factory)."""
+    ma["count"]+= b_["count"]
+    ma["wins"]+= b_["wins"]
+    ma["loses"]+= b_["loses"]
+    for k in ("pips","hc_50","hc_60","hc_70","hc_80","hc_90","hc_100"):
+        ma[k].merge(b_[k])
+    ma["sumDD"]+= b_["sumDD"]
+    if b_["maxDD"]> ma["maxDD"]:
+        ma["maxDD"]= b_["maxDD"]
+    ma["sumProfitPeak"]+= b_["sumProfitPeak"]
+    if b_["maxProfitPeak"]> ma["maxProfitPeak"]:
+        ma["maxProfitPeak"]= b_["maxProfitPeak"]
+    return ma
 
 def major_metrics_factory():
     return {
-        "session1_list":[],
-        "session2_list":[],
-        "zone1_list":[],
-        "zone2_list":[],
-        "zone3_list":[],
-        "zone4_list":[],
-        "dist45_69_list":[],
-        "dist70_99_list":[],
-        "dist100_129_list":[],
-        "dist130_plus_list":[]
+        "session1":StreamStat(),
+        "session2":StreamStat(),
+        "zone1":StreamStat(),
+        "zone2":StreamStat(),
+        "zone3":StreamStat(),
+        "zone4":StreamStat(),
+        "dist45_69":StreamStat(),
+        "dist70_99":StreamStat(),
+        "dist100_129":StreamStat(),
+        "dist130_plus":StreamStat()
     }
 
-majorMetrics = defaultdict(major_metrics_factory)
-
-open_dist_counter = Counter()
-close_reason_counter= Counter()
-
 # ---------------------------
 # Common Config
 # ---------------------------
@@ -114,6 +204,28 @@ STRATEGY_NAMES = {
     4: "No15BE_AfterEarliestZone",
 }
 
+class StrategyConfig:
+    """
+    Tunable constants for one engine. Defaults come from the module
+    constants above; pass overrides by name, e.g. StrategyConfig(GSL=35.0).
+    """
+    FIELDS = ("TOLERANCE","GSL","SWEEP_CLOSE","OVERNIGHT_LIMIT","MIDDAY_LIMIT",
+              "TIME_CLOSE_45_69","TIME_CLOSE_70_PLUS")
+
+    def __init__(self, **overrides):
+        for name in self.FIELDS:
+            setattr(self, name, globals()[name])
+        for name, val in overrides.items():
+            if name not in self.FIELDS:
+                raise ValueError(f"Unknown config field {name}")
+            setattr(self, name, val)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __repr__(self):
+        return f"StrategyConfig({', '.join(f'{k}={v}' for k,v in self.as_dict().items())})"
+
 class SessionData:
     def __init__(self,name,stH,stM,enH,enM,zones):
         self.name=name
@@ -147,35 +259,37 @@ class Trade:
         self.peakTime= openTime
         self.active= True
 
-STRAT_STATE = {}
-
-def init_strategy_states():
-    for sid in (1,2,3,4):
-        s1= SessionData("Session1", *SESSION1_START, *SESSION1_END, SESSION1_ZONES)
-        s2= SessionData("Session2", *SESSION2_START, *SESSION2_END, SESSION2_ZONES)
-        STRAT_STATE[sid]= {
-            "session1": s1,
-            "session2": s2,
-            "activeTrades": {1: None, 2: None},
-            "closedTrades": [],
-            "overnightRef": None,
-            "middayRef": None,
-            "currentDate": None,
-        }
-
 # -------------------------------------------------------------------------
 # CLI
 # -------------------------------------------------------------------------
 def parse_args():
     ap= argparse.ArgumentParser()
-    ap.add_argument("--csv", required=True)
+    ap.add_argument("--csv", required=True,
+                    help="dax-1m.csv, a .bars file built by bar_cache.py, or an MT4 .hst")
     ap.add_argument("--year_range", default="2024")
     ap.add_argument("--verbose", action="store_true")
     ap.add_argument("--src_tz", default="America/Chicago")
     ap.add_argument("--dst_tz", default="Europe/London")
     ap.add_argument("--out_dir", default=".")
     ap.add_argument("--excel", action="store_true")
-    return ap.parse_args()
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Run calendar-month shards in N worker processes (default=1 => serial).")
+    ap.add_argument("--path", choices=PATH_MODES, default="LH",
+                    help="Intrabar price order: LH (default), OLHC, OHLC, NEAREST, or LTF "
+                         "(lower-timeframe series from --path_file).")
+    ap.add_argument("--path_file", default=None,
+                    help="Lower-timeframe CSV/.hst for --path LTF (times with seconds).")
+    ap.add_argument("--engine", choices=ENGINES, default="events",
+                    help="events (default, needs numpy): visit only the bars that can change "
+                         "something; bars: feed every bar; numba: the compiled core loop "
+                         "(falls back to events without numba).")
+    ap.add_argument("--format", choices=EXPORT_FORMATS, default=None,
+                    help="Also write trades/aggregates/major metrics as columnar files "
+                         "(parquet/arrow need pyarrow).")
+    args= ap.parse_args()
+    if args.path=="LTF" and not args.path_file:
+        ap.error("--path LTF needs --path_file")
+    return args
 
 def setup_logging(verbose, out_dir, yr_tag=""):
     outp= pathlib.Path(out_dir)
@@ -203,21 +317,6 @@ def parse_year_range(rng):
 def minutes_diff(d1,d2):
     return int((d2-d1).total_seconds()//60)
 
-def daily_reset_if_new_date(dt, sid):
-    st= STRAT_STATE[sid]
-    old= st["currentDate"]
-    new_= dt.date()
-    if old is None or old!=new_:
-        st["currentDate"]= new_
-        st["session1"].allowed= True
-        st["session1"].active= False
-        st["session2"].allowed= True
-        st["session2"].active= False
-        st["session1"].dayDate= new_
-        st["session2"].dayDate= new_
-        st["activeTrades"]={1: None, 2: None}
-        logging.debug(f"[Strategy {sid}] daily reset for {new_}")
-
 def in_time_window(dt,h1,m1, h2,m2):
     t= dt.time()
     st= time(h1,m1)
@@ -226,68 +325,79 @@ def in_time_window(dt,h1,m1, h2,m2):
         return (t>=st) or (t<ed)
     return (t>=st) and (t<ed)
 
-def handle_session(dt, price, sid, sessNum):
-    st= STRAT_STATE[sid]
-    sess= st["session1"] if sessNum==1 else st["session2"]
-    if sess.dayDate!= dt.date() and sess.active:
-        end_session(sid, sessNum)
-    if not sess.allowed:
-        if sess.active:
-            end_session(sid, sessNum)
-        return
-
-    if in_time_window(dt, sess.startH, sess.startM, sess.endH, sess.endM):
-        if not sess.active:
-            start_session(sid, sessNum, price, dt)
-        else:
-            if price> sess.highPrice: sess.highPrice= price
-            if price< sess.lowPrice : sess.lowPrice= price
-    else:
-        if sess.active:
-            end_session(sid, sessNum)
-
-def start_session(sid, sessNum, price, dt):
-    st= STRAT_STATE[sid]
-    s_= st["session1"] if sessNum==1 else st["session2"]
-    s_.active= True
-    s_.openPrice= price
-    s_.highPrice= price
-    s_.lowPrice=  price
-    logging.debug(f"[Strat{sid}] Session{sessNum} start @ {price:.1f}, date={dt.date()}")
-
-def end_session(sid, sessNum):
-    st= STRAT_STATE[sid]
-    s_= st["session1"] if sessNum==1 else st["session2"]
-    logging.debug(f"[Strat{sid}] Session{sessNum} end.")
-    s_.active= False
-    s_.openPrice=None
-    s_.highPrice=None
-    s_.lowPrice=None
-
-def get_active_zone(dt, sid, sessNum):
-    st= STRAT_STATE[sid]
-    s_= st["session1"] if sessNum==1 else st["session2"]
-    if not s_.active: return None
-    for z_ in s_.zones:
-        (stH,stM)= z_[0]
-        (enH,enM)= z_[1]
-        (fcH,fcM)= z_[2]
-        zID=  z_[3]
-        bD=   z_[4]
-        nC=   z_[5]
-        if in_time_window(dt, stH,stM, enH,enM):
-            forced= datetime(dt.year, dt.month, dt.day, fcH,fcM, tzinfo=dt.tzinfo)
-            return (forced, zID, bD, nC)
-    return None
-
-def calc_retraction(dt, price, sid, sessNum):
-    st= STRAT_STATE[sid]
-    s_= st["session1"] if sessNum==1 else st["session2"]
-    if not s_.active or s_.openPrice is None:
-        return 0.0
-    if price>= s_.openPrice:
-        return s_.highPrice- price
-    return price- s_.lowPrice
+# -------------------------------------------------------------------------
+# Minute-of-day schedule
+# -------------------------------------------------------------------------
+EV_OVERNIGHT_SET   = 1   # 17:16 capture overnightRef
+EV_OVERNIGHT_CHECK = 2   # 08:00 compare against overnightRef
+EV_MIDDAY_SET      = 3   # 12:00 capture middayRef
+EV_MIDDAY_CHECK    = 4   # 14:30 compare against middayRef
+
+class DaySchedule:
+    """
+    1440-slot lookup tables indexed by minute of day (hour*60+minute), built
+    once from the session bounds and SESSION1_ZONES/SESSION2_ZONES with the
+    same in_time_window rules:
+
+      inSession[sessNum][m] -> minute lies in that session's window
+      outside[m]            -> minute lies in neither session
+      zone[sessNum][m]      -> first matching zone as (fcH,fcM, zID, baseDist, noClose), or None
+      event[m]              -> EV_* volatility checkpoint, or 0
+      segment[m]            -> id of the (inSession, zone, event) combination
+                               above; equal ids behave identically
+    """
+    def __init__(self):
+        s1= SessionData("Session1", *SESSION1_START, *SESSION1_END, SESSION1_ZONES)
+        s2= SessionData("Session2", *SESSION2_START, *SESSION2_END, SESSION2_ZONES)
+        self.inSession= {1: [False]*1440, 2: [False]*1440}
+        self.zone= {1: [None]*1440, 2: [None]*1440}
+        self.outside= [True]*1440
+        self.event= [0]*1440
+
+        for m in range(1440):
+            dt= datetime(2000,1,1, m//60, m%60)
+            for sessNum, sess in ((1,s1),(2,s2)):
+                if in_time_window(dt, sess.startH, sess.startM, sess.endH, sess.endM):
+                    self.inSession[sessNum][m]= True
+                    self.outside[m]= False
+                for z_ in sess.zones:
+                    (stH,stM),(enH,enM),(fcH,fcM), zID, bD, nC= z_
+                    if in_time_window(dt, stH,stM, enH,enM):
+                        self.zone[sessNum][m]= (fcH,fcM, zID, bD, nC)
+                        break
+
+        self.event[17*60+16]= EV_OVERNIGHT_SET
+        self.event[8*60]    = EV_OVERNIGHT_CHECK
+        self.event[12*60]   = EV_MIDDAY_SET
+        self.event[14*60+30]= EV_MIDDAY_CHECK
+
+        sigs= {}
+        self.segment= [sigs.setdefault((self.inSession[1][m], self.inSession[2][m],
+                                        self.zone[1][m], self.zone[2][m], self.event[m]), len(sigs))
+                       for m in range(1440)]
+
+    def arrays(self):
+        """
+        The tables as NumPy arrays for compiled_core.run_core: inSession,
+        outside, the zone's id / base distance / forced-close minute of day /
+        noClose (all [sessNum, m]; zone id 0 where there is no zone), event.
+        """
+        inSession= np.zeros((3,1440), dtype=bool)
+        zoneId= np.zeros((3,1440), dtype=np.int64)
+        zoneBD= np.zeros((3,1440))
+        zoneFc= np.zeros((3,1440), dtype=np.int64)
+        zoneNC= np.zeros((3,1440), dtype=bool)
+        for sessNum in (1,2):
+            inSession[sessNum]= self.inSession[sessNum]
+            for m, z_ in enumerate(self.zone[sessNum]):
+                if z_ is not None:
+                    fcH, fcM, zID, bD, nC= z_
+                    zoneId[sessNum,m]= zID
+                    zoneBD[sessNum,m]= bD
+                    zoneFc[sessNum,m]= fcH*60+ fcM
+                    zoneNC[sessNum,m]= nC
+        return (inSession, np.asarray(self.outside, dtype=bool), zoneId, zoneBD, zoneFc,
+                zoneNC, np.asarray(self.event, dtype=np.int64))
 
 def retraction_lookup(r):
     for (mn,mx,skip,shift) in RETRACTION_TABLE:
@@ -295,7 +405,7 @@ def retraction_lookup(r):
             return (skip,shift)
     return (0,0)
 
-def pick_final_distance(baseDist, skip, shift):
+def pick_final_distance(baseDist, skip, shift, tolerance=TOLERANCE):
     try:
         baseIdx= DIST_LEVELS.index(baseDist)
     except:
@@ -306,7 +416,7 @@ def pick_final_distance(baseDist, skip, shift):
     nextVal= DIST_LEVELS[fIdx]
     shifted= baseVal+shift
     chosen= max(shifted, nextVal)
-    if chosen> 130+ TOLERANCE:
+    if chosen> 130+ tolerance:
         return None
     final=None
     for i, lv in enumerate(DIST_LEVELS):
@@ -321,299 +431,1104 @@ def pick_final_distance(baseDist, skip, shift):
             break
     return final
 
-def try_open_trade(dt, price, sid, sessNum):
-    st= STRAT_STATE[sid]
-    if st["activeTrades"][sessNum] is not None:
-        return
-    zone_ = get_active_zone(dt, sid, sessNum)
-    if not zone_: return
-    forcedC, zID, bD, nC= zone_
-
-    r= calc_retraction(dt, price, sid, sessNum)
-    skip, shift= retraction_lookup(r)
-    if skip==-1:
-        if sessNum==1: st["session1"].allowed=False
-        else: st["session2"].allowed=False
-        logging.debug(f"[Strat{sid}] session{sessNum} blocked≥46 => no trade")
-        return
+def skip_break_even(tr):
+    """The 15-pip break-even rule is off for this 45..69 trade."""
+    if tr.strategyID==2:
+        return tr.sessionID==1 and tr.zoneID==1
+    if tr.strategyID==3:
+        return True
+    if tr.strategyID==4:
+        return not (tr.sessionID==1 and tr.zoneID==1)
+    return False
 
-    s_= st["session1"] if sessNum==1 else st["session2"]
-    direction= "BUY" if price< s_.openPrice else "SELL"
-    dist= abs(price- s_.openPrice)
-    if dist< bD:
-        return
-    if dist> bD+ TOLERANCE:
-        return
-    finalDist= pick_final_distance(bD, skip, shift)
-    if finalDist is None: return
-    if dist< finalDist: return
-    if dist> finalDist+ TOLERANCE: return
+def hard_close_pips(direction, entry, final_pips, peakProfit, level):
+    if peakProfit>= level:
+        return float(level)
+    return float(final_pips)
 
-    open_dist_counter[finalDist]+=1
+# smallest retraction that blocks a session (skip==-1 in RETRACTION_TABLE)
+RETRACTION_BLOCK= min(mn for (mn,mx,skip,shift) in RETRACTION_TABLE if skip==-1)
 
-    tr= Trade(sid, direction, price, sessNum, zID, forcedC, dt, finalDist, nC)
-    st["activeTrades"][sessNum]= tr
-    logging.debug(f"[Strat{sid}] OPEN s{sessNum} z{zID} {direction} ent={price:.1f}, finalDist={finalDist}, forced={forcedC}, noClose={nC}")
+# -------------------------------------------------------------------------
+# Intrabar price path
+# -------------------------------------------------------------------------
+PATH_MODES= ("LH","OLHC","OHLC","NEAREST","LTF")
+
+class IntrabarPath:
+    """
+    Order in which the prices of one bar are fed to the strategies:
+
+      LH       low, then high (the original model; open/close unused)
+      OLHC     open, low, high, close
+      OHLC     open, high, low, close
+      NEAREST  open, the extreme nearer the open, the other extreme, close
+      LTF      the bar's lower-timeframe sub-bars in time order, each one
+               NEAREST; minutes the series does not cover fall back to NEAREST
+
+    *ltf* (LTF only) maps (destination wall epoch minute, fold) to the price
+    sequence of that minute, as built by load_ltf_paths().
+    """
+    def __init__(self, mode="LH", ltf=None):
+        if mode not in PATH_MODES:
+            raise ValueError(f"Unknown path mode {mode}; choose from {', '.join(PATH_MODES)}")
+        if mode=="LTF" and ltf is None:
+            raise ValueError("path mode LTF needs a lower-timeframe series")
+        self.mode= mode
+        self.ltf= ltf
+
+    def prices(self, dt, op, hi, lo, cl):
+        mode= self.mode
+        if mode=="LH":
+            return (lo, hi)
+        if mode=="OLHC":
+            return (op, lo, hi, cl)
+        if mode=="OHLC":
+            return (op, hi, lo, cl)
+        if mode=="LTF":
+            seq= self.ltf.get((tz_convert.to_epoch_minutes(dt.replace(tzinfo=None)), dt.fold))
+            if seq:
+                return seq
+        return nearest_path(op, hi, lo, cl)
+
+    def extremes(self, cols):
+        """
+        NumPy (lowest, highest) price of every bar's path for the bar columns
+        *cols* (see bar_columns); what the event engine searches on.
+        """
+        lows= np.asarray(cols["lows"], dtype=np.float64)
+        highs= np.asarray(cols["highs"], dtype=np.float64)
+        if self.mode=="LH":
+            return lows, highs
+        opens= np.asarray(cols["opens"], dtype=np.float64)
+        closes= np.asarray(cols["closes"], dtype=np.float64)
+        pLo= np.minimum(lows, np.minimum(opens, closes))
+        pHi= np.maximum(highs, np.maximum(opens, closes))
+        if self.ltf:
+            for k, key in enumerate(zip(cols["minutes"], cols["folds"])):
+                seq= self.ltf.get(key)
+                if seq:
+                    pLo[k]= min(seq)
+                    pHi[k]= max(seq)
+        return pLo, pHi
+
+    def price_columns(self, cols):
+        """
+        NumPy columns holding every price the path can visit (LH: lows and
+        highs; the open/close modes: all four), None for LTF, whose sub-bar
+        prices vary per bar.
+        """
+        if self.mode=="LTF":
+            return None
+        names= ("lows","highs") if self.mode=="LH" else ("opens","lows","highs","closes")
+        return [np.asarray(cols[c], dtype=np.float64) for c in names]
+
+    def firsts(self, cols):
+        """NumPy first price of every bar's path (the session open on a bar that starts one)."""
+        if self.mode=="LH":
+            return np.array(cols["lows"], dtype=np.float64)
+        first= np.array(cols["opens"], dtype=np.float64)
+        if self.ltf:
+            for k, key in enumerate(zip(cols["minutes"], cols["folds"])):
+                seq= self.ltf.get(key)
+                if seq:
+                    first[k]= seq[0]
+        return first
+
+    def flat(self, cols):
+        """
+        Every bar's path as one NumPy price array plus offsets, bar k's
+        prices being prices[starts[k]:starts[k+1]] (what compiled_core walks).
+        """
+        n= len(cols["minutes"])
+        if self.mode=="LTF":
+            prices= array("d")
+            starts= array("q", [0])
+            for k in range(n):
+                seq= self.ltf.get((cols["minutes"][k], cols["folds"][k]))
+                prices.extend(seq if seq else nearest_path(cols["opens"][k], cols["highs"][k],
+                                                           cols["lows"][k], cols["closes"][k]))
+                starts.append(len(prices))
+            return np.array(prices, dtype=np.float64), np.array(starts, dtype=np.int64)
+        lows= np.asarray(cols["lows"], dtype=np.float64)
+        highs= np.asarray(cols["highs"], dtype=np.float64)
+        if self.mode=="LH":
+            seq= (lows, highs)
+        else:
+            opens= np.asarray(cols["opens"], dtype=np.float64)
+            closes= np.asarray(cols["closes"], dtype=np.float64)
+            if self.mode=="OLHC":
+                seq= (opens, lows, highs, closes)
+            elif self.mode=="OHLC":
+                seq= (opens, highs, lows, closes)
+            else:
+                near= opens- lows<= highs- opens
+                seq= (opens, np.where(near, lows, highs), np.where(near, highs, lows), closes)
+        return (np.column_stack(seq).ravel(),
+                np.arange(0, len(seq)*n+ 1, len(seq), dtype=np.int64))
+
+    def subset(self, dts):
+        """The same model restricted to the minutes of *dts* (what one month shard needs)."""
+        if self.ltf is None:
+            return self
+        keys= {(tz_convert.to_epoch_minutes(dt.replace(tzinfo=None)), dt.fold) for dt in dts}
+        return IntrabarPath(self.mode, {k: self.ltf[k] for k in keys if k in self.ltf})
+
+def nearest_path(op, hi, lo, cl):
+    if op- lo<= hi- op:
+        return (op, lo, hi, cl)
+    return (op, hi, lo, cl)
+
+def load_ltf_paths(path_file, src_tz, conv):
+    """
+    Read a lower-timeframe series (same CSV layout as --csv, times with
+    seconds, or an MT4 .hst) into {(dst epoch minute, fold): tuple of prices},
+    each sub-bar contributing its NEAREST path.
+    """
+    paths= defaultdict(list)
+    for naive, op, hi, lo, cl, _vol in bar_cache.iter_source_bars(pathlib.Path(path_file), src_tz):
+        dt= conv.to_dst(naive)
+        paths[(tz_convert.to_epoch_minutes(dt.replace(tzinfo=None)), dt.fold)].extend(
+            nearest_path(op, hi, lo, cl))
+    return {k: tuple(v) for k, v in paths.items()}
+
+def make_path(mode, path_file, src_tz, dst_tz, yrs):
+    if mode!="LTF":
+        return IntrabarPath(mode)
+    if not path_file:
+        raise ValueError("--path LTF needs --path_file")
+    conv= tz_convert.TzConverter.for_years(src_tz, dst_tz, yrs)
+    ltf= load_ltf_paths(path_file, src_tz, conv)
+    logging.info(f"Loaded lower-timeframe paths for {len(ltf)} minutes from {path_file}")
+    return IntrabarPath(mode, ltf)
 
-def manage_trade(dt, price, sid, sessNum):
-    st= STRAT_STATE[sid]
-    tr= st["activeTrades"][sessNum]
-    if not tr or not tr.active: return
+# -------------------------------------------------------------------------
+# Event index (--engine events)
+# -------------------------------------------------------------------------
+def bar_columns(bars):
+    """
+    Flat columns from an iterable of (dt, op, hi, lo, cl): destination-wall
+    epoch minutes, folds, opens, highs, lows, closes (the sweep.load_bars layout).
+    """
+    cols= {"minutes": array("q"), "folds": array("b"),
+           "opens": array("d"), "highs": array("d"),
+           "lows": array("d"), "closes": array("d")}
+    for dt, op, hi, lo, cl in bars:
+        cols["minutes"].append(tz_convert.to_epoch_minutes(dt.replace(tzinfo=None)))
+        cols["folds"].append(dt.fold)
+        cols["opens"].append(op)
+        cols["highs"].append(hi)
+        cols["lows"].append(lo)
+        cols["closes"].append(cl)
+    return cols
+
+class EventIndex:
+    """
+    NumPy view of one run's bars for StrategyEngine.run_index, built once
+    (and shared by every engine of a sweep):
+
+      pLo/pHi  lowest/highest price of each bar's intrabar path
+      isStart  first bar of a day, or first bar of a DaySchedule.segment run
+      nxt      index of the next such start after each bar
+
+    and, per session run (the bars of one day inside one session window),
+    everything the session high/low/open checks need:
+
+      sess      session number of each bar (0 outside both windows)
+      runStart  first bar of a session run
+      runHi/runLo  session high/low up to and including each bar
+      openDist  farthest each bar's path gets from the session open
+      retrMax   largest retraction from the session extremes reachable on it
+
+    (NaN outside the sessions.) The session open is the first path price of
+    the run's first bar, exactly where the engine starts the session.
+    entry_candidates(tolerance) lists, per entry level, the bars on which
+    try_open_trade can act: a path price lies in that level's entry band, or
+    retrMax reaches RETRACTION_BLOCK.
+
+    Inside one segment the schedule (sessions, zone, checkpoint) is constant,
+    so a bar can only matter through a price level or a trade timer; the
+    engine finds the next one with a vectorized search instead of visiting
+    every bar, and reads the session extremes of any bar from runHi/runLo
+    instead of carrying them over the bars it skips.
+    """
+    def __init__(self, cols, tz, path, sched):
+        self.cols= cols
+        self.tz= tz
+        self.path= path
+        self.candidates= {}
+        self.n= len(cols["minutes"])
+        self.minutes= np.asarray(cols["minutes"], dtype=np.int64)
+        self.pLo, self.pHi= path.extremes(cols)
+
+        mod= self.minutes% 1440
+        day= self.minutes// 1440
+        seg= np.asarray(sched.segment, dtype=np.int64)[mod]
+        isStart= np.ones(self.n, dtype=bool)
+        isStart[1:]= (day[1:]!= day[:-1]) | (seg[1:]!= seg[:-1])
+        starts= np.flatnonzero(isStart)
+        self.isStart= isStart
+        self.nxt= np.repeat(np.append(starts[1:], self.n), np.diff(np.append(starts, self.n)))
+        self.index_sessions(cols, path, sched, day, mod)
+
+    def index_sessions(self, cols, path, sched, day, mod):
+        n= self.n
+        sessOf= np.zeros(1440, dtype=np.int8)
+        sessOf[np.asarray(sched.inSession[2], dtype=bool)]= 2
+        sessOf[np.asarray(sched.inSession[1], dtype=bool)]= 1
+        sess= sessOf[mod]
+        change= np.ones(n, dtype=bool)
+        change[1:]= (day[1:]!= day[:-1]) | (sess[1:]!= sess[:-1])
+        bounds= np.flatnonzero(change)
+        ends= np.append(bounds[1:], n)
+        inRun= sess[bounds]!= 0
+
+        first= path.firsts(cols)
+        openPx= first[bounds][np.cumsum(change)- 1]
+        openPx[sess== 0]= np.nan
+        runHi= np.full(n, np.nan)
+        runLo= np.full(n, np.nan)
+        for s, e in zip(bounds[inRun], ends[inRun]):
+            np.maximum.accumulate(self.pHi[s:e], out=runHi[s:e])
+            np.minimum.accumulate(self.pLo[s:e], out=runLo[s:e])
+
+        self.sess= sess
+        self.runStart= change& (sess!= 0)
+        self.runHi= runHi
+        self.runLo= runLo
+        self.openPx= openPx
+        self.openDist= np.maximum(self.pHi- openPx, openPx- self.pLo)
+        self.retrMax= np.maximum(runHi- self.pLo, self.pHi- runLo)
+
+    def entry_candidates(self, tolerance):
+        """
+        {level: sorted list of the bars where a path price p has
+        level <= abs(p- session open) <= level+ tolerance, or a blocking
+        retraction is in reach} for DIST_LEVELS, the only bars try_open_trade
+        can act on. Scanned once per tolerance. Without fixed price columns
+        (LTF) a bar is taken when its path range overlaps either band.
+        """
+        cand= self.candidates.get(tolerance)
+        if cand is not None:
+            return cand
+        openPx= self.openPx
+        cols= self.path.price_columns(self.cols)
+        dists= [np.abs(c- openPx) for c in cols] if cols is not None else None
+        block= self.retrMax>= RETRACTION_BLOCK
+        cand= {}
+        for lv in DIST_LEVELS:
+            top= lv+ tolerance
+            if dists is not None:
+                hit= block.copy()
+                for d in dists:
+                    hit|= (d>= lv) & (d<= top)
+            else:
+                hit= (block | ((self.pHi- openPx>= lv) & (self.pLo- openPx<= top)) |
+                      ((openPx- self.pLo>= lv) & (openPx- self.pHi<= top)))
+            cand[lv]= np.flatnonzero(hit).tolist()
+        self.candidates[tolerance]= cand
+        return cand
+
+    def dt(self, k):
+        return ((tz_convert.EPOCH + timedelta(minutes=int(self.minutes[k])))
+                .replace(tzinfo=self.tz, fold=int(self.cols["folds"][k])))
+
+    def bar(self, k):
+        c= self.cols
+        return (self.dt(k), float(c["opens"][k]), float(c["highs"][k]),
+                float(c["lows"][k]), float(c["closes"][k]))
+
+def first_true(mask):
+    """Index of the first True in *mask*, len(mask) if none."""
+    k= int(mask.argmax()) if len(mask) else 0
+    return k if len(mask) and mask[k] else len(mask)
 
-    if dt>= tr.forcedClose:
-        close_trade(tr, price, "ForcedClose", dt)
-        return
-    dd= abs(price- tr.entry)
-    if dd>= GSL:
-        close_trade(tr, price, "GSL", dt)
-        return
-    if tr.direction=="BUY":
-        if price> tr.peakHigh:
-            tr.peakHigh= price
-            tr.peakTime= dt
-        if price< tr.peakLow:
-            tr.peakLow= price
-            tr.peakTime= dt
-    else:
-        if price< tr.peakLow:
-            tr.peakLow= price
-            tr.peakTime= dt
-        if price> tr.peakHigh:
-            tr.peakHigh= price
-            tr.peakTime= dt
-    if tr.noCloseRules and tr.strategyID!=1:
-        return
-    if tr.finalDist>=45 and tr.finalDist<70:
-        skipBE= False
-        if tr.strategyID==2:
-            if tr.sessionID==1 and tr.zoneID==1:
-                skipBE=True
-        elif tr.strategyID==3:
-            skipBE=True
-        elif tr.strategyID==4:
-            if not (tr.sessionID==1 and tr.zoneID==1):
-                skipBE=True
+# -------------------------------------------------------------------------
+# Engine
+# -------------------------------------------------------------------------
+ENGINES= ("bars","events","numba")
+
+# compiled_core R_REASON codes => close reasons ("Sweep" carries SWEEP_CLOSE)
+CORE_REASONS= ("ForcedClose","GSL","PartialClose32","BreakEven-15",
+               "TimeClose16","TimeClose31","Sweep","OutsideSessions")
+
+def resolve_engine(name):
+    """The engine *name* falls back to here: numba needs numba, events needs numpy."""
+    if name=="numba" and not HAVE_NUMBA:
+        logging.warning("numba not installed => --engine events.")
+        name= "events"
+    if name=="events" and not HAVE_NUMPY:
+        logging.warning("numpy not installed => --engine bars.")
+        name= "bars"
+    return name
+
+class StrategyEngine:
+    """
+    All four strategy variants over one bar stream. Owns its sessions, open
+    and closed trades, the (sid,year,month) aggregates, the major metrics and
+    the diagnostic counters, so any number of engines can live in one process.
+
+    The variants see the same market, so the session open/high/low, the
+    volatility references and the day's allowed flags are kept ONCE per engine
+    and updated once per price. Only what genuinely differs per strategy is
+    kept per sid: its open trades, its closed trades, and the sessions it has
+    blocked itself (retraction >=46 is only evaluated while that strategy has
+    no trade open in the session, so it can fire for one variant and not for
+    another). A strategy with no open trade is skipped entirely on minutes
+    outside the entry zones.
+
+    Each bar is fed as the price sequence of its IntrabarPath (low then high
+    by default). A bar on which no price can make any strategy act (see
+    bar_is_inert) only moves the shared session/volatility state, so it costs
+    two market updates whatever the path length; on the others the entry
+    logic only runs for the sessions the bar is an entry candidate of.
+
+    Drive it bar by bar with on_bar(dt, op, hi, lo, cl), or over a sequence
+    with run(bars) / run_arrays(...) / run_index(...) / run_compiled(...);
+    call finish(last_dt) at the end of the data.
+    """
+    def __init__(self, config=None, path=None):
+        self.cfg= config or StrategyConfig()
+        self.path= path or IntrabarPath()
+        self.sids= tuple(STRATEGY_NAMES)
+        self.state= {}
+        self.data= defaultdict(aggregator_factory)
+        self.majorMetrics= defaultdict(major_metrics_factory)
+        self.open_dist_counter= Counter()
+        self.close_reason_counter= Counter()
+        self.sched= DaySchedule()
+        self.init_strategy_states()
+
+    def init_strategy_states(self):
+        # shared market state
+        self.sessions= {
+            1: SessionData("Session1", *SESSION1_START, *SESSION1_END, SESSION1_ZONES),
+            2: SessionData("Session2", *SESSION2_START, *SESSION2_END, SESSION2_ZONES),
+        }
+        self.overnightRef= None
+        self.middayRef= None
+        self.currentDate= None
+        # per-strategy state
+        for sid in self.sids:
+            self.state[sid]= {
+                "blocked": {1: False, 2: False},
+                "activeTrades": {1: None, 2: None},
+                "closedTrades": [],
+            }
+
+    def closed_trades(self, sid):
+        return self.state[sid]["closedTrades"]
+
+    # ---------------------------------------------------------------------
+    # Shared market state
+    # ---------------------------------------------------------------------
+    def daily_reset_if_new_date(self, dt):
+        old= self.currentDate
+        new_= dt.date()
+        if old is None or old!=new_:
+            self.currentDate= new_
+            for s_ in self.sessions.values():
+                s_.allowed= True
+                s_.active= False
+                s_.dayDate= new_
+            for sid in self.sids:
+                st= self.state[sid]
+                st["blocked"]= {1: False, 2: False}
+                st["activeTrades"]={1: None, 2: None}
+            logging.debug(f"daily reset for {new_}")
+
+    def handle_session(self, dt, price, sessNum, mod):
+        sess= self.sessions[sessNum]
+        if sess.dayDate!= dt.date() and sess.active:
+            self.end_session(sessNum)
+        if not sess.allowed:
+            if sess.active:
+                self.end_session(sessNum)
+            return
+
+        if self.sched.inSession[sessNum][mod]:
+            if not sess.active:
+                self.start_session(sessNum, price, dt)
+            else:
+                if price> sess.highPrice: sess.highPrice= price
+                if price< sess.lowPrice : sess.lowPrice= price
+        else:
+            if sess.active:
+                self.end_session(sessNum)
+
+    def start_session(self, sessNum, price, dt):
+        s_= self.sessions[sessNum]
+        s_.active= True
+        s_.openPrice= price
+        s_.highPrice= price
+        s_.lowPrice=  price
+        logging.debug(f"Session{sessNum} start @ {price:.1f}, date={dt.date()}")
+
+    def end_session(self, sessNum):
+        s_= self.sessions[sessNum]
+        logging.debug(f"Session{sessNum} end.")
+        s_.active= False
+        s_.openPrice=None
+        s_.highPrice=None
+        s_.lowPrice=None
+
+    def calc_retraction(self, dt, price, sessNum):
+        s_= self.sessions[sessNum]
+        if not s_.active or s_.openPrice is None:
+            return 0.0
+        if price>= s_.openPrice:
+            return s_.highPrice- price
+        return price- s_.lowPrice
+
+    def check_volatility(self, dt, price, mod):
+        ev= self.sched.event[mod]
+        if not ev:
+            return
+        if ev==EV_OVERNIGHT_SET:
+            self.overnightRef= price
+        elif ev==EV_OVERNIGHT_CHECK:
+            if self.overnightRef is not None:
+                if abs(price- self.overnightRef)>= self.cfg.OVERNIGHT_LIMIT:
+                    self.sessions[1].allowed= False
+                    logging.debug("session1 blocked≥200 overnight")
+            self.overnightRef= None
+        elif ev==EV_MIDDAY_SET:
+            self.middayRef= price
+        elif ev==EV_MIDDAY_CHECK:
+            if self.middayRef is not None:
+                if abs(price- self.middayRef)>= self.cfg.MIDDAY_LIMIT:
+                    self.sessions[2].allowed= False
+                    logging.debug("session2 blocked≥150 midday")
+            self.middayRef= None
+
+    # ---------------------------------------------------------------------
+    # Per-strategy trade handling
+    # ---------------------------------------------------------------------
+    def try_open_trade(self, dt, price, sid, sessNum, mod):
+        cfg= self.cfg
+        st= self.state[sid]
+        if st["activeTrades"][sessNum] is not None:
+            return
+        s_= self.sessions[sessNum]
+        if not s_.active or st["blocked"][sessNum]:
+            return
+        zone_ = self.sched.zone[sessNum][mod]
+        if not zone_: return
+        fcH, fcM, zID, bD, nC= zone_
+
+        r= self.calc_retraction(dt, price, sessNum)
+        skip, shift= retraction_lookup(r)
+        if skip==-1:
+            st["blocked"][sessNum]= True
+            logging.debug(f"[Strat{sid}] session{sessNum} blocked≥46 => no trade")
+            return
+
+        direction= "BUY" if price< s_.openPrice else "SELL"
+        dist= abs(price- s_.openPrice)
+        if dist< bD:
+            return
+        if dist> bD+ cfg.TOLERANCE:
+            return
+        finalDist= pick_final_distance(bD, skip, shift, cfg.TOLERANCE)
+        if finalDist is None: return
+        if dist< finalDist: return
+        if dist> finalDist+ cfg.TOLERANCE: return
+
+        self.open_dist_counter[finalDist]+=1
+
+        forcedC= datetime(dt.year, dt.month, dt.day, fcH,fcM, tzinfo=dt.tzinfo)
+        tr= Trade(sid, direction, price, sessNum, zID, forcedC, dt, finalDist, nC)
+        st["activeTrades"][sessNum]= tr
+        logging.debug(f"[Strat{sid}] OPEN s{sessNum} z{zID} {direction} ent={price:.1f}, finalDist={finalDist}, forced={forcedC}, noClose={nC}")
+
+    def manage_trade(self, dt, price, sid, sessNum):
+        cfg= self.cfg
+        st= self.state[sid]
+        tr= st["activeTrades"][sessNum]
+        if not tr or not tr.active: return
+
+        if dt>= tr.forcedClose:
+            self.close_trade(tr, price, "ForcedClose", dt)
+            return
+        dd= abs(price- tr.entry)
+        if dd>= cfg.GSL:
+            self.close_trade(tr, price, "GSL", dt)
+            return
         if tr.direction=="BUY":
-            peakProfit= tr.peakHigh- tr.entry
+            if price> tr.peakHigh:
+                tr.peakHigh= price
+                tr.peakTime= dt
+            if price< tr.peakLow:
+                tr.peakLow= price
+                tr.peakTime= dt
         else:
-            peakProfit= tr.entry- tr.peakLow
-        elap= minutes_diff(tr.peakTime, dt)
-        if 32<=peakProfit<=35 and elap>=16:
-            forcedP= tr.entry+32 if tr.direction=="BUY" else tr.entry-32
-            close_trade(tr, forcedP, "PartialClose32", dt)
+            if price< tr.peakLow:
+                tr.peakLow= price
+                tr.peakTime= dt
+            if price> tr.peakHigh:
+                tr.peakHigh= price
+                tr.peakTime= dt
+        if tr.noCloseRules and tr.strategyID!=1:
             return
-        if not skipBE:
+        if tr.finalDist>=45 and tr.finalDist<70:
+            skipBE= skip_break_even(tr)
             if tr.direction=="BUY":
-                mae= tr.entry- tr.peakLow
+                peakProfit= tr.peakHigh- tr.entry
             else:
-                mae= tr.peakHigh- tr.entry
-            if mae>=15 and abs(price- tr.entry)<1.0:
-                close_trade(tr, price, "BreakEven-15", dt)
+                peakProfit= tr.entry- tr.peakLow
+            elap= minutes_diff(tr.peakTime, dt)
+            if 32<=peakProfit<=35 and elap>=16:
+                forcedP= tr.entry+32 if tr.direction=="BUY" else tr.entry-32
+                self.close_trade(tr, forcedP, "PartialClose32", dt)
                 return
-        if elap>= TIME_CLOSE_45_69:
-            close_trade(tr, price, "TimeClose16", dt)
-    else:
-        elap= minutes_diff(tr.peakTime, dt)
-        if elap>= TIME_CLOSE_70_PLUS:
-            close_trade(tr, price, "TimeClose31", dt)
-
-def hard_close_pips(direction, entry, final_pips, peakProfit, level):
-    if peakProfit>= level:
-        return float(level)
-    return float(final_pips)
+            if not skipBE:
+                if tr.direction=="BUY":
+                    mae= tr.entry- tr.peakLow
+                else:
+                    mae= tr.peakHigh- tr.entry
+                if mae>=15 and abs(price- tr.entry)<1.0:
+                    self.close_trade(tr, price, "BreakEven-15", dt)
+                    return
+            if elap>= cfg.TIME_CLOSE_45_69:
+                self.close_trade(tr, price, "TimeClose16", dt)
+        else:
+            elap= minutes_diff(tr.peakTime, dt)
+            if elap>= cfg.TIME_CLOSE_70_PLUS:
+                self.close_trade(tr, price, "TimeClose31", dt)
 
-def close_trade(tr, price, reason, dt):
-    st= STRAT_STATE[tr.strategyID]
-    pl= (price- tr.entry) if tr.direction=="BUY" else (tr.entry- price)
-    if tr.direction=="BUY":
-        peakProfitPips= tr.peakHigh- tr.entry
-        peakDrawdownPips= tr.entry- tr.peakLow
-    else:
-        peakProfitPips= tr.entry- tr.peakLow
-        peakDrawdownPips= tr.peakHigh- tr.entry
-
-    hc_50=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,50)
-    hc_60=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,60)
-    hc_70=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,70)
-    hc_80=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,80)
-    hc_90=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,90)
-    hc_100=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,100)
-
-    c_= {
-      "strategy": tr.strategyID,
-      "session":  tr.sessionID,
-      "zone":     tr.zoneID,
-      "dir":      tr.direction,
-      "entry":    tr.entry,
-      "exit":     price,
-      "pips":     pl,
-      "hc_50":    hc_50,
-      "hc_60":    hc_60,
-      "hc_70":    hc_70,
-      "hc_80":    hc_80,
-      "hc_90":    hc_90,
-      "hc_100":   hc_100,
-      "reason":   reason,
-      "openTime": tr.openTime,
-      "closeTime":dt,
-      "finalDist":tr.finalDist,
-
-      "peakProfitPips": peakProfitPips,
-      "peakDrawdownPips": peakDrawdownPips
-    }
-    st["closedTrades"].append(c_)
-    close_reason_counter[(tr.strategyID,reason)]+=1
-
-    logging.info(f"[Close] Strat{tr.strategyID} s{tr.sessionID} z{tr.zoneID} {tr.direction} "
-                 f"ent={tr.entry:.1f} exit={price:.1f} pips={pl:.1f} reason={reason} "
-                 f"(peakProfit={peakProfitPips:.1f},peakDD={peakDrawdownPips:.1f})")
-
-    tr.active=False
-    st["activeTrades"][tr.sessionID]= None
-
-    sid= tr.strategyID
-    y= dt.year
-    m= dt.month
-    b= data[(sid,y,m)]
-    b["count"]+=1
-    if pl>0: b["wins"]+=1
-    else: b["loses"]+=1
-    b["pips_list"].append(pl)
-    b["hc_50_list"].append(hc_50)
-    b["hc_60_list"].append(hc_60)
-    b["hc_70_list"].append(hc_70)
-    b["hc_80_list"].append(hc_80)
-    b["hc_90_list"].append(hc_90)
-    b["hc_100_list"].append(hc_100)
-    b["sumDD"] += peakDrawdownPips
-    if peakDrawdownPips> b["maxDD"]:
-        b["maxDD"]= peakDrawdownPips
-    b["sumProfitPeak"]+= peakProfitPips
-    if peakProfitPips> b["maxProfitPeak"]:
-        b["maxProfitPeak"]= peakProfitPips
-
-    # major metrics
-    mm= majorMetrics[(sid,y)]
-    if tr.sessionID==1:
-        mm["session1_list"].append(pl)
-    else:
-        mm["session2_list"].append(pl)
-    z_= tr.zoneID
-    if z_>=1 and z_<=4:
-        mm[f"zone{z_}_list"].append(pl)
-    d_= tr.finalDist
-    if 45<= d_<70:
-        mm["dist45_69_list"].append(pl)
-    elif 70<= d_<100:
-        mm["dist70_99_list"].append(pl)
-    elif 100<= d_<130:
-        mm["dist100_129_list"].append(pl)
-    else:
-        if d_>=130:
-            mm["dist130_plus_list"].append(pl)
+    def close_trade(self, tr, price, reason, dt):
+        st= self.state[tr.strategyID]
+        pl= (price- tr.entry) if tr.direction=="BUY" else (tr.entry- price)
+        if tr.direction=="BUY":
+            peakProfitPips= tr.peakHigh- tr.entry
+            peakDrawdownPips= tr.entry- tr.peakLow
+        else:
+            peakProfitPips= tr.entry- tr.peakLow
+            peakDrawdownPips= tr.peakHigh- tr.entry
+
+        hc_50=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,50)
+        hc_60=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,60)
+        hc_70=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,70)
+        hc_80=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,80)
+        hc_90=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,90)
+        hc_100=hard_close_pips(tr.direction,tr.entry,pl,peakProfitPips,100)
+
+        c_= {
+          "strategy": tr.strategyID,
+          "session":  tr.sessionID,
+          "zone":     tr.zoneID,
+          "dir":      tr.direction,
+          "entry":    tr.entry,
+          "exit":     price,
+          "pips":     pl,
+          "hc_50":    hc_50,
+          "hc_60":    hc_60,
+          "hc_70":    hc_70,
+          "hc_80":    hc_80,
+          "hc_90":    hc_90,
+          "hc_100":   hc_100,
+          "reason":   reason,
+          "openTime": tr.openTime,
+          "closeTime":dt,
+          "finalDist":tr.finalDist,
+
+          "peakProfitPips": peakProfitPips,
+          "peakDrawdownPips": peakDrawdownPips
+        }
+        st["closedTrades"].append(c_)
+        self.close_reason_counter[(tr.strategyID,reason)]+=1
+
+        logging.info(f"[Close] Strat{tr.strategyID} s{tr.sessionID} z{tr.zoneID} {tr.direction} "
+                     f"ent={tr.entry:.1f} exit={price:.1f} pips={pl:.1f} reason={reason} "
+                     f"(peakProfit={peakProfitPips:.1f},peakDD={peakDrawdownPips:.1f})")
+
+        tr.active=False
+        st["activeTrades"][tr.sessionID]= None
+
+        sid= tr.strategyID
+        y= dt.year
+        m= dt.month
+        b= self.data[(sid,y,m)]
+        b["count"]+=1
+        if pl>0: b["wins"]+=1
+        else: b["loses"]+=1
+        b["pips"].add(pl)
+        b["hc_50"].add(hc_50)
+        b["hc_60"].add(hc_60)
+        b["hc_70"].add(hc_70)
+        b["hc_80"].add(hc_80)
+        b["hc_90"].add(hc_90)
+        b["hc_100"].add(hc_100)
+        b["sumDD"] += peakDrawdownPips
+        if peakDrawdownPips> b["maxDD"]:
+            b["maxDD"]= peakDrawdownPips
+        b["sumProfitPeak"]+= peakProfitPips
+        if peakProfitPips> b["maxProfitPeak"]:
+            b["maxProfitPeak"]= peakProfitPips
+
+        # major metrics
+        mm= self.majorMetrics[(sid,y)]
+        if tr.sessionID==1:
+            mm["session1"].add(pl)
+        else:
+            mm["session2"].add(pl)
+        z_= tr.zoneID
+        if z_>=1 and z_<=4:
+            mm[f"zone{z_}"].add(pl)
+        d_= tr.finalDist
+        if 45<= d_<70:
+            mm["dist45_69"].add(pl)
+        elif 70<= d_<100:
+            mm["dist70_99"].add(pl)
+        elif 100<= d_<130:
+            mm["dist100_129"].add(pl)
+        else:
+            if d_>=130:
+                mm["dist130_plus"].add(pl)
 
-def check_sweeps(dt, price, sid, sessNum):
-    st= STRAT_STATE[sid]
-    tr= st["activeTrades"][sessNum]
-    if not tr or not tr.active:
-        return
-    s_= st["session1"] if sessNum==1 else st["session2"]
-    if s_.active and s_.openPrice is not None:
-        dist= abs(price- s_.openPrice)
-        if dist>= SWEEP_CLOSE:
-            close_trade(tr, price, f"Sweep≥{SWEEP_CLOSE}", dt)
-
-def check_outside_sessions(dt, price, sid, sessNum):
-    s1_in= in_time_window(dt, *SESSION1_START, *SESSION1_END)
-    s2_in= in_time_window(dt, *SESSION2_START, *SESSION2_END)
-    if not s1_in and not s2_in:
-        st= STRAT_STATE[sid]
+    def check_sweeps(self, dt, price, sid, sessNum):
+        st= self.state[sid]
         tr= st["activeTrades"][sessNum]
-        if tr and tr.active:
-            close_trade(tr, price, "OutsideSessions", dt)
-
-def check_volatility(dt, price, sid):
-    st= STRAT_STATE[sid]
-    if dt.hour==17 and dt.minute==16:
-        st["overnightRef"]= price
-    if dt.hour==8 and dt.minute==0:
-        if st["overnightRef"] is not None:
-            if abs(price- st["overnightRef"])>= OVERNIGHT_LIMIT:
-                st["session1"].allowed= False
-                logging.debug(f"[Strat {sid}] session1 blocked≥200 overnight")
-        st["overnightRef"]= None
-    if dt.hour==12 and dt.minute==0:
-        st["middayRef"]= price
-    if dt.hour==14 and dt.minute==30:
-        if st["middayRef"] is not None:
-            if abs(price- st["middayRef"])>= MIDDAY_LIMIT:
-                st["session2"].allowed= False
-                logging.debug(f"[Strat {sid}] session2 blocked≥150 midday")
-        st["middayRef"]= None
-
-def run_backtest(csv_file, yrs, src_tz, dst_tz, produce_excel=False, out_dir="."):
-    init_strategy_states()
-    from zoneinfo import ZoneInfo
-    tzSrc= ZoneInfo(src_tz)
-    tzDst= ZoneInfo(dst_tz)
+        if not tr or not tr.active:
+            return
+        s_= self.sessions[sessNum]
+        if s_.active and s_.openPrice is not None:
+            dist= abs(price- s_.openPrice)
+            if dist>= self.cfg.SWEEP_CLOSE:
+                self.close_trade(tr, price, f"Sweep≥{self.cfg.SWEEP_CLOSE}", dt)
+
+    def check_outside_sessions(self, dt, price, sid, sessNum, mod):
+        if self.sched.outside[mod]:
+            st= self.state[sid]
+            tr= st["activeTrades"][sessNum]
+            if tr and tr.active:
+                self.close_trade(tr, price, "OutsideSessions", dt)
+
+    # ---------------------------------------------------------------------
+    def feed_market(self, dt, price, mod):
+        """Shared market state: once per price for all strategies."""
+        self.handle_session(dt, price, 1, mod)
+        self.handle_session(dt, price, 2, mod)
+        self.check_volatility(dt, price, mod)
+
+    def entry_candidate(self, sessNum, mod, path, lo, hi):
+        """
+        Whether try_open_trade can do anything for sessNum on this bar (path
+        prices *path*, range [lo, hi]): the session starts on it, a path
+        price lies in the zone's entry band [bD, bD+TOLERANCE] from the
+        session open, or the range reaches a blocking retraction. Outside a
+        zone, or with the session done for the day, it cannot.
+        """
+        zone_= self.sched.zone[sessNum][mod]
+        if zone_ is None:
+            return False
+        s_= self.sessions[sessNum]
+        if not s_.allowed:
+            return False
+        if not s_.active:
+            return self.sched.inSession[sessNum][mod]   # starts on this bar
+        bD= zone_[3]
+        o= s_.openPrice
+        if hi- o>= bD or o- lo>= bD:
+            top= bD+ self.cfg.TOLERANCE
+            for p in path:
+                if bD<= abs(p- o)<= top:
+                    return True
+        return (max(s_.highPrice, hi)- lo>= RETRACTION_BLOCK
+                or hi- min(s_.lowPrice, lo)>= RETRACTION_BLOCK)
+
+    def bar_is_inert(self, entry1, entry2):
+        """
+        True when no price of the bar can make any strategy act: no trade is
+        open, and no session that a strategy may still enter is an entry
+        candidate (entry1/entry2, see entry_candidate). Such a bar only moves
+        the shared market state, which depends on its first, last and extreme
+        prices alone.
+        """
+        for sid in self.sids:
+            at= self.state[sid]["activeTrades"]
+            if at[1] is not None or at[2] is not None:
+                return False
+        for sessNum, entry in ((1,entry1), (2,entry2)):
+            if entry and not all(self.state[sid]["blocked"][sessNum] for sid in self.sids):
+                return False
+        return True
+
+    def on_bar(self, dt, op, hi, lo, cl):
+        self.daily_reset_if_new_date(dt)
+
+        mod= dt.hour*60+ dt.minute
+        sched= self.sched
+        path= self.path.prices(dt, op, hi, lo, cl)
+        pLo= min(path)
+        pHi= max(path)
+        # the full entry logic only runs for the sessions this bar is a candidate of
+        entry1= sched.zone[1][mod] is not None and self.entry_candidate(1, mod, path, pLo, pHi)
+        entry2= sched.zone[2][mod] is not None and self.entry_candidate(2, mod, path, pLo, pHi)
+        if self.bar_is_inert(entry1, entry2):
+            self.feed_market(dt, path[0], mod)
+            if len(path)> 1:
+                self.feed_market(dt, path[-1], mod)
+            for s_ in self.sessions.values():
+                if s_.active:
+                    if pHi> s_.highPrice: s_.highPrice= pHi
+                    if pLo< s_.lowPrice : s_.lowPrice= pLo
+            return
+
+        inZone= sched.zone[1][mod] is not None or sched.zone[2][mod] is not None
+        for p in path:
+            self.feed_market(dt, p, mod)
+            for sid in self.sids:
+                at= self.state[sid]["activeTrades"]
+                if not inZone and at[1] is None and at[2] is None:
+                    continue
+                self.check_sweeps(dt, p, sid, 1)
+                self.check_sweeps(dt, p, sid, 2)
+                self.check_outside_sessions(dt, p, sid, 1, mod)
+                self.check_outside_sessions(dt, p, sid, 2, mod)
+                if entry1: self.try_open_trade(dt, p, sid, 1, mod)
+                if entry2: self.try_open_trade(dt, p, sid, 2, mod)
+                self.manage_trade(dt, p, sid, 1)
+                self.manage_trade(dt, p, sid, 2)
+
+    def run(self, bars):
+        """Feed an iterable of (dt, op, hi, lo, cl)."""
+        for dt, op, hi, lo, cl in bars:
+            self.on_bar(dt, op, hi, lo, cl)
+
+    def run_arrays(self, minutes, folds, lows, highs, tz, lo=0, hi=None,
+                   opens=None, closes=None):
+        """
+        Feed parallel arrays: destination-wall epoch minutes, folds, lows and
+        highs (as built by tz_convert / sweep.load_bars), rows [lo, hi).
+        opens/closes are only needed by the path modes that use them.
+        """
+        if hi is None:
+            hi= len(minutes)
+        if opens is None and self.path.mode!="LH":
+            raise ValueError(f"path mode {self.path.mode} needs opens and closes")
+        for i in range(lo, hi):
+            dt= (tz_convert.EPOCH + timedelta(minutes=minutes[i])).replace(tzinfo=tz, fold=folds[i])
+            self.on_bar(dt, opens[i] if opens is not None else None, highs[i], lows[i],
+                        closes[i] if closes is not None else None)
+
+    # ---------------------------------------------------------------------
+    # Event engine: visit only the bars that can change something
+    # ---------------------------------------------------------------------
+    def run_index(self, ev, lo=0, hi=None):
+        """
+        Same result as run_arrays over an EventIndex, but bars that no price
+        can make act on (see next_event) are never visited: between two
+        events only the active sessions' high/low move, and a visited bar
+        reads them from the index (see load_session). *lo* must be the first
+        bar of a day, where the index's session runs start.
+        """
+        if hi is None:
+            hi= ev.n
+        if 0< lo< ev.n and ev.minutes[lo]// 1440== ev.minutes[lo-1]// 1440:
+            raise ValueError("run_index must start on the first bar of a day")
+        lastMin= None
+        i= lo
+        while i< hi:
+            j= i if i==lo else self.next_event(ev, i, hi, lastMin)
+            if j>= hi:
+                break
+            self.load_session(ev, j)
+            self.on_bar(*ev.bar(j))
+            lastMin= int(ev.minutes[j])
+            i= j+1
+
+    def run_events(self, minutes, folds, lows, highs, tz, lo=0, hi=None,
+                   opens=None, closes=None):
+        """run_arrays through the event engine (needs numpy)."""
+        cols= {"minutes": minutes, "folds": folds, "lows": lows, "highs": highs,
+               "opens": opens if opens is not None else lows,
+               "closes": closes if closes is not None else highs}
+        if opens is None and self.path.mode!="LH":
+            raise ValueError(f"path mode {self.path.mode} needs opens and closes")
+        self.run_index(EventIndex(cols, tz, self.path, self.sched), lo, hi)
+
+    def load_session(self, ev, k):
+        """Set the running session's high/low to its extremes before bar k."""
+        sessNum= int(ev.sess[k])
+        if not sessNum or ev.runStart[k]:
+            return
+        s_= self.sessions[sessNum]
+        if s_.active:
+            s_.highPrice= float(ev.runHi[k-1])
+            s_.lowPrice= float(ev.runLo[k-1])
+
+    def next_event(self, ev, i, hi, lastMin):
+        """
+        First bar in [i, hi) that must go through on_bar. Bar i is one when
+        it starts a day or schedule segment; otherwise the schedule stays
+        constant up to the segment end, and a bar before that only matters if
+        an open trade could make a new peak, sweep, come back to break-even
+        or reach a time limit on it, or a free strategy could reach an entry
+        band or a blocking retraction on it (supersets of the exact rules,
+        so no actionable bar is missed).
+        """
+        if ev.isStart[i]:
+            return i
+        e= min(int(ev.nxt[i]), hi)
+        mod= int(ev.minutes[i])% 1440
+        sched= self.sched
+        for sessNum, s_ in self.sessions.items():
+            if s_.allowed and not s_.active and sched.inSession[sessNum][mod]:
+                return i
+        for sid in self.sids:
+            for tr in self.state[sid]["activeTrades"].values():
+                if tr is not None:
+                    e= i+ self.trade_event(ev, i, e, tr, lastMin)
+                    if e== i:
+                        return i
+        for sessNum, s_ in self.sessions.items():
+            zone_= sched.zone[sessNum][mod]
+            if zone_ is None or not s_.active:
+                continue
+            if all(self.state[sid]["blocked"][sessNum] or
+                   self.state[sid]["activeTrades"][sessNum] is not None for sid in self.sids):
+                continue
+            e= self.entry_event(ev, i, e, zone_[3])
+        return e
+
+    def trade_event(self, ev, i, e, tr, lastMin):
+        cfg= self.cfg
+        pLo= ev.pLo[i:e]
+        pHi= ev.pHi[i:e]
+        mask= (pHi> tr.peakHigh) | (pLo< tr.peakLow)
+        if self.sessions[tr.sessionID].active:
+            mask|= ev.openDist[i:e]>= cfg.SWEEP_CLOSE
+
+        limits= [tz_convert.to_epoch_minutes(tr.forcedClose.replace(tzinfo=None))]
+        if not (tr.noCloseRules and tr.strategyID!=1):
+            peakMin= tz_convert.to_epoch_minutes(tr.peakTime.replace(tzinfo=None))
+            if 45<= tr.finalDist< 70:
+                if tr.direction=="BUY":
+                    peakProfit= tr.peakHigh- tr.entry
+                    mae= tr.entry- tr.peakLow
+                else:
+                    peakProfit= tr.entry- tr.peakLow
+                    mae= tr.peakHigh- tr.entry
+                if 32<= peakProfit<= 35:
+                    limits.append(peakMin+ 16)
+                if mae>= 15 and not skip_break_even(tr):
+                    mask|= (pLo- tr.entry< 1.0) & (tr.entry- pHi< 1.0)
+                limits.append(peakMin+ cfg.TIME_CLOSE_45_69)
+            else:
+                limits.append(peakMin+ cfg.TIME_CLOSE_70_PLUS)
+        # a limit already passed on a visited bar without closing stays a no-op
+        limits= [x for x in limits if lastMin is None or x> lastMin]
+        if limits:
+            mask|= ev.minutes[i:e]>= min(limits)
+        return first_true(mask)
+
+    def entry_event(self, ev, i, e, baseDist):
+        """Next entry candidate of level baseDist (a bisection of the sorted candidates)."""
+        cand= ev.entry_candidates(self.cfg.TOLERANCE)[baseDist]
+        j= bisect_left(cand, i)
+        return min(e, cand[j]) if j< len(cand) else e
+
+    # ---------------------------------------------------------------------
+    # Compiled engine (--engine numba)
+    # ---------------------------------------------------------------------
+    def run_compiled(self, cols, tz, flat=None):
+        """
+        Same result as run_arrays over bar columns (see bar_columns) on a
+        fresh engine, with the per-price loop compiled by numba
+        (compiled_core.run_core). Its closed-trade table is replayed through
+        close_trade in close order, so the aggregates, metrics and counters
+        are built exactly as the Python loop builds them; trades still open
+        at the end stay open for finish(). *flat* is a precomputed
+        self.path.flat(cols), for running many configs over the same bars.
+        """
+        c= compiled_core
+        cfg= self.cfg
+        prices, starts= flat if flat is not None else self.path.flat(cols)
+        rows, nClosed, nRows, opened= c.run_core(
+            np.asarray(cols["minutes"], dtype=np.int64), prices, starts,
+            *self.sched.arrays(),
+            np.asarray(RETRACTION_TABLE, dtype=np.float64), np.asarray(DIST_LEVELS, dtype=np.float64),
+            float(cfg.TOLERANCE), float(cfg.GSL), float(cfg.SWEEP_CLOSE),
+            float(cfg.OVERNIGHT_LIMIT), float(cfg.MIDDAY_LIMIT),
+            float(cfg.TIME_CLOSE_45_69), float(cfg.TIME_CLOSE_70_PLUS),
+            np.nan if self.overnightRef is None else float(self.overnightRef),
+            np.nan if self.middayRef is None else float(self.middayRef))
+
+        minutes, folds= cols["minutes"], cols["folds"]
+        def bar_dt(k):
+            return ((tz_convert.EPOCH + timedelta(minutes=int(minutes[k])))
+                    .replace(tzinfo=tz, fold=int(folds[k])))
+        reasons= [f"Sweep≥{cfg.SWEEP_CLOSE}" if r=="Sweep" else r for r in CORE_REASONS]
+        for i in range(nRows):
+            row= rows[i]
+            sid= int(row[c.R_SID])
+            sessNum= int(row[c.R_SESS])
+            forcedC= (tz_convert.EPOCH + timedelta(minutes=int(row[c.R_FORCED]))).replace(tzinfo=tz)
+            tr= Trade(sid, "BUY" if row[c.R_DIR]> 0 else "SELL", float(row[c.R_ENTRY]), sessNum,
+                      int(row[c.R_ZONE]), forcedC, bar_dt(int(row[c.R_OPENBAR])),
+                      int(row[c.R_FINAL]), bool(row[c.R_NOCLOSE]))
+            tr.peakHigh= float(row[c.R_PEAKHI])
+            tr.peakLow= float(row[c.R_PEAKLO])
+            tr.peakTime= bar_dt(int(row[c.R_PEAKBAR]))
+            if i< nClosed:
+                self.close_trade(tr, float(row[c.R_EXIT]), reasons[int(row[c.R_REASON])],
+                                 bar_dt(int(row[c.R_CLOSEBAR])))
+            else:
+                self.state[sid]["activeTrades"][sessNum]= tr
+        # levels in the order they were first opened at, as the Python loop counts them
+        for i in sorted(range(len(DIST_LEVELS)), key=lambda i: opened[i,1]):
+            if opened[i,0]:
+                self.open_dist_counter[DIST_LEVELS[i]]+= int(opened[i,0])
+
+    def set_refs(self, overnightRef, middayRef):
+        """Seed the carried-over volatility references (month shards)."""
+        self.overnightRef= overnightRef
+        self.middayRef= middayRef
+
+    def finish(self, last_dt):
+        """Close whatever is still open at the end of the data."""
+        if not last_dt:
+            return
+        for sid in self.sids:
+            st= self.state[sid]
+            for sID,tr in st["activeTrades"].items():
+                if tr and tr.active:
+                    self.close_trade(tr, tr.entry, "EndOfBacktest", last_dt)
+
+    def merge(self, other):
+        """
+        Append a later engine's results (the next month shard) to this one.
+        Its still-open trades replace ours: only the last shard's survive.
+        """
+        for sid in self.sids:
+            self.state[sid]["closedTrades"].extend(other.state[sid]["closedTrades"])
+            self.state[sid]["activeTrades"]= other.state[sid]["activeTrades"]
+        # (sid,y,m) keys never span two month shards
+        self.data.update(other.data)
+        for k, mm_ in other.majorMetrics.items():
+            mm= self.majorMetrics[k]
+            for name, st_ in mm_.items():
+                mm[name].merge(st_)
+        self.open_dist_counter.update(other.open_dist_counter)
+        self.close_reason_counter.update(other.close_reason_counter)
+
+# -------------------------------------------------------------------------
+# Month-sharded pool (--workers N)
+#
+# Every engine state except overnightRef/middayRef is reset by
+# daily_reset_if_new_date, so a calendar month can run on its own once it is
+# handed the two references a serial run would hold at its first bar. Months
+# (not days) keep every data[(sid,y,m)] bucket inside one shard, so the float
+# sums come out bit-identical to a serial run.
+# -------------------------------------------------------------------------
+def iter_month_shards(rows, path):
+    shard= None
+    overnightRef= None
+    middayRef= None
+    for dt, op, hi, lo, cl, _vol in rows:
+        key= (dt.year, dt.month)
+        if shard is None or shard["key"]!= key:
+            if shard:
+                yield shard
+            shard= {"key": key, "overnightRef": overnightRef,
+                    "middayRef": middayRef, "bars": []}
+        shard["bars"].append((dt, op, hi, lo, cl))
+        # mirror check_volatility: the last price fed wins
+        if dt.hour==17 and dt.minute==16:
+            overnightRef= path.prices(dt, op, hi, lo, cl)[-1]
+        elif dt.hour==8 and dt.minute==0:
+            overnightRef= None
+        elif dt.hour==12 and dt.minute==0:
+            middayRef= path.prices(dt, op, hi, lo, cl)[-1]
+        elif dt.hour==14 and dt.minute==30:
+            middayRef= None
+    if shard:
+        yield shard
+
+def run_shard(shard, config=None, path=None, core="bars"):
+    """Worker entry point: run one month on a fresh engine and return it."""
+    eng= StrategyEngine(config, path)
+    eng.set_refs(shard["overnightRef"], shard["middayRef"])
+    if core=="bars":
+        eng.run(shard["bars"])
+    else:
+        tz= shard["bars"][0][0].tzinfo
+        cols= bar_columns(shard["bars"])
+        if core=="numba":
+            eng.run_compiled(cols, tz)
+        else:
+            eng.run_index(EventIndex(cols, tz, eng.path, eng.sched))
+    return shard["key"], eng
+
+def run_sharded(engine, rows, workers, core="bars"):
+    logging.info(f"Running month shards on {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending= deque()
+        def merge_next():
+            key, eng= pending.popleft().result()
+            logging.info(f"Shard {key[0]}-{key[1]:02d} done")
+            engine.merge(eng)
+        for shard in iter_month_shards(rows, engine.path):
+            path= engine.path.subset(b[0] for b in shard["bars"])
+            pending.append(ex.submit(run_shard, shard, engine.cfg, path, core))
+            # merge in submission order; cap in-flight shards to bound memory
+            while len(pending)>= 2*workers:
+                merge_next()
+        while pending:
+            merge_next()
+
+def run_backtest(csv_file, yrs, src_tz, dst_tz, produce_excel=False, out_dir=".",
+                 workers=1, config=None, out_format=None, path=None, core="bars"):
+    engine= StrategyEngine(config, path)
+    core= resolve_engine(core)
+    conv= tz_convert.TzConverter.for_years(src_tz, dst_tz, yrs)
 
     f= pathlib.Path(csv_file)
     if not f.is_file():
         logging.error(f"CSV file not found: {csv_file}")
-        return
+        return engine
 
-    with f.open("r", newline="") as fh:
-        import csv
-        rdr= csv.reader(fh, delimiter=';')
-        naive= None
-        for row in rdr:
-            if len(row)<6:
-                continue
-            dstr= row[0].strip()
-            tstr= row[1].strip()
-            dtRaw= f"{dstr} {tstr}"
-            try:
-                naive= datetime.strptime(dtRaw, "%d/%m/%Y %H:%M:%S")
-            except:
-                continue
-            dtSrc= naive.replace(tzinfo=tzSrc)
-            dt= dtSrc.astimezone(tzDst)
-            if dt.year not in yrs:
-                continue
-            try:
-                op= float(row[2])
-                hi= float(row[3])
-                lo= float(row[4])
-                cl= float(row[5])
-            except:
-                continue
+    cache= None
+    if bar_cache.is_bar_cache(f):
+        cache= bar_cache.BarCache(f)
+        rows= cache.iter_bars(yrs, conv)
+        logging.info(f"Reading bar cache {f} (rows {cache.slice_for_years(yrs)})")
+    else:
+        rows= ((conv.to_dst(naive), op, hi, lo, cl, vol)
+               for naive, op, hi, lo, cl, vol in bar_cache.iter_source_bars(f, src_tz))
+
+    tail= [None]
+    def in_range(rows):
+        for row in rows:
+            tail[0]= row[0]
+            if row[0].year in yrs:
+                yield row
+
+    bars= ((dt, op, hi, lo, cl) for dt, op, hi, lo, cl, _vol in in_range(rows))
+    if workers> 1:
+        run_sharded(engine, in_range(rows), workers, core)
+    elif core=="events":
+        ev= EventIndex(bar_columns(bars), conv.tzDst, engine.path, engine.sched)
+        engine.run_index(ev)
+        logging.info(f"Event engine over {ev.n} bars")
+    elif core=="numba":
+        cols= bar_columns(bars)
+        engine.run_compiled(cols, conv.tzDst)
+        logging.info(f"Compiled engine over {len(cols['minutes'])} bars")
+    else:
+        engine.run(bars)
+
+    last_dt= tail[0]
+    if cache:
+        # the CSV path ends on the file's last row, not the slice's
+        naive= cache.last_naive()
+        last_dt= conv.to_dst(naive) if naive else None
+        cache.close()
+    engine.finish(last_dt)
 
-            for sid in (1,2,3,4):
-                daily_reset_if_new_date(dt, sid)
-
-            for p in [lo, hi]:
-                for sid in (1,2,3,4):
-                    handle_session(dt, p, sid, 1)
-                    handle_session(dt, p, sid, 2)
-                    check_volatility(dt, p, sid)
-                    check_sweeps(dt, p, sid, 1)
-                    check_sweeps(dt, p, sid, 2)
-                    check_outside_sessions(dt, p, sid, 1)
-                    check_outside_sessions(dt, p, sid, 2)
-                    try_open_trade(dt, p, sid, 1)
-                    try_open_trade(dt, p, sid, 2)
-                    manage_trade(dt, p, sid, 1)
-                    manage_trade(dt, p, sid, 2)
-
-        if naive:
-            last_dt= naive.replace(tzinfo=tzSrc).astimezone(tzDst)
-            for sid in (1,2,3,4):
-                st= STRAT_STATE[sid]
-                for sID,tr in st["activeTrades"].items():
-                    if tr and tr.active:
-                        close_trade(tr, tr.entry, "EndOfBacktest", last_dt)
-
-    produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel)
+    produce_summaries_and_excel_single_sheet(engine, yrs, out_dir, produce_excel)
+    export_results(engine, out_dir, out_format, dst_tz)
+    return engine
 
 # -------------------------------------------------------------------------
 def median(lst):
@@ -626,7 +1541,53 @@ def median(lst):
         return arr[mid]
     return (arr[mid-1]+ arr[mid])/2.0
 
-def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
+class StreamSheet:
+    """
+    Row-ordered front end for an openpyxl write-only worksheet. Takes the same
+    (row, column) addressing as ws.cell(), holds only the row being filled and
+    appends it to the file once a later row is addressed, so the sheet is never
+    kept in memory. Rows must be written in ascending order.
+    """
+    def __init__(self, ws):
+        self.ws= ws
+        self.nextRow= 1
+        self.curRow= None
+        self.cur= {}
+
+    def _pad_to(self, row):
+        if row< self.nextRow:
+            raise ValueError(f"row {row} already written (next is {self.nextRow})")
+        while self.nextRow< row:
+            self.ws.append([])
+            self.nextRow+=1
+
+    def cell(self, row, column, value=None, font=None, fill=None):
+        if row!= self.curRow:
+            self.flush()
+            self._pad_to(row)
+            self.curRow= row
+        if font is not None or fill is not None:
+            value= WriteOnlyCell(self.ws, value=value)
+            if font is not None: value.font= font
+            if fill is not None: value.fill= fill
+        self.cur[column]= value
+
+    def append(self, row, values):
+        """Write a whole row, starting at column 1."""
+        self.flush()
+        self._pad_to(row)
+        self.ws.append(values)
+        self.nextRow= row+1
+
+    def flush(self):
+        if self.curRow is None:
+            return
+        self.ws.append([self.cur.get(c) for c in range(1, max(self.cur)+1)])
+        self.nextRow= self.curRow+1
+        self.curRow= None
+        self.cur= {}
+
+def produce_summaries_and_excel_single_sheet(engine, yrs, out_dir, produce_excel):
     if not produce_excel:
         logging.info("Excel not requested => skip.")
         return
@@ -635,6 +1596,8 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
         return
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill
+    data= engine.data
+    majorMetrics= engine.majorMetrics
     all_keys= list(data.keys())
     if not all_keys:
         logging.info("No trades => no excel.")
@@ -645,16 +1608,18 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     multi_year_str= f"{min(yrs_in)}-{max(yrs_in)}"
     date_tag= datetime.now().strftime("%Y%m%d")
 
-    wb= Workbook()
-    ws= wb.active
-    ws.title= "Summary"
+    # write-only workbook: rows go straight to the file, no in-memory grid
+    wb= Workbook(write_only=True)
+    ws= StreamSheet(wb.create_sheet("Summary"))
+    bold= Font(bold=True)
+    green= PatternFill(start_color="C6EFCE",end_color="C6EFCE",fill_type="solid")
 
     row=1
 
     # -------------------------------------------------------------------------
     # (1) ListAllTrades
     # -------------------------------------------------------------------------
-    ws.cell(row=row,column=1,value="(1) ListAllTrades").font= Font(bold=True)
+    ws.cell(row=row,column=1,value="(1) ListAllTrades", font=bold)
     row+=2
 
     heads_1= [
@@ -663,12 +1628,12 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
         "peakProfit","peakDrawdown","reason","openTime","closeTime"
     ]
     for c_i,h_ in enumerate(heads_1,1):
-        ws.cell(row=row,column=c_i,value=h_).font= Font(bold=True)
+        ws.cell(row=row,column=c_i,value=h_, font=bold)
     row+=1
 
     bigList= []
     for sid in sids_in:
-        for cT in STRAT_STATE[sid]["closedTrades"]:
+        for cT in engine.closed_trades(sid):
             Y_= cT["closeTime"].year
             M_= cT["closeTime"].month
             bigList.append((sid,Y_,M_, cT))
@@ -681,25 +1646,16 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     })
 
     for (sid,yy,mm, cT) in bigList:
-        c=1
-        ws.cell(row=row,column=c,value=STRATEGY_NAMES[sid]); c+=1
-        ws.cell(row=row,column=c,value=yy); c+=1
-        ws.cell(row=row,column=c,value=mm); c+=1
-        ws.cell(row=row,column=c,value=1); c+=1
-
-        ws.cell(row=row,column=c,value=round(cT["pips"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["hc_50"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["hc_60"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["hc_70"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["hc_80"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["hc_90"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["hc_100"],1)); c+=1
-
-        ws.cell(row=row,column=c,value=round(cT["peakProfitPips"],1)); c+=1
-        ws.cell(row=row,column=c,value=round(cT["peakDrawdownPips"],1)); c+=1
-        ws.cell(row=row,column=c,value=cT["reason"]); c+=1
-        ws.cell(row=row,column=c,value=cT["openTime"].strftime("%Y-%m-%d %H:%M")); c+=1
-        ws.cell(row=row,column=c,value=cT["closeTime"].strftime("%Y-%m-%d %H:%M")); c+=1
+        ws.append(row, [
+            STRATEGY_NAMES[sid], yy, mm, 1,
+            round(cT["pips"],1),
+            round(cT["hc_50"],1), round(cT["hc_60"],1), round(cT["hc_70"],1),
+            round(cT["hc_80"],1), round(cT["hc_90"],1), round(cT["hc_100"],1),
+            round(cT["peakProfitPips"],1), round(cT["peakDrawdownPips"],1),
+            cT["reason"],
+            cT["openTime"].strftime("%Y-%m-%d %H:%M"),
+            cT["closeTime"].strftime("%Y-%m-%d %H:%M"),
+        ])
 
         sub_1B[(sid,yy)]["count"]+=1
         sub_1B[(sid,yy)]["pips"]+= cT["pips"]
@@ -717,14 +1673,14 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     # -------------------------------------------------------------------------
     # (1B) Subtotals by (Strategy,Year)
     # -------------------------------------------------------------------------
-    ws.cell(row=row,column=1,value="(1B) Subtotals by (Strategy, Year)").font=Font(bold=True)
+    ws.cell(row=row,column=1,value="(1B) Subtotals by (Strategy, Year)", font=bold)
     row+=2
 
     heads_1B= [
       "Strategy","Year","Trades","SumPips","SumHC50","SumHC60","SumHC70","SumHC80","SumHC90","SumHC100"
     ]
     for c_i, h_ in enumerate(heads_1B,1):
-        ws.cell(row=row,column=c_i,value=h_).font= Font(bold=True)
+        ws.cell(row=row,column=c_i,value=h_, font=bold)
     row+=1
 
     for (sid,yy), ag_ in sorted(sub_1B.items()):
@@ -746,7 +1702,7 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     # -------------------------------------------------------------------------
     # (2) Totals By Strategy
     # -------------------------------------------------------------------------
-    ws.cell(row=row,column=1,value="(2) TotalsByStrategy").font=Font(bold=True)
+    ws.cell(row=row,column=1,value="(2) TotalsByStrategy", font=bold)
     row+=2
 
     heads_2= [
@@ -764,61 +1720,19 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
         "AvgHC_100","MedHC_100"
     ]
     for c_i,h_ in enumerate(heads_2,1):
-        ws.cell(row=row,column=c_i,value=h_).font=Font(bold=True)
+        ws.cell(row=row,column=c_i,value=h_, font=bold)
     row+=1
 
     def gather_multi_year_stats(sid):
-        allp=[]
-        hc50=[]
-        hc60=[]
-        hc70=[]
-        hc80=[]
-        hc90=[]
-        hc100=[]
-        tcount=0
-        tw=0
-        tl=0
-        sDD=0.0
-        mDD=0.0
-        sPk=0.0
-        mPk=0.0
+        ag_= aggregator_factory()
         for (ss,yy,mm), b_ in data.items():
             if ss== sid:
-                tcount+= b_["count"]
-                tw    += b_["wins"]
-                tl    += b_["loses"]
-                sDD   += b_["sumDD"]
-                if b_["maxDD"]> mDD: mDD= b_["maxDD"]
-                sPk   += b_["sumProfitPeak"]
-                if b_["maxProfitPeak"]> mPk: mPk= b_["maxProfitPeak"]
-
-                allp.extend(b_["pips_list"])
-                hc50.extend(b_["hc_50_list"])
-                hc60.extend(b_["hc_60_list"])
-                hc70.extend(b_["hc_70_list"])
-                hc80.extend(b_["hc_80_list"])
-                hc90.extend(b_["hc_90_list"])
-                hc100.extend(b_["hc_100_list"])
-
-        return {
-          "count": tcount,
-          "wins": tw,
-          "loses": tl,
-          "sumDD": sDD,
-          "maxDD": mDD,
-          "sumPk": sPk,
-          "maxPk": mPk,
-          "allp": allp,
-          "hc_50": hc50, "hc_60": hc60, "hc_70": hc70,
-          "hc_80": hc80, "hc_90": hc90, "hc_100": hc100
-        }
+                merge_aggregator(ag_, b_)
+        return ag_
 
-    def do_avg_med(lst):
-        if not lst: return (0.0,0.0)
-        s_= sum(lst)
-        avg_= s_/ len(lst)
-        med_= median(lst)
-        return (avg_, med_)
+    def do_avg_med(st_):
+        if not st_.count: return (0.0,0.0)
+        return (st_.mean(), st_.median())
 
     for sid in sids_in:
         st_= gather_multi_year_stats(sid)
@@ -828,15 +1742,15 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
         wr_= (w_/ c_*100) if c_>0 else 0
         avgDD_= st_["sumDD"]/ c_ if c_>0 else 0
         maxDD_= st_["maxDD"]
-        avgPk_= st_["sumPk"]/ c_ if c_>0 else 0
-        maxPk_= st_["maxPk"]
-
-        allp= st_["allp"]
-        sumAll= sum(allp)
-        avgAll= sumAll/ len(allp) if allp else 0
-        medAll= median(allp)
-        wip= [x for x in allp if x>0]
-        lop= [x for x in allp if x<=0]
+        avgPk_= st_["sumProfitPeak"]/ c_ if c_>0 else 0
+        maxPk_= st_["maxProfitPeak"]
+
+        allp= st_["pips"]
+        sumAll= allp.total
+        avgAll= allp.mean()
+        medAll= allp.median()
+        wip= [x for x in allp.values if x>0]
+        lop= [x for x in allp.values if x<=0]
         avgW= sum(wip)/ len(wip) if wip else 0
         medW= median(wip) if wip else 0
         avgL= sum(lop)/ len(lop) if lop else 0
@@ -880,7 +1794,7 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     # -------------------------------------------------------------------------
     # (3) TotalsByMonth
     # -------------------------------------------------------------------------
-    ws.cell(row=row,column=1,value="(3) TotalsByMonth").font=Font(bold=True)
+    ws.cell(row=row,column=1,value="(3) TotalsByMonth", font=bold)
     row+=2
 
     heads_3= [
@@ -895,36 +1809,12 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
       "AvgHC_100","MedHC_100",
     ]
     for c_i,h_ in enumerate(heads_3,1):
-        ws.cell(row=row,column=c_i,value=h_).font=Font(bold=True)
+        ws.cell(row=row,column=c_i,value=h_, font=bold)
     row+=1
 
     monthlyAgg= defaultdict(aggregator_factory)
     for (sid_, y_, m_), b_ in data.items():
-        ma= monthlyAgg[(sid_, m_)]
-        ma["count"]+= b_["count"]
-        ma["wins"]+= b_["wins"]
-        ma["loses"]+= b_["loses"]
-        ma["pips_list"].extend(b_["pips_list"])
-        ma["hc_50_list"].extend(b_["hc_50_list"])
-        ma["hc_60_list"].extend(b_["hc_60_list"])
-        ma["hc_70_list"].extend(b_["hc_70_list"])
-        ma["hc_80_list"].extend(b_["hc_80_list"])
-        ma["hc_90_list"].extend(b_["hc_90_list"])
-        ma["hc_100_list"].extend(b_["hc_100_list"])
-
-        ma["sumDD"]+= b_["sumDD"]
-        if b_["maxDD"]> ma["maxDD"]:
-            ma["maxDD"]= b_["maxDD"]
-        ma["sumProfitPeak"]+= b_["sumProfitPeak"]
-        if b_["maxProfitPeak"]> ma["maxProfitPeak"]:
-            ma["maxProfitPeak"]= b_["maxProfitPeak"]
-
-    def do_avg_med(lst):
-        if not lst: return (0.0,0.0)
-        s_= sum(lst)
-        a_= s_/ len(lst)
-        m_= median(lst)
-        return (a_, m_)
+        merge_aggregator(monthlyAgg[(sid_, m_)], b_)
 
     for sid in sids_in:
         for m_ in range(1,13):
@@ -940,23 +1830,23 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
             avgPk_= rec["sumProfitPeak"]/ c_ if c_>0 else 0
             mxPk_= rec["maxProfitPeak"]
 
-            allp= rec["pips_list"]
-            sumAll= sum(allp)
-            avgAll= sumAll/ len(allp) if allp else 0
-            medAll= median(allp)
-            wip= [x for x in allp if x>0]
-            lop= [x for x in allp if x<=0]
+            allp= rec["pips"]
+            sumAll= allp.total
+            avgAll= allp.mean()
+            medAll= allp.median()
+            wip= [x for x in allp.values if x>0]
+            lop= [x for x in allp.values if x<=0]
             avgW= sum(wip)/ len(wip) if wip else 0
             medW= median(wip) if wip else 0
             avgL= sum(lop)/ len(lop) if lop else 0
             medL= median(lop) if lop else 0
 
-            a50,m50= do_avg_med(rec["hc_50_list"])
-            a60,m60= do_avg_med(rec["hc_60_list"])
-            a70,m70= do_avg_med(rec["hc_70_list"])
-            a80,m80= do_avg_med(rec["hc_80_list"])
-            a90,m90= do_avg_med(rec["hc_90_list"])
-            a100,m100=do_avg_med(rec["hc_100_list"])
+            a50,m50= do_avg_med(rec["hc_50"])
+            a60,m60= do_avg_med(rec["hc_60"])
+            a70,m70= do_avg_med(rec["hc_70"])
+            a80,m80= do_avg_med(rec["hc_80"])
+            a90,m90= do_avg_med(rec["hc_90"])
+            a100,m100=do_avg_med(rec["hc_100"])
 
             c=1
             ws.cell(row=row,column=c,value=STRATEGY_NAMES[sid]); c+=1
@@ -990,19 +1880,19 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     # -------------------------------------------------------------------------
     # (4) Pivot Year x Strategy (only final, no hc)
     # -------------------------------------------------------------------------
-    ws.cell(row=row,column=1,value="(4) Year x Strategy Pivot (final only)").font= Font(bold=True)
+    ws.cell(row=row,column=1,value="(4) Year x Strategy Pivot (final only)", font=bold)
     row+=2
     pivot_final= defaultdict(float)
     for (sid_,y_,m_), b_ in data.items():
-        pivot_final[(sid_,y_)] += sum(b_["pips_list"])
+        pivot_final[(sid_,y_)] += b_["pips"].total
 
     colStart=1
-    ws.cell(row=row,column=colStart,value="Year").font= Font(bold=True)
+    ws.cell(row=row,column=colStart,value="Year", font=bold)
     c_= colStart+1
     for sid_ in (1,2,3,4):
-        ws.cell(row=row,column=c_, value=f"{STRATEGY_NAMES[sid_]}_final").font=Font(bold=True)
+        ws.cell(row=row,column=c_, value=f"{STRATEGY_NAMES[sid_]}_final", font=bold)
         c_+=1
-    ws.cell(row=row,column=c_,value="Total_final").font=Font(bold=True)
+    ws.cell(row=row,column=c_,value="Total_final", font=bold)
     row+=1
 
     allYears= sorted({k[1] for k in data.keys()})
@@ -1024,7 +1914,7 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     # -------------------------------------------------------------------------
     # (5) Major Metrics
     # -------------------------------------------------------------------------
-    ws.cell(row=row,column=1,value="(5) Major Metrics Table").font=Font(bold=True)
+    ws.cell(row=row,column=1,value="(5) Major Metrics Table", font=bold)
     row+=2
 
     rowHeaders= [
@@ -1032,18 +1922,18 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
       "Zone1","Zone2","Zone3","Zone4",
       "Dist45_69","Dist70_99","Dist100_129","Dist130_plus"
     ]
-    ws.cell(row=row,column=1,value="Strategy").font=Font(bold=True)
-    ws.cell(row=row,column=2,value="MetricName").font=Font(bold=True)
+    ws.cell(row=row,column=1,value="Strategy", font=bold)
+    ws.cell(row=row,column=2,value="MetricName", font=bold)
     c_=3
     sorted_yrs= sorted(yrs_in)
     for y_ in sorted_yrs:
-        ws.cell(row=row,column=c_, value=str(y_)).font=Font(bold=True)
+        ws.cell(row=row,column=c_, value=str(y_), font=bold)
         c_+=1
-    ws.cell(row=row,column=c_,value="All").font=Font(bold=True)
+    ws.cell(row=row,column=c_,value="All", font=bold)
     row+=1
 
-    def mm_sum(lst):
-        return sum(lst) if lst else 0.0
+    def mm_sum(st_):
+        return st_.total
 
     mmAllSid= defaultdict(major_metrics_factory)
 
@@ -1052,36 +1942,36 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
             ws.cell(row=row,column=1,value=STRATEGY_NAMES[sid])
             ws.cell(row=row,column=2,value=rH)
             c_=3
-            combined= []
+            combined= StreamStat()
             for y_ in sorted_yrs:
                 mmX= majorMetrics.get((sid,y_), None)
                 if not mmX:
                     val=0.0
                 else:
-                    key_= rH.lower()+"_list"
+                    key_= rH.lower()
                     if key_ not in mmX:
                         val=0.0
                     else:
                         arr= mmX[key_]
                         val= mm_sum(arr)
-                        combined.extend(arr)
+                        combined.merge(arr)
                 ws.cell(row=row,column=c_,value=round(val,1))
                 c_+=1
             totVal= round(mm_sum(combined),1)
             ws.cell(row=row,column=c_,value=totVal)
-            mmAllSid[sid][key_].extend(combined)
+            mmAllSid[sid][key_].merge(combined)
             row+=1
         row+=1
 
     for sid in sids_in:
-        ws.cell(row=row,column=1,value=f"{STRATEGY_NAMES[sid]}-All(Metrics)").font=Font(bold=True)
+        ws.cell(row=row,column=1,value=f"{STRATEGY_NAMES[sid]}-All(Metrics)", font=bold)
         row+=1
         for rH in rowHeaders:
-            key_= rH.lower()+"_list"
+            key_= rH.lower()
             arr= mmAllSid[sid][key_]
             val_= mm_sum(arr)
-            ws.cell(row=row,column=2,value=rH).font=Font(bold=True)
-            ws.cell(row=row,column=3,value=round(val_,1)).font=Font(bold=True)
+            ws.cell(row=row,column=2,value=rH, font=bold)
+            ws.cell(row=row,column=3,value=round(val_,1), font=bold)
             row+=1
         row+=2
 
@@ -1089,7 +1979,7 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     # (6) Optimal Levels
     # -------------------------------------------------------------------------
     row+=1
-    ws.cell(row=row,column=1,value="(6) Optimal Levels Analysis").font=Font(bold=True)
+    ws.cell(row=row,column=1,value="(6) Optimal Levels Analysis", font=bold)
     row+=2
 
     heads_6= [
@@ -1099,7 +1989,7 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
         "Best_TP","Best_Net","Median_DD","P75_DD","Suggested_SL_Range"
     ]
     for c_i,h_ in enumerate(heads_6,1):
-        ws.cell(row=row,column=c_i,value=h_).font=Font(bold=True)
+        ws.cell(row=row,column=c_i,value=h_, font=bold)
     row+=1
 
     def pct(a,b):
@@ -1108,7 +1998,7 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
     from statistics import median as stat_median
 
     for sid in sids_in:
-        trades= STRAT_STATE[sid]["closedTrades"]
+        trades= engine.closed_trades(sid)
         n= len(trades)
         if n==0:
             continue
@@ -1139,13 +2029,11 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
             ws.cell(row=row,column=c,value=pct(hit_ct[L], n))
             c+=1
         for L in (50,60,70,80,90,100):
-            cell= ws.cell(row=row,column=c,value=round(net_if[L],1))
-            if L==best_L:
-                cell.fill= PatternFill(start_color="C6EFCE",end_color="C6EFCE",fill_type="solid")
+            ws.cell(row=row,column=c,value=round(net_if[L],1), fill=green if L==best_L else None)
             c+=1
-        ws.cell(row=row,column=c,value=best_L).fill= PatternFill(start_color="C6EFCE",end_color="C6EFCE",fill_type="solid")
+        ws.cell(row=row,column=c,value=best_L, fill=green)
         c+=1
-        ws.cell(row=row,column=c,value=round(best_val,1)).fill= PatternFill(start_color="C6EFCE",end_color="C6EFCE",fill_type="solid")
+        ws.cell(row=row,column=c,value=round(best_val,1), fill=green)
         c+=1
         ws.cell(row=row,column=c,value=round(med_dd,1)); c+=1
         ws.cell(row=row,column=c,value=round(p75,1)); c+=1
@@ -1153,34 +2041,128 @@ def produce_summaries_and_excel_single_sheet(yrs, out_dir, produce_excel):
         row+=1
 
     outp= pathlib.Path(out_dir)/ f"results_{date_tag}.xlsx"
+    ws.flush()
     wb.save(outp)
     logging.info(f"Excel file saved => {outp}")
 
+# -------------------------------------------------------------------------
+# Columnar export (--format parquet|arrow|csv)
+#
+# trades_<date>       one row per closed trade (closedTrades of every strategy)
+# aggregates_<date>   one row per (strategy, year, month) data bucket
+# major_metrics_<date> one row per (strategy, year, metric) majorMetrics bucket
+#
+# Column types: "i" int64, "f" float64, "s" string, "t" timestamp in --dst_tz.
+# -------------------------------------------------------------------------
+EXPORT_FORMATS= ("parquet", "arrow", "csv")
+EXPORT_SUFFIX= {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+TRADE_COLUMNS= [
+    ("strategy","i"), ("session","i"), ("zone","i"), ("dir","s"),
+    ("entry","f"), ("exit","f"), ("pips","f"),
+    ("hc_50","f"), ("hc_60","f"), ("hc_70","f"), ("hc_80","f"), ("hc_90","f"), ("hc_100","f"),
+    ("reason","s"), ("openTime","t"), ("closeTime","t"), ("finalDist","f"),
+    ("peakProfitPips","f"), ("peakDrawdownPips","f"),
+]
+HC_NAMES= ("hc_50","hc_60","hc_70","hc_80","hc_90","hc_100")
+MM_NAMES= ("session1","session2","zone1","zone2","zone3","zone4",
+           "dist45_69","dist70_99","dist100_129","dist130_plus")
+
+def trades_columns(engine):
+    cols= {name: [] for name,_ in TRADE_COLUMNS}
+    for sid in engine.sids:
+        for cT in engine.closed_trades(sid):
+            for name,_ in TRADE_COLUMNS:
+                cols[name].append(cT[name])
+    return cols, TRADE_COLUMNS
+
+def aggregate_columns(engine):
+    spec= [("strategy","i"),("year","i"),("month","i"),
+           ("count","i"),("wins","i"),("loses","i"),
+           ("sumPips","f"),("medPips","f"),("minPips","f"),("maxPips","f")]
+    spec+= [(f"sum_{h}","f") for h in HC_NAMES]
+    spec+= [("sumDD","f"),("maxDD","f"),("sumProfitPeak","f"),("maxProfitPeak","f")]
+    cols= {name: [] for name,_ in spec}
+    for (sid,y,m), b_ in sorted(engine.data.items()):
+        row= [sid, y, m, b_["count"], b_["wins"], b_["loses"],
+              b_["pips"].total, b_["pips"].median(), b_["pips"].lo, b_["pips"].hi]
+        row+= [b_[h].total for h in HC_NAMES]
+        row+= [b_["sumDD"], b_["maxDD"], b_["sumProfitPeak"], b_["maxProfitPeak"]]
+        for (name,_), v in zip(spec, row):
+            cols[name].append(v)
+    return cols, spec
+
+def major_metrics_columns(engine):
+    spec= [("strategy","i"),("year","i"),("metric","s"),("trades","i"),("sumPips","f")]
+    cols= {name: [] for name,_ in spec}
+    for (sid,y), mm in sorted(engine.majorMetrics.items()):
+        for name in MM_NAMES:
+            st_= mm[name]
+            for (col,_), v in zip(spec, (sid, y, name, st_.count, st_.total)):
+                cols[col].append(v)
+    return cols, spec
+
+def write_columns(cols, spec, path, fmt, tz_name):
+    if fmt=="csv":
+        names= [n for n,_ in spec]
+        conv= [(lambda v: v.isoformat()) if t=="t" else (lambda v: v) for _,t in spec]
+        with open(path, "w", newline="") as fh:
+            w= csv.writer(fh)
+            w.writerow(names)
+            for vals in zip(*(cols[n] for n in names)):
+                w.writerow([c(v) for c, v in zip(conv, vals)])
+        return
+    types= {"i": pa.int64(), "f": pa.float64(), "s": pa.string(),
+            "t": pa.timestamp("s", tz=tz_name)}
+    table= pa.table({n: pa.array(cols[n], type=types[t]) for n,t in spec})
+    if fmt=="parquet":
+        pq.write_table(table, path)
+    else:
+        # uncompressed Arrow IPC file => pa.memory_map + ipc.open_file reads it zero-copy
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as w:
+                w.write_table(table)
+
+def export_results(engine, out_dir, fmt, tz_name):
+    if not fmt:
+        return
+    if fmt!="csv" and not HAVE_PYARROW:
+        logging.warning(f"pyarrow not installed => skip --format {fmt}.")
+        return
+    outp= pathlib.Path(out_dir)
+    date_tag= datetime.now().strftime("%Y%m%d")
+    for stem, build in (("trades", trades_columns),
+                        ("aggregates", aggregate_columns),
+                        ("major_metrics", major_metrics_columns)):
+        cols, spec= build(engine)
+        path= outp/ f"{stem}_{date_tag}{EXPORT_SUFFIX[fmt]}"
+        write_columns(cols, spec, path, fmt, tz_name)
+        logging.info(f"{stem} ({len(cols[spec[0][0]])} rows) saved => {path}")
+
 def main():
     args= parse_args()
     yrs= parse_year_range(args.year_range)
     yr_tag= re.sub(r'[^0-9\-]+','_', args.year_range)
     setup_logging(args.verbose, args.out_dir, yr_tag)
-    run_backtest(
+    engine= run_backtest(
         csv_file=args.csv,
         yrs= yrs,
         src_tz= args.src_tz,
         dst_tz= args.dst_tz,
         produce_excel= args.excel,
-        out_dir= args.out_dir
+        out_dir= args.out_dir,
+        workers= args.workers,
+        out_format= args.format,
+        path= make_path(args.path, args.path_file, args.src_tz, args.dst_tz, yrs),
+        core= args.engine
     )
     logging.info("All years complete.")
 
     print("\n=== Diagnostics ===")
-    print("Opened trades by finalDist:", open_dist_counter)
+    print("Opened trades by finalDist:", engine.open_dist_counter)
     print("Close reasons by strategy:")
-    for (theSid, theReason), c_ in sorted(close_reason_counter.items()):
+    for (theSid, theReason), c_ in sorted(engine.close_reason_counter.items()):
         print(f"  Strat{theSid} – {theReason}: {c_}")
 
-    data.clear()
-    open_dist_counter.clear()
-    close_reason_counter.clear()
-    majorMetrics.clear()
-
 if __name__=="__main__":
     main()
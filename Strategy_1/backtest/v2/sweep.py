@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+r"""
+Parameter sweep for mq4_backtest_v3.py.
+
+Loads the bars ONCE (CSV or a bar_cache.py .bars file), then evaluates every
+combination of the tunable constants in worker processes and writes one
+compact row per (combination, strategy):
+
+    Combo, <params...>, Strategy, Trades, NetPips, Wins, WinRate,
+    MaxDrawdown, EquityMaxDD, SumHC50 .. SumHC100
+
+MaxDrawdown is the worst single-trade peak drawdown (as in the Excel report);
+EquityMaxDD is the largest peak-to-trough fall of the cumulative pips curve.
+
+Search space, one --param per StrategyConfig field (anything not given keeps
+its default from mq4_backtest_v3.py):
+    --param TOLERANCE=6,9,12          explicit values
+    --param GSL=30:50:5               start:stop:step (inclusive)
+
+Full grid by default; --random N samples N distinct combinations instead.
+
+Example:
+  python sweep.py --csv dax-1m.bars --year_range 2015-2024 ^
+      --param GSL=30:50:5 --param SWEEP_CLOSE=150,179,200 ^
+      --param TIME_CLOSE_45_69=12:20:2 --workers 8
+"""
+
+import argparse
+import csv
+import itertools
+import logging
+import pathlib
+import random
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import mq4_backtest_v3 as bt
+import bar_cache
+import tz_convert
+
+# StrategyConfig fields and how to parse them
+PARAM_TYPES = {
+    "TOLERANCE":          float,
+    "GSL":                float,
+    "SWEEP_CLOSE":        float,
+    "TIME_CLOSE_45_69":   int,
+    "TIME_CLOSE_70_PLUS": int,
+    "OVERNIGHT_LIMIT":    float,
+    "MIDDAY_LIMIT":       float,
+}
+
+HC_LEVELS = (50, 60, 70, 80, 90, 100)
+
+# -------------------------------------------------------------------------
+# Search space
+# -------------------------------------------------------------------------
+def parse_param(spec):
+    """'NAME=1,2,3' or 'NAME=start:stop:step' => (NAME, [values])."""
+    if "=" not in spec:
+        raise ValueError(f"--param must look like NAME=values, got {spec!r}")
+    name, vals = spec.split("=", 1)
+    name = name.strip().upper()
+    if name not in PARAM_TYPES:
+        raise ValueError(f"Unknown parameter {name}; choose from {', '.join(PARAM_TYPES)}")
+    typ = PARAM_TYPES[name]
+    if ":" in vals:
+        st, en, step = (float(x) for x in vals.split(":"))
+        if step <= 0:
+            raise ValueError(f"{name}: step must be > 0")
+        out = []
+        n = 0
+        while st + n * step <= en + 1e-9:
+            out.append(typ(round(st + n * step, 6)))
+            n += 1
+    else:
+        out = [typ(float(x)) for x in vals.split(",") if x.strip()]
+    if not out:
+        raise ValueError(f"{name}: no values")
+    return name, out
+
+def build_combos(space, n_random=0, seed=None):
+    """Full grid of *space* ({name: [values]}), or n_random distinct samples of it."""
+    names = list(space)
+    grid = list(itertools.product(*(space[n] for n in names)))
+    if n_random and n_random < len(grid):
+        grid = random.Random(seed).sample(grid, n_random)
+    return [dict(zip(names, vals)) for vals in grid]
+
+# -------------------------------------------------------------------------
+# Bars (loaded once in the parent, handed to each worker at start-up)
+# -------------------------------------------------------------------------
+def load_bars(csv_file, yrs, src_tz, dst_tz):
+    """
+    Read and tz-convert the bars for *yrs* into flat arrays:
+    destination epoch minutes, folds, opens, highs, lows, closes, plus the
+    converted time of the file's final row (what run_backtest uses for
+    EndOfBacktest).
+    """
+    conv = tz_convert.TzConverter.for_years(src_tz, dst_tz, yrs)
+    f = pathlib.Path(csv_file)
+    cache = None
+    if bar_cache.is_bar_cache(f):
+        cache = bar_cache.BarCache(f)
+        rows = cache.iter_bars(yrs, conv)
+    else:
+        rows = ((conv.to_dst(naive), op, hi, lo, cl, vol)
+                for naive, op, hi, lo, cl, vol in bar_cache.iter_source_bars(f, src_tz))
+
+    bars = {"minutes": array("q"), "folds": array("b"),
+            "opens": array("d"), "highs": array("d"),
+            "lows": array("d"), "closes": array("d"),
+            "dst_tz": dst_tz, "last": None, "path": None, "index": None, "flat": None}
+    dt = None
+    for dt, op, hi, lo, cl, _vol in rows:
+        if dt.year not in yrs:
+            continue
+        bars["minutes"].append(tz_convert.to_epoch_minutes(dt.replace(tzinfo=None)))
+        bars["folds"].append(dt.fold)
+        bars["opens"].append(op)
+        bars["highs"].append(hi)
+        bars["lows"].append(lo)
+        bars["closes"].append(cl)
+    if cache:
+        naive = cache.last_naive()
+        dt = conv.to_dst(naive) if naive else None
+        cache.close()
+    if dt:
+        bars["last"] = (tz_convert.to_epoch_minutes(dt.replace(tzinfo=None)), dt.fold)
+    return bars
+
+_BARS = None
+
+def init_worker(bars):
+    global _BARS
+    _BARS = bars
+    # per-trade [Close] lines would swamp the sweep log
+    logging.disable(logging.INFO)
+
+# -------------------------------------------------------------------------
+# One combination
+# -------------------------------------------------------------------------
+def equity_max_dd(pips):
+    peak = cum = maxDD = 0.0
+    for p in pips:
+        cum += p
+        if cum > peak:
+            peak = cum
+        if peak - cum > maxDD:
+            maxDD = peak - cum
+    return maxDD
+
+def run_combo(params):
+    eng = bt.StrategyEngine(bt.StrategyConfig(**params), _BARS["path"])
+    tzDst = ZoneInfo(_BARS["dst_tz"])
+    if _BARS["index"] is not None:
+        eng.run_index(_BARS["index"])
+    elif _BARS["flat"] is not None:
+        eng.run_compiled(_BARS, tzDst, _BARS["flat"])
+    else:
+        eng.run_arrays(_BARS["minutes"], _BARS["folds"], _BARS["lows"], _BARS["highs"], tzDst,
+                       opens=_BARS["opens"], closes=_BARS["closes"])
+    if _BARS["last"]:
+        m, fold = _BARS["last"]
+        eng.finish((tz_convert.EPOCH + timedelta(minutes=m)).replace(tzinfo=tzDst, fold=fold))
+
+    out = []
+    for sid in (1,2,3,4):
+        trades = eng.closed_trades(sid)
+        pips = [t["pips"] for t in trades]
+        n = len(trades)
+        wins = sum(1 for p in pips if p > 0)
+        row = {
+            "Strategy":    bt.STRATEGY_NAMES[sid],
+            "Trades":      n,
+            "NetPips":     round(sum(pips), 1),
+            "Wins":        wins,
+            "WinRate":     round(wins / n * 100, 1) if n else 0.0,
+            "MaxDrawdown": round(max((t["peakDrawdownPips"] for t in trades), default=0.0), 1),
+            "EquityMaxDD": round(equity_max_dd(pips), 1),
+        }
+        for L in HC_LEVELS:
+            row[f"SumHC{L}"] = round(sum(t[f"hc_{L}"] for t in trades), 1)
+        out.append(row)
+    return params, out
+
+# -------------------------------------------------------------------------
+def run_sweep(bars, combos, workers=1):
+    """Yield (params, rows) per combination, in combination order."""
+    if workers <= 1:
+        init_worker(bars)
+        for c in combos:
+            yield run_combo(c)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(bars,)) as ex:
+        yield from ex.map(run_combo, combos)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Parameter sweep over mq4_backtest_v3 constants")
+    ap.add_argument("--csv", required=True,
+                    help="dax-1m.csv, a .bars file built by bar_cache.py, or an MT4 .hst")
+    ap.add_argument("--year_range", default="2024")
+    ap.add_argument("--src_tz", default="America/Chicago")
+    ap.add_argument("--dst_tz", default="Europe/London")
+    ap.add_argument("--param", action="append", default=[],
+                    help="NAME=v1,v2,... or NAME=start:stop:step (repeatable)")
+    ap.add_argument("--random", type=int, default=0,
+                    help="Sample N combinations instead of the full grid.")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--path", choices=bt.PATH_MODES, default="LH",
+                    help="Intrabar price order (see mq4_backtest_v3.py --path).")
+    ap.add_argument("--path_file", default=None,
+                    help="Lower-timeframe CSV/.hst for --path LTF.")
+    ap.add_argument("--engine", choices=bt.ENGINES, default="events",
+                    help="events (default, needs numpy), bars or numba "
+                         "(see mq4_backtest_v3.py --engine).")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--out_dir", default=".")
+    args = ap.parse_args()
+    if args.path == "LTF" and not args.path_file:
+        ap.error("--path LTF needs --path_file")
+    return args
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+
+    space = dict(parse_param(p) for p in args.param)
+    if not space:
+        logging.warning("No --param given => single run with the file defaults.")
+    combos = build_combos(space, args.random, args.seed)
+    yrs = bt.parse_year_range(args.year_range)
+
+    t0 = datetime.now()
+    bars = load_bars(args.csv, yrs, args.src_tz, args.dst_tz)
+    bars["path"] = bt.make_path(args.path, args.path_file, args.src_tz, args.dst_tz, yrs)
+    engine = bt.resolve_engine(args.engine)
+    # built once, shared by every combination
+    if engine == "events":
+        bars["index"] = bt.EventIndex(bars, ZoneInfo(args.dst_tz), bars["path"], bt.DaySchedule())
+    elif engine == "numba":
+        bars["flat"] = bars["path"].flat(bars)
+    logging.info(f"Loaded {len(bars['minutes'])} bars in {(datetime.now()-t0).total_seconds():.1f}s; "
+                 f"{len(combos)} combinations on {args.workers} worker(s)")
+
+    outp = pathlib.Path(args.out_dir)
+    outp.mkdir(exist_ok=True)
+    yr_tag = re.sub(r'[^0-9\-]+', '_', args.year_range)
+    out_file = outp / f"sweep_{yr_tag}_{datetime.now().strftime('%Y%m%d')}.csv"
+
+    names = list(space)
+    heads = (["Combo"] + names + ["Strategy", "Trades", "NetPips", "Wins", "WinRate",
+             "MaxDrawdown", "EquityMaxDD"] + [f"SumHC{L}" for L in HC_LEVELS])
+    best = None
+    with out_file.open("w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(heads)
+        for i, (params, rows) in enumerate(run_sweep(bars, combos, args.workers), 1):
+            for r in rows:
+                w.writerow([i] + [params[n] for n in names] + [r[h] for h in heads[len(names)+1:]])
+                if best is None or r["NetPips"] > best[2]["NetPips"]:
+                    best = (i, params, r)
+            fh.flush()
+            logging.info(f"[{i}/{len(combos)}] {params} => "
+                         + ", ".join(f"{r['Strategy']}={r['NetPips']}" for r in rows))
+
+    logging.info(f"Sweep results => {out_file}")
+    if best:
+        i, params, r = best
+        logging.info(f"Best NetPips: combo {i} {params} {r['Strategy']} "
+                     f"net={r['NetPips']} WR={r['WinRate']}% EquityMaxDD={r['EquityMaxDD']}")
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,14 @@ Usage:
         python mt4_converter_refactored.py INPUT_CSV YEARS [--output_base_dir DIR] [--digits D] [--spread S] [--copyright C] [--input_timezone TZ] [--no_remove_weekends] [--verbose] [--symbol_suffix SUFFIX] [--combine_years]
         python mt4_converter_refactored.py dax-1m.csv 2024 --combine_years
         python mt4_converter_refactored.py dax-1m.csv 2024 --combine_years --symbol_suffix _OFFLINE
+        python mt4_converter_refactored.py dax-1m.csv 2024 --holidays 2024-12-24,2024-12-25 --fill_report
+        python mt4_converter_refactored.py dax-1m.csv 2024 --spread schedule
 
 """
 
 import os
+import sys
+import pathlib
 import struct
 import argparse
 import logging
@@ -23,6 +27,14 @@ import pytz
 import pandas as pd
 import numpy as np
 
+# --spread schedule: the backtesters' intraday spread model (Strategy_1/backtest).
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / "Strategy_1" / "backtest"))
+try:
+    from spread_schedule import SpreadTable
+    HAVE_SPREAD_SCHEDULE = True
+except ImportError:
+    HAVE_SPREAD_SCHEDULE = False
+
 # Constants for HST file format (version 509)
 HST_VERSION = 509
 HST_HEADER_FORMAT = (
@@ -45,6 +57,18 @@ RATE_FORMAT = (
     "i"   # spread
     "q"   # real volume
 )
+# Same 60-byte record as a packed NumPy dtype (one array per file, one write)
+RATE_DTYPE = np.dtype([
+    ("time",        "<i8"),
+    ("open",        "<f8"),
+    ("high",        "<f8"),
+    ("low",         "<f8"),
+    ("close",       "<f8"),
+    ("volume",      "<i8"),
+    ("spread",      "<i4"),
+    ("real_volume", "<i8"),
+])
+assert RATE_DTYPE.itemsize == struct.calcsize(RATE_FORMAT)
 
 def setup_logging(verbose: bool):
     level = logging.DEBUG if verbose else logging.INFO
@@ -58,8 +82,10 @@ def parse_args():
                         help="Directory for output files")
     parser.add_argument("--digits", type=int, default=1,
                         help="Decimal places for prices (default: 1)")
-    parser.add_argument("--spread", type=int, default=0,
-                        help="Spread in points for HST records")
+    parser.add_argument("--spread", type=parse_spread, default=0,
+                        help="Spread in points for HST records, or 'schedule' for the per-minute "
+                             "SPREAD_SCHEDULE of the backtester, applied in London wall time "
+                             "(scaled by --digits)")
     parser.add_argument("--copyright", default="(C) Processed by script",
                         help="Copyright string for HST header")
     parser.add_argument("--input_timezone", default="Europe/Berlin",
@@ -67,6 +93,11 @@ def parse_args():
     parser.add_argument("--no_remove_weekends", action="store_true",
                         dest="keep_weekends",
                         help="Keep weekend data (default: remove Saturdays/Sundays)")
+    parser.add_argument("--holidays", type=load_holidays, default=None,
+                        help="London dates with no session, dropped like weekends: "
+                             "comma-separated YYYY-MM-DD and/or files with one date per line")
+    parser.add_argument("--fill_report", action="store_true",
+                        help="Write fill_report.csv (Date,Bars,Filled per session day)")
     parser.add_argument("--verbose", action="store_true",
                         help="Enable debug logging")
     parser.add_argument("--symbol_suffix", default="",
@@ -83,6 +114,7 @@ def parse_years(year_arg: str):
 
 # ── target timezone (London) ───────────────────────────────────────────
 TARGET_TZ = pytz.timezone("Europe/London")
+EPOCH_UTC = pd.Timestamp(0, tz="UTC")
 
 def read_and_clean_csv(path: str, tz_local: pytz.timezone):
     logging.info("Reading CSV: %s", path)
@@ -107,22 +139,186 @@ def read_and_clean_csv(path: str, tz_local: pytz.timezone):
     logging.info("Read %d records from %s to %s", len(df), df.index.min(), df.index.max())
     return df
 
-def fill_missing_minutes(df: pd.DataFrame, keep_weekends: bool):
-    start, end = df.index.min(), df.index.max()
-    full_idx = pd.date_range(start, end, freq='min', tz=TARGET_TZ)
-    df = df.reindex(full_idx)
-    missing = df['Open'].isna().sum()
+def parse_spread(spec: str):
+    """--spread: a fixed spread in points, or 'schedule' for the backtester's per-minute SpreadTable."""
+    if spec.strip().lower() != "schedule":
+        return int(spec)
+    if not HAVE_SPREAD_SCHEDULE:
+        raise argparse.ArgumentTypeError("--spread schedule needs Strategy_1/backtest/spread_schedule.py")
+    return SpreadTable()
+
+def load_holidays(spec: str) -> set:
+    """--holidays: comma-separated YYYY-MM-DD dates and/or files with one date per line (# comments)."""
+    days = set()
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if os.path.isfile(item):
+            with open(item) as f:
+                for line in f:
+                    line = line.split('#')[0].strip()
+                    if line:
+                        days.add(datetime.strptime(line, "%Y-%m-%d").date())
+        else:
+            days.add(datetime.strptime(item, "%Y-%m-%d").date())
+    return days
+
+def session_minutes(first: int, last: int, keep_weekends: bool, holidays=None):
+    """
+    Trading-session intervals as a minute grid: the UTC epoch seconds first,
+    first+60, ... <= last that fall on London session days (Mon-Fri, or every
+    day with keep_weekends, minus the *holidays* dates). Returns (seconds,
+    day number of each minute, London midnights of the session days).
+    """
+    lo = pd.Timestamp(first, unit='s', tz='UTC').tz_convert(TARGET_TZ).normalize()
+    hi = pd.Timestamp(last, unit='s', tz='UTC').tz_convert(TARGET_TZ).normalize()
+    midnights = pd.date_range(lo, hi + pd.Timedelta(days=1), freq='D')
+    bounds = np.asarray((midnights - EPOCH_UTC) // pd.Timedelta(seconds=1), dtype=np.int64)
+    days = midnights[:-1]
+    keep = np.ones(len(days), dtype=bool)
+    if not keep_weekends:
+        keep &= days.weekday < 5
+    if holidays:
+        keep &= ~np.isin(np.array(days.date), list(holidays))
+    days = days[keep]
+    s = np.maximum(bounds[:-1][keep], first)
+    e = np.minimum(bounds[1:][keep] - 1, last)
+    s = first + (s - first + 59) // 60 * 60        # first grid minute of each interval
+    counts = np.where(e >= s, (e - s) // 60 + 1, 0)
+    day = np.repeat(np.arange(len(days)), counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(s, counts) + step * 60, day, days
+
+def fill_missing_minutes(df: pd.DataFrame, keep_weekends: bool, holidays=None, report=None):
+    """
+    Every minute from the first to the last bar (grid anchored at the first)
+    on London session days only; O/H/L/C forward-filled from the latest real
+    bar on the grid, including bars on the excluded days, volume 0 when filled.
+    report: optional dict, set to {date: [bars, filled]} per session day.
+    """
+    if not df.index.is_unique:
+        raise ValueError("Duplicate timestamps after localization; cannot fill minutes")
+    cols = ['Open', 'High', 'Low', 'Close']
+    t = np.asarray((df.index - EPOCH_UTC) // pd.Timedelta(seconds=1), dtype=np.int64)
+    anchor = t[0]
+    end = anchor + (t[-1] - anchor) // 60 * 60
+    on_grid = (t - anchor) % 60 == 0
+    t = t[on_grid]
+    ohlc = df[cols].to_numpy(dtype=np.float64)[on_grid]
+    vol = df['Volume'].to_numpy(dtype=np.float64).astype(np.int64)[on_grid]
+
+    secs, day, days = session_minutes(anchor, end, keep_weekends, holidays)
+    pos = np.searchsorted(t, secs, side='right') - 1
+    real = t[pos] == secs
+    out = pd.DataFrame(ohlc[pos], columns=cols,
+                       index=pd.to_datetime(secs, unit='s', utc=True).tz_convert(TARGET_TZ))
+    out['Volume'] = np.where(real, vol[pos], 0)
+    missing = int(len(secs) - real.sum())
     if missing:
         logging.info("Filling %d missing minutes", missing)
-        df[['Open','High','Low','Close']] = df[['Open','High','Low','Close']].ffill()
-        df['Volume'] = df['Volume'].fillna(0).astype(int)
-    if not keep_weekends:
-        df = df[~df.index.weekday.isin([5,6])]
-        logging.debug("Removed weekends, remaining entries: %d", len(df))
-    return df
+    logging.debug("Session minutes: %d rows", len(out))
+    if report is not None:
+        bars = np.bincount(day, minlength=len(days))
+        filled = np.bincount(day[~real], minlength=len(days))
+        report.update((d, [b, f]) for d, b, f in zip(days.date, bars.tolist(), filled.tolist()) if b)
+    return out
+
+def write_fill_report(report: dict, filepath: str):
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, 'w', newline='') as f:
+        f.write("Date,Bars,Filled" + os.linesep)
+        for d in sorted(report):
+            f.write(f"{d:%Y-%m-%d},{report[d][0]},{report[d][1]}" + os.linesep)
+    logging.info("Wrote fill report: %s", filepath)
+
+def build_rates(df: pd.DataFrame, spread, digits: int) -> np.ndarray:
+    """RATE_DTYPE array for df; spread is a fixed int or a SpreadTable (per-bar, London minute of day)."""
+    rates = np.zeros(len(df), dtype=RATE_DTYPE)
+    rates["time"] = (df.index - EPOCH_UTC) // pd.Timedelta(seconds=1)
+    for col in ("Open", "High", "Low", "Close"):
+        rates[col.lower()] = df[col].to_numpy(dtype=np.float64)
+    rates["volume"] = df["Volume"].to_numpy(dtype=np.float64).astype(np.int64)  # int() truncation
+    if isinstance(spread, int):
+        rates["spread"] = spread
+    else:
+        rates["spread"] = spread.points(wall_seconds(df.index) // 60, digits)
+    return rates
+
+CSV_COLUMNS = ("<DATE>", "<TIME>", "<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<VOLUME>")
+CSV_CHUNK_ROWS = 1 << 16
+
+def format_fixed(values, digits: int) -> np.ndarray:
+    """
+    f"{v:.{digits}f}" for a whole float array without a Python call per value:
+    |v| is scaled to an integer and its integer/fraction digits are joined as
+    strings. Values whose scaled form lies within rounding error of a half
+    (there the decimal rounding of the binary value decides), non-finite and
+    very large values are formatted by Python instead, so the text is identical.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    scale = 10 ** digits
+    scaled = np.abs(x) * scale
+    with np.errstate(invalid="ignore"):
+        fast = (np.isfinite(scaled) & (scaled < 1e9)
+                & (np.abs(scaled - np.floor(scaled) - 0.5) > 1e-6))
+    k = np.rint(np.where(fast, scaled, 0.0)).astype(np.int64)
+    out = (k // scale).astype(str)
+    if digits > 0:
+        frac = np.char.zfill((k % scale).astype(str), digits)
+        out = np.char.add(np.char.add(out, "."), frac)
+    out = np.where(np.signbit(x), np.char.add("-", out), out)
+    slow = np.flatnonzero(~fast)
+    if len(slow):
+        txt = [f"{v:.{digits}f}" for v in x[slow].tolist()]
+        width = max(out.dtype.itemsize // 4, max(map(len, txt)))
+        out = out.astype(f"<U{width}")
+        out[slow] = txt
+    return out
+
+def wall_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """Seconds since 1970-01-01 of the local wall time of *index* (int64)."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return np.asarray((index - pd.Timestamp(0)) // pd.Timedelta(seconds=1), dtype=np.int64)
+
+def wall_date_time_strings(index: pd.DatetimeIndex):
+    """
+    ('%Y.%m.%d', '%H:%M:%S') string arrays for the local wall time of *index*.
+    Each distinct day and time of day is formatted once and gathered by position.
+    """
+    days, sod = np.divmod(wall_seconds(index), 86400)
+    out = []
+    for keys, unit, fmt in ((days, "D", "%Y.%m.%d"), (sod, "s", "%H:%M:%S")):
+        uniq, inv = np.unique(keys, return_inverse=True)
+        table = np.asarray(pd.to_datetime(uniq, unit=unit).strftime(fmt), dtype=str)
+        out.append(table[inv.reshape(-1)])
+    return out[0], out[1]
+
+def render_csv_lines(df: pd.DataFrame, digits: int) -> str:
+    """<DATE>,<TIME>,<OPEN>,<HIGH>,<LOW>,<CLOSE>,<VOLUME> lines for df, each ending in os.linesep."""
+    dates, times = wall_date_time_strings(df.index)
+    cols = [times]
+    cols += [format_fixed(df[c].to_numpy(), digits) for c in ("Open", "High", "Low", "Close")]
+    cols.append(df['Volume'].astype(int).to_numpy().astype(str))
+    line = dates
+    for col in cols:
+        line = np.char.add(np.char.add(line, ","), col)
+    return os.linesep.join(line.tolist()) + os.linesep
+
+def write_mt4_csv(df: pd.DataFrame, filepath: str, digits: int,
+                  chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Same text as DataFrame.to_csv(index=False) of the <DATE>..<VOLUME> frame,
+    rendered column-wise chunk_rows lines at a time (bounds the string arrays).
+    """
+    with open(filepath, 'w', newline='') as f:
+        f.write(",".join(CSV_COLUMNS) + os.linesep)
+        for s in range(0, len(df), chunk_rows):
+            f.write(render_csv_lines(df.iloc[s:s + chunk_rows], digits))
 
 def create_hst(df: pd.DataFrame, filepath: str, symbol: str,
-               period: int, digits: int, copyright_str: str, spread: int):
+               period: int, digits: int, copyright_str: str, spread):
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
     with open(filepath, 'wb') as f:
         # Header
@@ -134,26 +330,12 @@ def create_hst(df: pd.DataFrame, filepath: str, symbol: str,
                              timestamp, 0, b'\0'*52)
         f.write(header)
         # Data
-        for ts, row in df.iterrows():
-            data = struct.pack(RATE_FORMAT, int(ts.timestamp()),
-                               float(row['Open']), float(row['High']),
-                               float(row['Low']), float(row['Close']),
-                               int(row['Volume']), spread, 0)
-            f.write(data)
+        build_rates(df, spread, digits).tofile(f)
     logging.info("Wrote HST: %s", filepath)
 
 def create_csv(df: pd.DataFrame, filepath: str, digits: int):
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    out = pd.DataFrame({
-        '<DATE>': df.index.strftime('%Y.%m.%d'),
-        '<TIME>': df.index.strftime('%H:%M:%S'),
-        '<OPEN>': df['Open'].map(lambda x: f"{x:.{digits}f}"),
-        '<HIGH>': df['High'].map(lambda x: f"{x:.{digits}f}"),
-        '<LOW>': df['Low'].map(lambda x: f"{x:.{digits}f}"),
-        '<CLOSE>': df['Close'].map(lambda x: f"{x:.{digits}f}"),
-        '<VOLUME>': df['Volume'].astype(int)
-    })
-    out.to_csv(filepath, index=False)
+    write_mt4_csv(df, filepath, digits)
     logging.info("Wrote CSV: %s", filepath)
 
 def main():
@@ -168,7 +350,10 @@ def main():
     if df.empty:
         logging.error("No data found in CSV file. Please check the input file.")
         return
-    df = fill_missing_minutes(df, args.keep_weekends)
+    report = {} if args.fill_report else None
+    df = fill_missing_minutes(df, args.keep_weekends, args.holidays, report)
+    if report is not None:
+        write_fill_report(report, os.path.join(args.output_base_dir, "fill_report.csv"))
     years = parse_years(args.years)
     suffix = args.symbol_suffix if args.symbol_suffix else ""
     configs = [